@@ -0,0 +1,103 @@
+"""Benchmark `TodoRecord` serialization against `dav.serialize_ical_todo` on generated VTODOs.
+
+Both paths start from raw iCalendar text, as the task store holds it. The icalendar path parses
+each resource and serializes the component; the fast path, which the task listings use, scans
+the text once into a `TodoRecord` and serializes that.
+
+Usage:
+    python benchmarks/bench_serialize.py [--count 10000] [--repeat 3]
+"""
+from __future__ import annotations
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import icalendar
+
+from dav import serialize_ical_todo
+from todo_record import SERIALIZED_FIELDS, TodoRecord
+
+def make_vtodo(i: int) -> str:
+    """Generate a VTODO that exercises the shapes found on real servers."""
+    lines = [
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//EN",
+        "BEGIN:VTODO",
+        f"UID:task-{i}@example.com",
+        "DTSTAMP:20250101T120000Z",
+        "CREATED:20250101T120000Z",
+        f"SUMMARY:Task number {i}\\, with an escaped comma and a long enough title to be folded ac",
+        " ross two lines",
+        f"PRIORITY:{i % 10}",
+        "SEQUENCE:2",
+    ]
+    if i % 3 == 0:
+        lines.append(f"DUE;TZID=Europe/Berlin:2025{(i % 12) + 1:02d}15T093000")
+    elif i % 3 == 1:
+        lines.append(f"DUE;VALUE=DATE:2025{(i % 12) + 1:02d}{(i % 28) + 1:02d}")
+    else:
+        lines.append(f"DUE:2025{(i % 12) + 1:02d}01T170000Z")
+    if i % 4 == 0:
+        lines.append("DTSTART:20250101T080000")
+    if i % 5 == 0:
+        lines.append("DESCRIPTION:Line one\\nLine two\\; with semicolon")
+    if i % 7 == 0:
+        lines += ["STATUS:COMPLETED", "COMPLETED:20250301T101010Z"]
+    else:
+        lines.append("STATUS:NEEDS-ACTION")
+    lines += [
+        "CATEGORIES:home,errands",
+        "BEGIN:VALARM", "ACTION:DISPLAY", "DESCRIPTION:Reminder", "TRIGGER:-PT15M", "END:VALARM",
+        "END:VTODO",
+    ]
+    if i % 11 == 0:
+        lines += [
+            "BEGIN:VTIMEZONE", "TZID:Europe/Berlin",
+            "BEGIN:STANDARD", "DTSTART:19701025T030000", "TZOFFSETFROM:+0200", "TZOFFSETTO:+0100", "END:STANDARD",
+            "END:VTIMEZONE",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+def current_path(data: str) -> dict:
+    todo = icalendar.Calendar.from_ical(data).walk("VTODO")[0]
+    return serialize_ical_todo(todo)
+
+def fast_path(data: str) -> dict:
+    # What the listing tools return for a task: `CachedTask.record.to_dict()`.
+    record = TodoRecord.from_ical(data)
+    return record.to_dict() if record is not None else {}
+
+def run(fn, fixtures: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in fixtures:
+            fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fixtures = [make_vtodo(i) for i in range(args.count)]
+
+    # The fast path must agree with the current one on every field it extracts.
+    for data in fixtures:
+        expected = {k: v for k, v in current_path(data).items() if k in SERIALIZED_FIELDS}
+        assert fast_path(data) == expected, (fast_path(data), expected)
+
+    slow = run(current_path, fixtures, args.repeat)
+    fast = run(fast_path, fixtures, args.repeat)
+    print(f"{args.count} VTODOs, best of {args.repeat}")
+    print(f"  serialize_ical_todo (icalendar parse): {slow * 1000:9.1f} ms  {slow / args.count * 1e6:7.1f} us/task")
+    print(f"  TodoRecord.to_dict (direct scan):      {fast * 1000:9.1f} ms  {fast / args.count * 1e6:7.1f} us/task")
+    print(f"  speed-up: {slow / fast:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark the cold start of the agent processes: module imports, and the time to a first answer.
+
+Each measurement runs in a fresh interpreter, as a script launching a short-lived agent would.
+The first table is the import time of the modules the entry points load up front. The second is
+the time from process start until the usual first tool calls (`calendar_list_ids`, then
+`task_list_overdue`) are answered from the in-process mock CalDAV server, with the prebuilt
+agent built:
+
+- `sequential`: the agent is built first, then the calendars are discovered.
+- `overlap`: the prefetcher discovers the calendars and loads the tasks while the agent's
+  modules are imported, as `run-prebuilt.py` does.
+- `overlap+cache`: the same, with the calendars read from the discovery cache of an earlier run.
+
+The scripted model stands in for the model provider, whose import time is not measured.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--latency 0.05] [--tasks 200]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = pathlib.Path(__file__).resolve().parent.parent / "src"
+BENCHMARKS = pathlib.Path(__file__).resolve().parent
+MODULES = ("caldav", "dav", "async_dav", "llama_agent", "run-prebuilt", "run-bulk")
+MODES = ("sequential", "overlap", "overlap+cache")
+HEAVY = ("langchain_core", "langchain", "langgraph", "recurring_ical_events", "httpx")
+
+# Installs a `config` module like `run_benchmarks.use_bench_config`, without importing anything else.
+CONFIG = """
+import sys, types
+config = types.ModuleType("config")
+config.caldav_url = {url!r}
+config.caldav_username = "bench"
+config.caldav_password = "bench"
+config.ai_model = "scripted"
+config.checkpoint_db = ""
+config.discovery_cache = {cache!r}
+sys.modules["config"] = config
+"""
+
+IMPORT = """
+import importlib, json, time
+start = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+STARTUP = """
+import importlib, json, time
+start = time.perf_counter()
+prebuilt = importlib.import_module("run-prebuilt")
+from discovery_cache import discovery_cache_from_config
+from prefetch import prefetcher_from_config
+client = prebuilt.TaskDAVClient(
+    url=config.caldav_url, username=config.caldav_username, password=config.caldav_password,
+    discovery_cache=discovery_cache_from_config(config, config.caldav_url, config.caldav_username),
+)
+if {overlap!r}:
+    prefetcher_from_config(client, config).start()
+from fake_llm import ScriptedChatModel
+agent = prebuilt.build_agent(client, model=ScriptedChatModel(script=["Done."]))
+built = time.perf_counter()
+prebuilt.build_full_prompt(client, "What is overdue?")
+client.task_list_overdue(client.calendar_list_ids()[0])
+answered = time.perf_counter()
+print(json.dumps({{"built": built - start, "answered": answered - start}}))
+"""
+
+def run_child(code: str) -> tuple[float, dict]:
+    """Run code in a fresh interpreter; return its wall time and the JSON it printed last."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(SRC), str(BENCHMARKS)])}
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - start, json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement; the median is reported")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server delay per request, in seconds")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks in the mock calendar")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(SRC))
+    from mock_caldav import MockCalDAVServer, generate_todos
+
+    print(f"Module imports, median of {args.repeat} fresh processes")
+    print(f"  {'module':<14} {'import':>9} {'process':>9}  heavy modules loaded")
+    for module in MODULES:
+        code = CONFIG.format(url="http://127.0.0.1:1/", cache="") + IMPORT.format(module=module, heavy=HEAVY)
+        runs = [run_child(code) for _ in range(args.repeat)]
+        seconds = statistics.median(result["seconds"] for _, result in runs)
+        wall = statistics.median(wall for wall, _ in runs)
+        print(f"  {module:<14} {seconds * 1000:7.0f}ms {wall * 1000:7.0f}ms  {', '.join(runs[0][1]['loaded']) or '-'}")
+
+    with MockCalDAVServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as directory:
+        server.add_calendar("work", generate_todos(args.tasks))
+        server.add_calendar("home", generate_todos(args.tasks // 4))
+        print()
+        print(f"First answer, median of {args.repeat} fresh processes ({args.latency * 1000:.0f} ms per request)")
+        print(f"  {'mode':<14} {'agent':>9} {'answer':>9} {'process':>9}")
+        for mode in MODES:
+            cache = os.path.join(directory, "calendars.json") if mode.endswith("cache") else ""
+            code = CONFIG.format(url=server.url, cache=cache) + STARTUP.format(overlap=mode != "sequential")
+            if cache:
+                run_child(code)  # Fill the cache, as an earlier run would.
+            runs = [run_child(code) for _ in range(args.repeat)]
+            built = statistics.median(result["built"] for _, result in runs)
+            answered = statistics.median(result["answered"] for _, result in runs)
+            wall = statistics.median(wall for wall, _ in runs)
+            print(f"  {mode:<14} {built * 1000:7.0f}ms {answered * 1000:7.0f}ms {wall * 1000:7.0f}ms")
+
+if __name__ == "__main__":
+    main()
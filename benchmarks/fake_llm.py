@@ -0,0 +1,84 @@
+"""A deterministic chat model that replays a scripted transcript.
+
+`ReActAgent` expects plain-text ReAct responses; the LangGraph agent expects `AIMessage`s with
+`tool_calls`. A script may contain either: each model call returns the next entry, wrapping
+around at the end so the same script can be replayed for every benchmark iteration.
+Streaming splits the text into fixed-size chunks, optionally with a per-chunk delay to
+simulate token generation; tool calls follow in a last chunk, as Ollama sends them.
+"""
+from __future__ import annotations
+from typing import Any, Iterator, Optional, Sequence, Union
+import json
+import threading
+import time
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+ScriptEntry = Union[str, AIMessage]
+
+class ScriptedChatModel(BaseChatModel):
+    """Replays `script`, one entry per call.
+
+    Attributes:
+        script: Responses, as text or `AIMessage`s (to return tool calls).
+        chunk_chars: Characters per streamed chunk.
+        chunk_delay: Seconds to wait before each chunk (and per chunk of a non-streamed reply).
+    """
+    script: Sequence[ScriptEntry]
+    chunk_chars: int = 4
+    chunk_delay: float = 0.0
+    _position: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def reset(self) -> None:
+        """Restart the script from its first entry."""
+        with self._lock:
+            self._position = 0
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> ScriptedChatModel:
+        return self
+
+    def _next(self) -> AIMessage:
+        with self._lock:
+            entry = self.script[self._position % len(self.script)]
+            self._position += 1
+        return AIMessage(entry) if isinstance(entry, str) else entry.model_copy()
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._next()
+        if self.chunk_delay:
+            time.sleep(self.chunk_delay * max(1, len(str(message.content)) // self.chunk_chars))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._next()
+        text = str(message.content)
+        for start in range(0, len(text), self.chunk_chars):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(text[start:start + self.chunk_chars]))
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk("", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ]))
@@ -0,0 +1,486 @@
+"""An in-process mock CalDAV server for benchmarks.
+
+It implements the subset of WebDAV/CalDAV the clients in `src/` use: principal and calendar
+discovery (PROPFIND), `getctag`, `sync-collection`, `calendar-query` (UID text-match, COMPLETED
+is-not-defined and DUE time-range filters on VTODOs; UID text-match and time-range on VEVENTs), `calendar-multiget`, and GET/PUT/DELETE with
+If-Match/If-None-Match. Every request can be delayed by a fixed latency, the server can be made
+unavailable or require HTTP Basic credentials, and it counts requests and bytes so benchmarks
+can report I/O next to wall time.
+
+Usage:
+    with MockCalDAVServer(latency=0.005) as server:
+        server.add_calendar("work", generate_todos(1000))
+        client = dav.TaskDAVClient(url=server.url, username="bench", password="bench")
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlparse
+from xml.sax.saxutils import escape
+import base64
+import re
+import threading
+import time
+
+import icalendar
+import recurring_ical_events
+from lxml import etree
+
+from task_query import naive_datetime
+from todo_record import TodoRecord
+
+DAV = "DAV:"
+CALDAV = "urn:ietf:params:xml:ns:caldav"
+CS = "http://calendarserver.org/ns/"
+NSMAP = f'xmlns:d="{DAV}" xmlns:c="{CALDAV}" xmlns:cs="{CS}"'
+
+PRINCIPAL = "/principals/bench/"
+HOME = "/calendars/bench/"
+_UID = re.compile(r"^UID:(.*?)\r?$", re.MULTILINE)
+
+def generate_todos(count: int, now: Optional[datetime] = None, prefix: str = "task") -> list[str]:
+    """Generate `count` VTODOs: roughly half overdue, one in seven completed, some with descriptions."""
+    now = now or datetime.now()
+    todos = []
+    for i in range(count):
+        due = now + timedelta(hours=(i % 400) - 200)
+        lines = [
+            "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//EN",
+            "BEGIN:VTODO",
+            f"UID:{prefix}-{i}",
+            "DTSTAMP:20250101T120000Z",
+            f"SUMMARY:{prefix.capitalize()} number {i}",
+            f"PRIORITY:{i % 10}",
+            f"DUE:{due.strftime('%Y%m%dT%H%M%S')}",
+        ]
+        if i % 5 == 0:
+            lines.append("DESCRIPTION:Some details\\, with an escaped comma")
+        if i % 7 == 0:
+            lines += ["STATUS:COMPLETED", "COMPLETED:20250101T120000Z"]
+        else:
+            lines.append("STATUS:NEEDS-ACTION")
+        lines += ["END:VTODO", "END:VCALENDAR"]
+        todos.append("\r\n".join(lines) + "\r\n")
+    return todos
+
+def generate_events(count: int, now: Optional[datetime] = None, prefix: str = "event") -> list[str]:
+    """Generate `count` one-hour VEVENTs spread over working hours around `now`; one in ten recurs weekly."""
+    now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    events = []
+    for i in range(count):
+        start = now.replace(hour=9 + i % 8) + timedelta(days=(i // 8) % 120 - 30)
+        lines = [
+            "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//EN",
+            "BEGIN:VEVENT",
+            f"UID:{prefix}-{i}",
+            "DTSTAMP:20250101T120000Z",
+            f"SUMMARY:{prefix.capitalize()} number {i}",
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND:{(start + timedelta(hours=1)).strftime('%Y%m%dT%H%M%S')}",
+        ]
+        if i % 10 == 0:
+            lines.append("RRULE:FREQ=WEEKLY;COUNT=20")
+        lines += ["END:VEVENT", "END:VCALENDAR"]
+        events.append("\r\n".join(lines) + "\r\n")
+    return events
+
+class MockCalendar:
+    """One calendar collection: resources by name, with ETags and a change log for sync tokens."""
+
+    def __init__(self, calendar_id: str):
+        self.id = calendar_id
+        self.resources: dict[str, tuple[str, str]] = {}  # name -> (etag, data)
+        self.records: dict[str, Optional[TodoRecord]] = {}
+        self.changes: list[str] = []  # names, in order of change; the sync token is the length
+        self.lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return f"{HOME}{self.id}/"
+
+    @property
+    def ctag(self) -> str:
+        return f'"ctag-{len(self.changes)}"'
+
+    def put(self, name: str, data: str) -> str:
+        with self.lock:
+            self.changes.append(name)
+            etag = f'"{len(self.changes)}"'
+            self.resources[name] = (etag, data)
+            self.records.pop(name, None)
+            return etag
+
+    def delete(self, name: str) -> bool:
+        with self.lock:
+            if self.resources.pop(name, None) is None:
+                return False
+            self.records.pop(name, None)
+            self.changes.append(name)
+            return True
+
+    def record(self, name: str) -> Optional[TodoRecord]:
+        if name not in self.records:
+            self.records[name] = TodoRecord.from_ical(self.resources[name][1])
+        return self.records[name]
+
+class MockCalDAVServer:
+    """A threaded HTTP server serving `MockCalendar`s.
+
+    Args:
+        latency: Seconds every request is delayed by, to simulate a remote server.
+        sync_tokens: Whether `sync-collection` is supported; if not, clients fall back to CTags.
+        host: Interface to bind; the port is chosen automatically.
+        accounts: Passwords by username. If given, requests without matching Basic credentials
+            are answered with 401; otherwise any credentials are accepted.
+    """
+
+    def __init__(self, latency: float = 0.0, sync_tokens: bool = True, host: str = "127.0.0.1", accounts: Optional[dict[str, str]] = None):
+        self.latency = latency
+        self.accounts = accounts
+        # Set to False to answer every request with 503, simulating an outage.
+        self.available = True
+        self.sync_tokens = sync_tokens
+        self.calendars: dict[str, MockCalendar] = {}
+        self.counter_lock = threading.Lock()
+        self.reset_counters()
+        handler = type("Handler", (MockCalDAVHandler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer((host, 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self) -> MockCalDAVServer:
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def add_calendar(self, calendar_id: str, todos: Iterable[str] = ()) -> MockCalendar:
+        calendar = self.calendars[calendar_id] = MockCalendar(calendar_id)
+        for data in todos:
+            uid = _UID.search(data).group(1)
+            calendar.put(f"{uid}.ics", data)
+        return calendar
+
+    def reset_counters(self) -> None:
+        with self.counter_lock:
+            self.requests: dict[str, int] = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def counters(self) -> dict[str, int]:
+        with self.counter_lock:
+            return {
+                "requests": sum(self.requests.values()),
+                **{f"requests_{method.lower()}": n for method, n in sorted(self.requests.items())},
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+            }
+
+    def count(self, method: str, bytes_in: int, bytes_out: int) -> None:
+        with self.counter_lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+def _response(href: str, props: list[str], missing: Iterable[str] = (), status: Optional[str] = None) -> str:
+    if status is not None:
+        return f"<d:response><d:href>{escape(quote(href))}</d:href><d:status>HTTP/1.1 {status}</d:status></d:response>"
+    parts = [f"<d:response><d:href>{escape(quote(href))}</d:href>"]
+    if props:
+        parts.append(f"<d:propstat><d:prop>{''.join(props)}</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat>")
+    missing = list(missing)
+    if missing:
+        empty = "".join(f"<{_prefixed(tag)}/>" for tag in missing)
+        parts.append(f"<d:propstat><d:prop>{empty}</d:prop><d:status>HTTP/1.1 404 Not Found</d:status></d:propstat>")
+    parts.append("</d:response>")
+    return "".join(parts)
+
+def _prefixed(tag: str) -> str:
+    ns, _, local = tag[1:].partition("}")
+    return {DAV: "d", CALDAV: "c", CS: "cs"}.get(ns, "d") + ":" + local
+
+def _multistatus(responses: Iterable[str], sync_token: Optional[str] = None) -> bytes:
+    token = f"<d:sync-token>{sync_token}</d:sync-token>" if sync_token is not None else ""
+    return f'<?xml version="1.0" encoding="utf-8"?>\n<d:multistatus {NSMAP}>{"".join(responses)}{token}</d:multistatus>'.encode()
+
+class MockCalDAVHandler(BaseHTTPRequestHandler):
+    mock: MockCalDAVServer
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, Nagle's algorithm and delayed
+    # ACKs add ~40 ms to every keep-alive request.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def parse_request(self) -> bool:
+        if not super().parse_request():
+            return False
+        if not self.mock.available:
+            self._body()
+            self._send(503)
+            return False
+        if self.mock.accounts is not None and not self._authorized():
+            self._body()
+            self._send(401, headers={"WWW-Authenticate": 'Basic realm="mock"'})
+            return False
+        return True
+
+    def _authorized(self) -> bool:
+        scheme, _, encoded = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme.lower() != "basic":
+            return False
+        try:
+            username, _, password = base64.b64decode(encoded).decode().partition(":")
+        except ValueError:
+            return False
+        return username in self.mock.accounts and self.mock.accounts[username] == password
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[dict[str, str]] = None, bytes_in: int = 0) -> None:
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+        # Counted before the response is sent, so the counters are final once the client has it.
+        self.mock.count(self.command, bytes_in + len(self.requestline) + len(str(self.headers)), len(body))
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", "application/xml; charset=utf-8" if body.startswith(b"<?xml") else "text/calendar; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _locate(self) -> tuple[Optional[MockCalendar], Optional[str]]:
+        path = unquote(urlparse(self.path).path)
+        if not path.startswith(HOME):
+            return None, None
+        calendar_id, _, name = path[len(HOME):].partition("/")
+        return self.mock.calendars.get(calendar_id), name or None
+
+    def do_OPTIONS(self) -> None:
+        self._send(200, headers={"DAV": "1, 2, 3, calendar-access", "Allow": "OPTIONS, GET, PUT, DELETE, PROPFIND, REPORT"})
+
+    def do_GET(self) -> None:
+        calendar, name = self._locate()
+        if calendar is None or name is None or name not in calendar.resources:
+            return self._send(404)
+        etag, data = calendar.resources[name]
+        self._send(200, data.encode(), {"ETag": etag})
+
+    def do_PUT(self) -> None:
+        body = self._body()
+        calendar, name = self._locate()
+        if calendar is None or name is None:
+            return self._send(404, bytes_in=len(body))
+        with calendar.lock:
+            current = calendar.resources.get(name)
+        if_match = self.headers.get("If-Match")
+        if self.headers.get("If-None-Match") == "*" and current is not None:
+            return self._send(412, bytes_in=len(body))
+        if if_match is not None and (current is None or current[0] != if_match):
+            return self._send(412, bytes_in=len(body))
+        etag = calendar.put(name, body.decode())
+        self._send(204 if current is not None else 201, headers={"ETag": etag}, bytes_in=len(body))
+
+    def do_DELETE(self) -> None:
+        calendar, name = self._locate()
+        if calendar is None or name is None or not calendar.delete(name):
+            return self._send(404)
+        self._send(204)
+
+    def do_PROPFIND(self) -> None:
+        body = self._body()
+        requested = []
+        if body:
+            prop = etree.fromstring(body).find(f"{{{DAV}}}prop")
+            if prop is not None:
+                requested = [child.tag for child in prop]
+        depth = self.headers.get("Depth", "0")
+        path = unquote(urlparse(self.path).path)
+        calendar, name = self._locate()
+
+        if path in ("/", "") or path == PRINCIPAL:
+            responses = [self._props(path, requested, {
+                f"{{{DAV}}}current-user-principal": f"<d:current-user-principal><d:href>{PRINCIPAL}</d:href></d:current-user-principal>",
+                f"{{{CALDAV}}}calendar-home-set": f"<c:calendar-home-set><d:href>{HOME}</d:href></c:calendar-home-set>",
+                f"{{{DAV}}}resourcetype": "<d:resourcetype><d:collection/><d:principal/></d:resourcetype>" if path == PRINCIPAL else "<d:resourcetype><d:collection/></d:resourcetype>",
+            })]
+        elif path == HOME:
+            responses = [self._props(HOME, requested, {f"{{{DAV}}}resourcetype": "<d:resourcetype><d:collection/></d:resourcetype>"})]
+            if depth != "0":
+                responses += [self._props(c.path, requested, self._calendar_props(c)) for c in self.mock.calendars.values()]
+        elif calendar is not None and name is None:
+            responses = [self._props(calendar.path, requested, self._calendar_props(calendar))]
+            if depth != "0":
+                with calendar.lock:
+                    items = list(calendar.resources.items())
+                responses += [self._props(calendar.path + n, requested, self._resource_props(etag)) for n, (etag, _) in items]
+        elif calendar is not None and name in calendar.resources:
+            responses = [self._props(calendar.path + name, requested, self._resource_props(calendar.resources[name][0]))]
+        else:
+            return self._send(404, bytes_in=len(body))
+        self._send(207, _multistatus(responses), bytes_in=len(body))
+
+    def _calendar_props(self, calendar: MockCalendar) -> dict[str, str]:
+        props = {
+            f"{{{DAV}}}resourcetype": "<d:resourcetype><d:collection/><c:calendar/></d:resourcetype>",
+            f"{{{DAV}}}displayname": f"<d:displayname>{escape(calendar.id)}</d:displayname>",
+            f"{{{CS}}}getctag": f"<cs:getctag>{escape(calendar.ctag)}</cs:getctag>",
+            f"{{{CALDAV}}}supported-calendar-component-set": '<c:supported-calendar-component-set><c:comp name="VTODO"/><c:comp name="VEVENT"/></c:supported-calendar-component-set>',
+        }
+        if self.mock.sync_tokens:
+            props[f"{{{DAV}}}sync-token"] = f"<d:sync-token>{self._token(calendar)}</d:sync-token>"
+        return props
+
+    @staticmethod
+    def _resource_props(etag: str) -> dict[str, str]:
+        return {
+            f"{{{DAV}}}getetag": f"<d:getetag>{escape(etag)}</d:getetag>",
+            f"{{{DAV}}}resourcetype": "<d:resourcetype/>",
+            f"{{{DAV}}}getcontenttype": "<d:getcontenttype>text/calendar; charset=utf-8; component=VTODO</d:getcontenttype>",
+        }
+
+    @staticmethod
+    def _props(href: str, requested: list[str], known: dict[str, str]) -> str:
+        if not requested:
+            return _response(href, list(known.values()))
+        return _response(href, [known[t] for t in requested if t in known], [t for t in requested if t not in known])
+
+    @staticmethod
+    def _token(calendar: MockCalendar) -> str:
+        return f"http://mock/sync/{calendar.id}/{len(calendar.changes)}"
+
+    def do_REPORT(self) -> None:
+        body = self._body()
+        calendar, _ = self._locate()
+        if calendar is None:
+            return self._send(404, bytes_in=len(body))
+        root = etree.fromstring(body)
+        if root.tag == f"{{{DAV}}}sync-collection":
+            if not self.mock.sync_tokens:
+                return self._send(403, bytes_in=len(body))
+            result = self._sync_collection(calendar, root)
+        elif root.tag == f"{{{CALDAV}}}calendar-multiget":
+            hrefs = [unquote(urlparse(h.text).path) for h in root.iter(f"{{{DAV}}}href")]
+            result = self._resources(calendar, [h.rsplit("/", 1)[-1] for h in hrefs], root)
+        elif root.tag == f"{{{CALDAV}}}calendar-query":
+            with calendar.lock:
+                names = list(calendar.resources)
+            events = self._event_filter(root)
+            if events is not None:
+                matching = [n for n in names if events(calendar.resources[n][1])]
+            else:
+                matches = self._query_filter(root)
+                matching = [n for n in names if matches(calendar.record(n))]
+            result = self._resources(calendar, matching, root)
+        else:
+            return self._send(501, bytes_in=len(body))
+        if isinstance(result, int):
+            return self._send(result, bytes_in=len(body))
+        self._send(207, result, bytes_in=len(body))
+
+    def _sync_collection(self, calendar: MockCalendar, root) -> bytes | int:
+        token = root.findtext(f"{{{DAV}}}sync-token") or ""
+        with calendar.lock:
+            if token:
+                prefix = f"http://mock/sync/{calendar.id}/"
+                if not token.startswith(prefix):
+                    return 403
+                since = int(token[len(prefix):])
+                if since > len(calendar.changes):
+                    return 403
+                changed = list(dict.fromkeys(calendar.changes[since:]))
+            else:
+                changed = list(calendar.resources)
+            responses = [
+                _response(calendar.path + n, [f"<d:getetag>{escape(calendar.resources[n][0])}</d:getetag>"])
+                if n in calendar.resources else _response(calendar.path + n, [], status="404 Not Found")
+                for n in changed
+            ]
+            return _multistatus(responses, self._token(calendar))
+
+    def _resources(self, calendar: MockCalendar, names: list[str], root) -> bytes:
+        want_data = root.find(f".//{{{CALDAV}}}calendar-data") is not None
+        responses = []
+        for name in names:
+            resource = calendar.resources.get(name)
+            if resource is None:
+                responses.append(_response(calendar.path + name, [], status="404 Not Found"))
+                continue
+            props = [f"<d:getetag>{escape(resource[0])}</d:getetag>"]
+            if want_data:
+                props.append(f"<c:calendar-data>{escape(resource[1])}</c:calendar-data>")
+            responses.append(_response(calendar.path + name, props))
+        return _multistatus(responses)
+
+    @staticmethod
+    def _query_filter(root):
+        """Compile the VTODO prop-filters of a calendar-query into a predicate over records."""
+        vtodo = None
+        for comp in root.iter(f"{{{CALDAV}}}comp-filter"):
+            if comp.get("name") == "VTODO":
+                vtodo = comp
+        if vtodo is None:
+            return lambda record: False
+        checks = []
+        for prop in vtodo.findall(f"{{{CALDAV}}}prop-filter"):
+            name = prop.get("name").upper()
+            if prop.find(f"{{{CALDAV}}}is-not-defined") is not None:
+                checks.append(lambda r, name=name: r.get(name) is None)
+            text = prop.find(f"{{{CALDAV}}}text-match")
+            if text is not None:
+                checks.append(lambda r, name=name, value=text.text: str(r.get(name, "")) == value)
+            time_range = prop.find(f"{{{CALDAV}}}time-range")
+            if time_range is not None:
+                start = time_range.get("start")
+                end = time_range.get("end")
+                # Range bounds are UTC; records hold local wall times.
+                start = _local(start) if start else None
+                end = _local(end) if end else None
+
+                def in_range(r, name=name, start=start, end=end):
+                    value = naive_datetime(r.get(name))
+                    return value is not None and (start is None or value >= start) and (end is None or value < end)
+                checks.append(in_range)
+        return lambda record: record is not None and all(check(record) for check in checks)
+
+    @staticmethod
+    def _event_filter(root):
+        """Compile a VEVENT calendar-query (UID text-match, time-range) into a predicate over resource data, or None."""
+        vevent = None
+        for comp in root.iter(f"{{{CALDAV}}}comp-filter"):
+            if comp.get("name") == "VEVENT":
+                vevent = comp
+        if vevent is None:
+            return None
+        uid = vevent.findtext(f"{{{CALDAV}}}prop-filter/{{{CALDAV}}}text-match")
+        time_range = vevent.find(f"{{{CALDAV}}}time-range")
+
+        def matches(data: str) -> bool:
+            if "BEGIN:VEVENT" not in data:
+                return False
+            calendar = icalendar.Calendar.from_ical(data)
+            if uid is not None and not any(str(e.get("UID")) == uid for e in calendar.walk("VEVENT")):
+                return False
+            if time_range is not None:
+                start = _local(time_range.get("start")) if time_range.get("start") else datetime(1900, 1, 1)
+                end = _local(time_range.get("end")) if time_range.get("end") else datetime(2200, 1, 1)
+                return bool(recurring_ical_events.of(calendar).between(start, end))
+            return True
+        return matches
+
+def _local(value: str) -> datetime:
+    return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
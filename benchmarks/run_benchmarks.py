@@ -0,0 +1,158 @@
+"""Run the agent and CalDAV benchmarks against the mock server and a scripted model.
+
+For every calendar size, scenario and target, each iteration starts from a fresh client (and
+agent), so the numbers include the full cold-start I/O. Reported per combination:
+
+- latency percentiles (p50/p90/p99/max, in milliseconds) over the iterations
+- HTTP requests and kilobytes sent/received per iteration, as counted by the mock server
+- peak RSS of the process after the combination ran
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 100,1000] [--latency-ms 5] [--repeat 5]
+        [--scenarios list,overdue,bulk_update,conversation] [--targets dav,react,langgraph]
+        [--stream] [--json results.json]
+"""
+from __future__ import annotations
+from typing import Any, Callable
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import pathlib
+import resource
+import sys
+import time
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from langgraph.checkpoint.memory import MemorySaver
+
+import dav
+import llama_agent
+from fake_llm import ScriptedChatModel
+from mock_caldav import MockCalDAVServer, generate_todos
+from scenarios import SCENARIOS, Scenario
+
+USERNAME = PASSWORD = "bench"
+REACT_TOOLS = [
+    "calendar_list_ids", "task_list_by_calendar", "task_list_overdue", "task_list_page",
+    "task_mark_complete", "task_update_priority",
+]
+
+def use_bench_config(url: str) -> types.ModuleType:
+    """Install a `config` module pointing at the mock server, so no local config.py is needed."""
+    config = types.ModuleType("config")
+    config.caldav_url = url
+    config.caldav_username = USERNAME
+    config.caldav_password = PASSWORD
+    config.ai_model = "scripted"
+    config.checkpoint_db = ""
+    sys.modules["config"] = config
+    return config
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def make_runner(target: str, scenario: Scenario, url: str, stream: bool) -> Callable[[], Any]:
+    """Build a fresh client (and agent) and return a function running the scenario once."""
+    client = dav.TaskDAVClient(url=url, username=USERNAME, password=PASSWORD)
+    if target == "dav":
+        return lambda: scenario.direct(client)
+
+    if target == "react":
+        agent = llama_agent.ReActAgent(ScriptedChatModel(script=scenario.react_script()))
+        for name in REACT_TOOLS:
+            agent.add_tool(getattr(client, name))
+
+        def run_react():
+            for turn in scenario.turns:
+                if stream:
+                    for _ in agent.stream_agent(turn):
+                        pass
+                else:
+                    agent.invoke_agent(turn)
+        return run_react
+
+    prebuilt = importlib.import_module("run-prebuilt")
+    agent = prebuilt.build_agent(
+        client, model=ScriptedChatModel(script=scenario.graph_script()), checkpointer=MemorySaver()
+    )
+
+    def run_graph():
+        for turn in scenario.turns:
+            agent.invoke(prebuilt.build_full_prompt(client, turn), {"configurable": {"thread_id": "bench"}})
+    return run_graph
+
+def run_combination(server: MockCalDAVServer, target: str, scenario: Scenario, repeat: int, stream: bool) -> dict[str, Any]:
+    latencies = []
+    counters: dict[str, int] = {}
+    for _ in range(repeat):
+        runner = make_runner(target, scenario, server.url, stream)
+        server.reset_counters()
+        # The agents print their prompts and history; keep that out of the report.
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            runner()
+            latencies.append((time.perf_counter() - start) * 1000)
+        for key, value in server.counters().items():
+            counters[key] = counters.get(key, 0) + value
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies),
+        "requests": counters.get("requests", 0) / repeat,
+        "kb_sent": counters.get("bytes_in", 0) / repeat / 1024,
+        "kb_received": counters.get("bytes_out", 0) / repeat / 1024,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def print_table(rows: list[dict[str, Any]]) -> None:
+    columns = ["size", "scenario", "target", "p50_ms", "p90_ms", "p99_ms", "max_ms", "requests", "kb_sent", "kb_received", "peak_rss_mb"]
+    cells = [[f"{row[c]:.1f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(r, widths)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated VTODO counts of the work calendar (e.g. 100,1000,10000,50000).")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Delay added to every CalDAV request.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--targets", default="dav,react,langgraph")
+    parser.add_argument("--stream", action="store_true", help="Drive ReActAgent through stream_agent.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        with MockCalDAVServer(latency=args.latency_ms / 1000) as server:
+            use_bench_config(server.url)
+            server.add_calendar("work", generate_todos(size))
+            server.add_calendar("home", generate_todos(max(10, size // 10), prefix="home"))
+            for name in args.scenarios.split(","):
+                for target in args.targets.split(","):
+                    result = run_combination(server, target, SCENARIOS[name], args.repeat, args.stream)
+                    rows.append({"size": size, "scenario": name, "target": target, **result})
+                    print(f"{size:>6} {name:<13} {target:<10} p50={result['p50_ms']:.1f}ms", file=sys.stderr)
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark scenarios, each runnable against three targets.
+
+- `dav`: the `TaskDAVClient` tool methods called directly, measuring the CalDAV layer alone.
+- `react`: `ReActAgent` driven by a scripted model, measuring prompt building and tool dispatch too.
+- `langgraph`: the prebuilt LangGraph agent from `run-prebuilt.py`, driven by a scripted model.
+
+Each scenario lists the user turns and, per agent, the scripted model responses for them.
+"""
+from __future__ import annotations
+from typing import Any, Callable
+from dataclasses import dataclass, field
+
+from langchain_core.messages import AIMessage
+
+import dav
+
+BULK_TASKS = [f"task-{i}" for i in range(1, 21)]
+
+def _tool_call(name: str, args: dict[str, Any], n: int) -> dict[str, Any]:
+    return {"name": name, "args": args, "id": f"call-{name}-{n}"}
+
+def _react_step(*calls: tuple[str, dict[str, Any]]) -> str:
+    lines = ["Thought: I need the tool results."]
+    for name, args in calls:
+        lines += [f"Tool: {name}", f"Tool Input: {args!r}"]
+    return "\n".join(lines)
+
+def _graph_step(*calls: tuple[str, dict[str, Any]]) -> AIMessage:
+    return AIMessage("", tool_calls=[_tool_call(name, args, n) for n, (name, args) in enumerate(calls)])
+
+def _react_answer(text: str) -> str:
+    return f"Thought: I have what I need.\nFinal Answer: {text}"
+
+@dataclass
+class Scenario:
+    """A benchmark scenario.
+
+    Attributes:
+        name: Short name used on the command line and in reports.
+        direct: Runs the scenario with plain client calls.
+        turns: The user messages sent to the agents, in order.
+        steps: Per turn, the tool calls the scripted model makes (one list per model step).
+        answers: Per turn, the final answer text.
+    """
+    name: str
+    direct: Callable[[dav.TaskDAVClient], Any]
+    turns: list[str]
+    steps: list[list[list[tuple[str, dict[str, Any]]]]]
+    answers: list[str] = field(default_factory=list)
+
+    def react_script(self) -> list[str]:
+        script = []
+        for steps, answer in zip(self.steps, self.answers):
+            script += [_react_step(*calls) for calls in steps]
+            script.append(_react_answer(answer))
+        return script
+
+    def graph_script(self) -> list[AIMessage]:
+        script = []
+        for steps, answer in zip(self.steps, self.answers):
+            script += [_graph_step(*calls) for calls in steps]
+            script.append(AIMessage(answer))
+        return script
+
+def _bulk_update(client: dav.TaskDAVClient) -> Any:
+    return client.tasks_apply([
+        {"calendar_id": "work", "task_id": task_id, "fields": {"priority": 1}} for task_id in BULK_TASKS
+    ])
+
+def _conversation(client: dav.TaskDAVClient) -> Any:
+    client.calendar_list_ids()
+    client.task_list_overdue("work")
+    client.task_list_page("work", sort_by="priority")
+    client.task_mark_complete("work", "task-3")
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario(
+            name="list",
+            direct=lambda client: client.task_list_by_calendar("work"),
+            turns=["List my work tasks."],
+            steps=[[[("task_list_by_calendar", {"calendar_id": "work"})]]],
+            answers=["Here are your work tasks."],
+        ),
+        Scenario(
+            name="overdue",
+            direct=lambda client: client.task_list_overdue("work"),
+            turns=["What is overdue at work?"],
+            steps=[[[("task_list_overdue", {"calendar_id": "work"})]]],
+            answers=["These tasks are overdue."],
+        ),
+        Scenario(
+            name="bulk_update",
+            direct=_bulk_update,
+            turns=[f"Set the priority of {', '.join(BULK_TASKS)} to 1."],
+            steps=[[[("task_update_priority", {"calendar_id": "work", "task_id": task_id, "priority": 1}) for task_id in BULK_TASKS]]],
+            answers=["Done."],
+        ),
+        Scenario(
+            name="conversation",
+            direct=_conversation,
+            turns=[
+                "Which calendars do I have?",
+                "What is overdue at work?",
+                "Show my most important work tasks.",
+                "Mark task-3 as done.",
+            ],
+            steps=[
+                [[("calendar_list_ids", {})]],
+                [[("task_list_overdue", {"calendar_id": "work"})]],
+                [[("task_list_page", {"calendar_id": "work", "sort_by": "priority"})]],
+                [[("task_mark_complete", {"calendar_id": "work", "task_id": "task-3"})]],
+            ],
+            answers=["work, home", "These tasks are overdue.", "Here they are.", "Done."],
+        ),
+    ]
+}
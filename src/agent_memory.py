@@ -0,0 +1,188 @@
+"""
+This module provides memory policies that bound the history `ReActAgent` sends to the model.
+
+A policy is asked to `compact` the history before each model call. Compaction uses high/low
+water marks: nothing changes until the history grows past `max_tokens`, and then it is cut
+down to `target_tokens` in one go. Between compactions the history only grows by appending,
+so the rendered prompt prefix stays stable and the model server can keep reusing its KV cache.
+
+Compaction happens in stages, cheapest first:
+
+1. Tool outputs older than the most recent `keep_recent` messages are replaced by short digests.
+2. The oldest exchanges are dropped, one user turn at a time. If a summarizer is configured,
+   dropped messages are folded into a rolling summary that is kept at the start of the history.
+3. If the exchange in progress alone is still too big, its tool outputs are digested as well.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+
+import chatml
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+TOOL_OUTPUT_PREFIX = "Tool Output: "
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+# Ends a digested tool output, so it is not digested again.
+DIGEST_SUFFIX = " more characters omitted]"
+
+History = list[tuple[str, str]]
+# Called with the previous summary (or "") and the messages being dropped; returns the new summary.
+Summarizer = Callable[[str, History], str]
+
+def history_tokens(history: History) -> int:
+    """Estimate the prompt size of a history, including the ChatML role tags."""
+    return sum(estimate_tokens(msg) + 4 for _, msg in history)
+
+def digest_tool_output(text: str, max_tokens: int) -> str:
+    """
+    Shorten a `Tool Output:` message to its first `max_tokens` (approximately).
+
+    Args:
+        text: The history message
+        max_tokens: Size to cut the output down to
+
+    Returns:
+        The message, truncated with a note of how much was left out
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit + len(TOOL_OUTPUT_PREFIX) or text.endswith(DIGEST_SUFFIX):
+        return text
+    body = text[len(TOOL_OUTPUT_PREFIX):]
+    return f"{TOOL_OUTPUT_PREFIX}{body[:limit]}... [{len(body) - limit}{DIGEST_SUFFIX}"
+
+class MemoryPolicy:
+    """Keeps the full history. Subclasses override `compact` to bound it."""
+
+    def compact(self, history: History) -> History:
+        """
+        Return the history to send to the model.
+
+        Policies must return `history` itself when they leave it unchanged, so the caller can
+        tell whether its rendered prompt is still valid.
+        """
+        return history
+
+class SlidingWindowMemory(MemoryPolicy):
+    """
+    Token-counted sliding window over the history, with digests of old tool outputs and an
+    optional rolling summary of what fell out of the window.
+
+    Args:
+        max_tokens: Compact once the history grows past this size (high water mark)
+        target_tokens: Size to compact down to (low water mark); defaults to half of `max_tokens`
+        keep_recent: Number of most recent messages whose tool outputs are kept in full
+        tool_output_tokens: Size of the digest an older tool output is cut down to
+        summarizer: Optional callable producing a rolling summary of dropped messages
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        target_tokens: Optional[int] = None,
+        keep_recent: int = 6,
+        tool_output_tokens: int = 100,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        if target_tokens is None:
+            target_tokens = max_tokens // 2
+        if not 0 < target_tokens <= max_tokens:
+            raise ValueError("`target_tokens` must be positive and no larger than `max_tokens`")
+        self.max_tokens = max_tokens
+        self.target_tokens = target_tokens
+        self.keep_recent = keep_recent
+        self.tool_output_tokens = tool_output_tokens
+        self.summarizer = summarizer
+        self.summary = ""
+
+    def compact(self, history: History) -> History:
+        if history_tokens(history) <= self.max_tokens:
+            return history
+
+        original = history
+        if history and history[0][1].startswith(SUMMARY_PREFIX):
+            history = history[1:]
+        recent_start = max(0, len(history) - self.keep_recent)
+        compacted = [
+            (role, digest_tool_output(msg, self.tool_output_tokens))
+            if i < recent_start and msg.startswith(TOOL_OUTPUT_PREFIX) else (role, msg)
+            for i, (role, msg) in enumerate(history)
+        ]
+
+        # Drop whole exchanges (a user message and everything up to the next one), oldest first,
+        # but never the exchange in progress.
+        # `ReActAgent` records tool outputs and answers as assistant messages, so only the
+        # user's questions start an exchange.
+        starts = [i for i, (role, _) in enumerate(compacted) if role == "user"]
+        cut = 0
+        for start in starts[1:]:
+            if history_tokens(compacted[cut:]) <= self.target_tokens:
+                break
+            cut = start
+        dropped, compacted = history[:cut], compacted[cut:]
+
+        # The exchange in progress alone may still be too big; digest its tool outputs too, oldest first.
+        for i, (role, msg) in enumerate(compacted):
+            if history_tokens(compacted) <= self.max_tokens:
+                break
+            if msg.startswith(TOOL_OUTPUT_PREFIX):
+                compacted[i] = (role, digest_tool_output(msg, self.tool_output_tokens))
+
+        if dropped and self.summarizer is not None:
+            self.summary = self.summarizer(self.summary, dropped)
+        if self.summary:
+            compacted.insert(0, ("system", SUMMARY_PREFIX + self.summary))
+        if compacted == original:
+            # Nothing left to drop or shorten; keep the prompt as it is instead of compacting every step.
+            return original
+        return compacted
+
+class ModelSummarizer:
+    """
+    Summarizer that asks the chat model itself for a rolling summary.
+
+    Args:
+        model: The LangChain chat model, invoked with a ChatML prompt string
+        max_tokens: Approximate size the summary should stay within
+    """
+
+    def __init__(self, model, max_tokens: int = 300):
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def __call__(self, summary: str, dropped: History) -> str:
+        lines = [f"{role}: {digest_tool_output(msg, self.max_tokens)}" for role, msg in dropped]
+        request = "\n".join([
+            f"Summarize this conversation in at most {self.max_tokens * CHARS_PER_TOKEN // 6} words.",
+            "Keep task IDs, calendar IDs, dates and decisions; drop everything else.",
+            f"Earlier summary: {summary or '(none)'}",
+            "Conversation:",
+            *lines,
+        ])
+        response = self.model.invoke(chatml.chatml_prompt(next_user_prompt=request))
+        return str(response.content).strip()
+
+def memory_from_config(config, model=None) -> MemoryPolicy:
+    """
+    Build the memory policy described by the `memory_*` settings of a config module.
+
+    Args:
+        config: Module (or object) with optional `memory_max_tokens`, `memory_target_tokens`,
+            `memory_keep_recent`, `memory_tool_output_tokens` and `memory_summarize` attributes
+        model: Chat model used for summaries when `memory_summarize` is set
+
+    Returns:
+        `MemoryPolicy` keeping the full history if `memory_max_tokens` is unset or 0,
+        otherwise a `SlidingWindowMemory`
+    """
+    max_tokens = getattr(config, "memory_max_tokens", 0)
+    if not max_tokens:
+        return MemoryPolicy()
+    summarizer = None
+    if getattr(config, "memory_summarize", False) and model is not None:
+        summarizer = ModelSummarizer(model)
+    return SlidingWindowMemory(
+        max_tokens=max_tokens,
+        target_tokens=getattr(config, "memory_target_tokens", None),
+        keep_recent=getattr(config, "memory_keep_recent", 6),
+        tool_output_tokens=getattr(config, "memory_tool_output_tokens", 100),
+        summarizer=summarizer,
+    )
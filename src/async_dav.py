@@ -0,0 +1,593 @@
+"""
+This module provides `AsyncTaskDAVClient`, an asyncio counterpart of `dav.TaskDAVClient` with the same tools.
+
+It talks CalDAV directly over a pooled, keep-alive `httpx.AsyncClient`, and fans out to calendars
+concurrently so cross-calendar questions ("what's overdue everywhere?") take roughly one round
+trip instead of one per calendar. The number of requests in flight is bounded by `max_concurrency`.
+
+Unlike `TaskDAVClient` it keeps no local task store: every read is a filtered `calendar-query`
+REPORT, so only matching tasks are transferred.
+
+It also moves whole calendars of tasks in and out: `tasks_export` streams them in batches, and
+`tasks_import` pipelines their PUTs over the pooled connections (see `run-bulk.py`).
+
+Example:
+    async with AsyncTaskDAVClient(url, username, password) as client:
+        overdue = await client.task_list_overdue_all()
+"""
+from __future__ import annotations
+from typing import Any, AsyncIterator, Iterable, Optional
+from datetime import datetime
+from urllib.parse import quote, urljoin
+import asyncio
+import uuid
+
+import httpx
+import icalendar
+from caldav.davclient import DAVResponse
+from caldav.elements import cdav, dav
+from caldav.lib import error
+
+from bulk import ExportWriter, ImportProgress, read_tasks
+from dav import (
+    CalendarNotFound, TaskConflict, TaskNotFound,
+    apply_resource_fields, serialize_ical_todo, todo_sort_key,
+)
+from task_listing import DEFAULT_LIMIT, paginate
+from task_query import TaskQuery
+from sync_worker import RETRY_STATUSES
+from task_store import MULTIGET_BATCH_SIZE, CachedTask, extract_uid, xml_body
+
+class AsyncTaskDAVClient:
+    """An asyncio DAV client for managing tasks in CalDAV calendars.
+
+    Args:
+        url: The CalDAV server URL.
+        username: Username for basic authentication.
+        password: Password for basic authentication.
+        max_concurrency: Maximum number of requests in flight (also the connection pool size).
+        timeout: Request timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+    ):
+        self.url = url if url.endswith("/") else url + "/"
+        self.http = httpx.AsyncClient(
+            auth=(username, password) if username else None,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=timeout,
+        )
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._calendars: Optional[dict[str, str]] = None
+        self._calendars_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> AsyncTaskDAVClient:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self.http.aclose()
+
+    async def request(self, method: str, url: str, body: Optional[bytes | str] = None, headers: Optional[dict[str, str]] = None) -> DAVResponse:
+        """Send a request, waiting for a free concurrency slot first.
+
+        Args:
+            method: The HTTP method.
+            url: Absolute URL or a path relative to the server URL.
+            body: The request body.
+            headers: Extra request headers.
+
+        Returns:
+            DAVResponse: The parsed response.
+        """
+        async with self.semaphore:
+            response = await self.http.request(method, urljoin(self.url, url), content=body, headers=headers)
+        return DAVResponse(response)
+
+    async def _xml_request(self, method: str, url: str, root, depth: int) -> DAVResponse:
+        response = await self.request(
+            method, url, xml_body(root),
+            {"Depth": str(depth), "Content-Type": 'application/xml; charset="utf-8"'},
+        )
+        if response.status >= 400:
+            raise error.exception_by_method[method.lower()](error.errmsg(response))
+        return response
+
+    async def _propfind_href(self, url: str, prop) -> str:
+        response = await self._xml_request("PROPFIND", url, dav.Propfind() + (dav.Prop() + prop), 0)
+        for props in response.expand_simple_props([prop]).values():
+            if props.get(prop.tag):
+                return props[prop.tag]
+        raise error.PropfindError(f"{url} has no {prop.tag}")
+
+    async def get_calendars_by_id(self) -> dict[str, str]:
+        """Return a dictionary of calendar URLs by their ID, discovering them on first use.
+
+        Returns:
+            dict[str, str]: A dictionary mapping calendar IDs to calendar URLs.
+        """
+        async with self._calendars_lock:
+            if self._calendars is None:
+                principal = await self._propfind_href(self.url, dav.CurrentUserPrincipal())
+                home = await self._propfind_href(principal, cdav.CalendarHomeSet())
+                response = await self._xml_request(
+                    "PROPFIND", home, dav.Propfind() + (dav.Prop() + [dav.DisplayName(), dav.ResourceType()]), 1
+                )
+                found = response.expand_simple_props([dav.DisplayName()], [dav.ResourceType()])
+                self._calendars = {}
+                for href, props in found.items():
+                    cal_id = href.rstrip("/").split("/")[-1]
+                    if cal_id and cdav.Calendar.tag in props.get(dav.ResourceType.tag, []):
+                        self._calendars[cal_id] = urljoin(self.url, quote(href))
+            return self._calendars
+
+    async def get_calendar_url(self, calendar_id: str) -> str:
+        """Get a calendar URL by its ID or raise CalendarNotFound.
+
+        Args:
+            calendar_id: The ID of the calendar to retrieve.
+
+        Returns:
+            str: The calendar URL.
+
+        Raises:
+            CalendarNotFound: If the calendar ID is not found.
+        """
+        all_calendars = await self.get_calendars_by_id()
+        if calendar_id in all_calendars:
+            return all_calendars[calendar_id]
+        raise CalendarNotFound(f"Argument `calendar_id` must be one of: {', '.join(all_calendars.keys())}")
+
+    async def query(self, calendar_id: str, query: TaskQuery) -> list[CachedTask]:
+        """Run a filtered `calendar-query` REPORT on one calendar.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            query: The filter, also re-checked locally for servers that ignore it.
+
+        Returns:
+            list[CachedTask]: The matching tasks, ordered by due date and priority.
+        """
+        url = await self.get_calendar_url(calendar_id)
+        response = await self._xml_request("REPORT", url, query.to_xml(), 1)
+        tasks = []
+        for href, props in response.expand_simple_props([dav.GetEtag(), cdav.CalendarData()]).items():
+            data = props.get(cdav.CalendarData.tag)
+            uid = extract_uid(data) if data else None
+            if uid is None:
+                continue
+            task = CachedTask(uid, href, props.get(dav.GetEtag.tag), data)
+            if query.matches(task.record):
+                tasks.append(task)
+        tasks.sort(key=lambda t: todo_sort_key(t.record))
+        return tasks
+
+    async def _fetch(self, calendar_id: str, task_id: str) -> CachedTask:
+        tasks = await self.query(calendar_id, TaskQuery(uid=task_id, include_completed=True))
+        if not tasks:
+            raise TaskNotFound(f"No task exists with ID {task_id} inside calendar with ID {calendar_id}.")
+        return tasks[0]
+
+    async def _put(self, calendar_id: str, url: str, data: str, headers: dict[str, str]) -> None:
+        response = await self.request("PUT", url, data, {"Content-Type": 'text/calendar; charset="utf-8"', **headers})
+        if response.status == 412:
+            raise TaskConflict(f"Task at {url} in calendar {calendar_id} was changed by someone else; fetch it again.")
+        if response.status not in (200, 201, 204):
+            raise error.PutError(error.errmsg(response))
+
+    async def _gather_by_calendar(self, method, calendar_ids: Optional[list[str]]) -> dict[str, Any]:
+        calendar_ids = calendar_ids or [*(await self.get_calendars_by_id()).keys()]
+        results = await asyncio.gather(*(method(calendar_id) for calendar_id in calendar_ids))
+        return dict(zip(calendar_ids, results))
+
+    async def calendar_list_ids(self) -> list[str]:
+        """List all accessible calendar IDs.
+
+        Args:
+            None
+
+        Returns:
+            list[str]: A list of calendar identifiers.
+        """
+        return [*(await self.get_calendars_by_id()).keys()]
+
+    async def task_get_by_id(self, calendar_id: str, task_id: str) -> dict[str, Any]:
+        """Retrieve a task from a calendar by its UID.
+
+        Args:
+            calendar_id: The ID of the calendar to search.
+            task_id: The UID of the task to retrieve.
+
+        Returns:
+            dict[str, Any]: The serialized task.
+
+        Raises:
+            TaskNotFound: If no task with the given ID exists in the calendar.
+        """
+        return (await self._fetch(calendar_id, task_id)).record.to_dict()
+
+    async def task_list_by_calendar(self, calendar_id: str) -> list[dict[str, Any]]:
+        """List all tasks within a specific calendar.
+
+        Args:
+            calendar_id: The ID of the calendar.
+
+        Returns:
+            list[dict[str, Any]]: A list of serialized task data.
+        """
+        return [t.record.to_dict() for t in await self.query(calendar_id, TaskQuery())]
+
+    async def task_list_overdue(self, calendar_id: str) -> list[dict[str, Any]]:
+        """List all tasks within a specific calendar that are overdue.
+
+        Args:
+            calendar_id: The ID of the calendar.
+
+        Returns:
+            list[dict[str, Any]]: A list of serialized task data.
+        """
+        return [t.record.to_dict() for t in await self.query(calendar_id, TaskQuery.overdue())]
+
+    async def task_list_page(self, calendar_id: str, limit: int = DEFAULT_LIMIT, cursor: Optional[str] = None, fields: Optional[list[str]] = None, sort_by: str = "due", max_tokens: Optional[int] = None, overdue_only: bool = False) -> dict[str, Any]:
+        """List one page of a calendar's pending tasks in a compact row format.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            limit: Maximum number of tasks to return.
+            cursor: The next_cursor value of the previous page, to continue a listing.
+            fields: Columns to include. Defaults to UID, SUMMARY, DUE and PRIORITY.
+            sort_by: Sort order: due, dtstart, priority or summary.
+            max_tokens: Approximate maximum size of the output in tokens.
+            overdue_only: Only list overdue tasks.
+
+        Returns:
+            dict[str, Any]: `fields`, `rows`, `total` and `next_cursor`, as for `TaskDAVClient.task_list_page`.
+        """
+        tasks = await self.query(calendar_id, TaskQuery.overdue() if overdue_only else TaskQuery())
+        return paginate([t.record for t in tasks], limit, cursor, fields, sort_by, max_tokens)
+
+    async def task_list_all(self, calendar_ids: Optional[list[str]] = None) -> dict[str, list[dict[str, Any]]]:
+        """List the tasks of several calendars at once.
+
+        Args:
+            calendar_ids: The calendars to list. Defaults to all calendars.
+
+        Returns:
+            dict[str, list[dict[str, Any]]]: Serialized tasks by calendar ID.
+        """
+        return await self._gather_by_calendar(self.task_list_by_calendar, calendar_ids)
+
+    async def task_list_overdue_all(self, calendar_ids: Optional[list[str]] = None) -> dict[str, list[dict[str, Any]]]:
+        """List the overdue tasks of several calendars at once.
+
+        Args:
+            calendar_ids: The calendars to list. Defaults to all calendars.
+
+        Returns:
+            dict[str, list[dict[str, Any]]]: Serialized overdue tasks by calendar ID.
+        """
+        return await self._gather_by_calendar(self.task_list_overdue, calendar_ids)
+
+    async def task_add_to_calendar(self, calendar_id: str, summary: str, priority: Optional[int] = 5, due: Optional[datetime] = None) -> dict[str, Any]:
+        """Add a new task (VTODO component) to the specified calendar.
+
+        Args:
+            calendar_id: The name of the calendar.
+            summary: The summary/title of the task.
+            priority: The priority of the task (default 5).
+            due: The due date/time for the task.
+
+        Returns:
+            dict[str, Any]: The serialized task.
+        """
+        url = await self.get_calendar_url(calendar_id)
+        todo = icalendar.Todo()
+        todo.add('uid', str(uuid.uuid4()))
+        todo.add('dtstamp', datetime.now())
+        todo.add('summary', summary)
+        if priority is not None:
+            todo.add('priority', priority)
+        if due:
+            todo.add('due', due)
+        cal = icalendar.Calendar()
+        cal.add('prodid', '-//caldav-agent//EN')
+        cal.add('version', '2.0')
+        cal.add_component(todo)
+        await self._put(calendar_id, urljoin(url, quote(f"{todo['UID']}.ics")), cal.to_ical().decode(), {"If-None-Match": "*"})
+        return serialize_ical_todo(todo)
+
+    async def task_update(self, calendar_id: str, task_id: str, **fields: Any) -> dict[str, Any]:
+        """Change several fields of a task with one fetch and one save.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            **fields: New values by field name, as for `TaskDAVClient.task_update`.
+
+        Returns:
+            dict[str, Any]: The serialized task after the update.
+
+        Raises:
+            TaskNotFound: If no task with the given ID exists in the calendar.
+            TaskConflict: If the task changed on the server while it was being updated.
+            ValueError: If a field name or value is invalid.
+        """
+        cached = await self._fetch(calendar_id, task_id)
+        calendar = icalendar.Calendar.from_ical(cached.data)
+        todo = apply_resource_fields(calendar, fields)
+        if "SEQUENCE" in todo:
+            todo["SEQUENCE"] = int(todo.pop("SEQUENCE")) + 1
+        await self._put(calendar_id, quote(cached.href), calendar.to_ical().decode(), {"If-Match": cached.etag} if cached.etag else {})
+        return serialize_ical_todo(todo)
+
+    async def tasks_apply(self, changes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Apply field changes to many tasks concurrently, saving each task once.
+
+        Args:
+            changes: A list of changes, each a dict with `calendar_id`, `task_id` and `fields`.
+
+        Returns:
+            list[dict[str, Any]]: One result per change, in order, shaped like `TaskDAVClient.tasks_apply` results.
+        """
+        merged: dict[tuple[str, str], dict[str, Any]] = {}
+        for change in changes:
+            merged.setdefault((change['calendar_id'], change['task_id']), {}).update(change.get('fields') or {})
+
+        async def apply(calendar_id: str, task_id: str, fields: dict[str, Any]) -> dict[str, Any]:
+            try:
+                return {'status': 'updated', 'task': await self.task_update(calendar_id, task_id, **fields)}
+            except TaskNotFound as e:
+                return {'status': 'not_found', 'message': str(e)}
+            except TaskConflict as e:
+                return {'status': 'conflict', 'message': str(e)}
+            except (ValueError, TypeError) as e:
+                return {'status': 'invalid', 'message': str(e)}
+            except (CalendarNotFound, error.DAVError, httpx.HTTPError) as e:
+                return {'status': 'error', 'message': str(e)}
+
+        outcomes = await asyncio.gather(*(apply(c, t, f) for (c, t), f in merged.items()))
+        outcome = dict(zip(merged.keys(), outcomes))
+        return [
+            {'calendar_id': change['calendar_id'], 'task_id': change['task_id'], **outcome[(change['calendar_id'], change['task_id'])]}
+            for change in changes
+        ]
+
+    async def task_mark_complete(self, calendar_id: str, task_id: str) -> None:
+        """Mark the task as complete.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, completed=True)
+
+    async def task_mark_incomplete(self, calendar_id: str, task_id: str) -> None:
+        """Mark a previously completed task as incomplete.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, completed=False)
+
+    async def task_update_summary(self, calendar_id: str, task_id: str, summary: str) -> None:
+        """Set the summary (title) of the task.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            summary: The summarized description of the task.
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, summary=summary)
+
+    async def task_update_priority(self, calendar_id: str, task_id: str, priority: Optional[int]) -> None:
+        """Set the priority of the task.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            priority: The numeric priority. If set to None, the task is marked as unprioritized.
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, priority=priority)
+
+    async def task_update_due_date(self, calendar_id: str, task_id: str, due_date: Optional[datetime]) -> None:
+        """Set the due date of the task.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            due_date: The due-date. If None is specified, the due date is removed.
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, due=due_date)
+
+    async def task_update_description(self, calendar_id: str, task_id: str, description: Optional[str]) -> None:
+        """Set the task description.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            description: The description to the task.
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, description=description)
+
+    async def task_update_start_date(self, calendar_id: str, task_id: str, dtstart: Optional[datetime]) -> None:
+        """Set when the task started.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            dtstart: The starting date and time for the task.
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, dtstart=dtstart)
+
+    async def task_update_end_date(self, calendar_id: str, task_id: str, dtend: Optional[datetime]) -> None:
+        """Set when the task ends.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            dtend: The ending date and time for the task.
+
+        Returns:
+            None
+        """
+        await self.task_update(calendar_id, task_id, dtend=dtend)
+
+    async def _multiget(self, url: str, hrefs: list[str]) -> list[str]:
+        root = (
+            cdav.CalendarMultiGet()
+            + (dav.Prop() + [dav.GetEtag(), cdav.CalendarData()])
+            + [dav.Href(value=quote(href)) for href in hrefs]
+        )
+        response = await self._xml_request("REPORT", url, root, 1)
+        found = response.expand_simple_props([dav.GetEtag(), cdav.CalendarData()])
+        return [props[cdav.CalendarData.tag] for props in found.values() if props.get(cdav.CalendarData.tag)]
+
+    async def tasks_export(self, calendar_id: str, format: str = "ics", batch_size: int = MULTIGET_BATCH_SIZE) -> AsyncIterator[str]:
+        """Stream every task of a calendar, including completed ones, in one of the `bulk` formats.
+
+        Only the hrefs are listed up front; the tasks are downloaded with `calendar-multiget`
+        REPORTs of `batch_size` hrefs, the next batch while the current one is written out, so
+        at most two batches are held in memory.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            format: "ics" (one iCalendar object) or "jsonl" (one JSON object per task and line).
+            batch_size: Number of tasks downloaded per request.
+
+        Returns:
+            AsyncIterator[str]: The export, in chunks of one task each (plus a header and footer for `ics`).
+        """
+        writer = ExportWriter(format)
+        url = await self.get_calendar_url(calendar_id)
+        listing = cdav.CalendarQuery() + [
+            dav.Prop() + dav.GetEtag(),
+            cdav.Filter() + (cdav.CompFilter("VCALENDAR") + cdav.CompFilter("VTODO")),
+        ]
+        response = await self._xml_request("REPORT", url, listing, 1)
+        hrefs = list(response.expand_simple_props([dav.GetEtag()]))
+        del response
+
+        if writer.header():
+            yield writer.header()
+        batches = [hrefs[start:start + batch_size] for start in range(0, len(hrefs), batch_size)]
+        pending = asyncio.create_task(self._multiget(url, batches[0])) if batches else None
+        try:
+            for i in range(len(batches)):
+                assert pending is not None
+                resources = await pending
+                pending = asyncio.create_task(self._multiget(url, batches[i + 1])) if i + 1 < len(batches) else None
+                for data in resources:
+                    chunk = writer.task(data)
+                    if chunk:
+                        yield chunk
+        finally:
+            if pending is not None:
+                pending.cancel()
+        if writer.footer():
+            yield writer.footer()
+
+    async def tasks_import(self, calendar_id: str, source: Iterable[str], progress: Optional[ImportProgress] = None, overwrite: bool = False, retries: int = 3) -> dict[str, Any]:
+        """Save the tasks of an export (in either `bulk` format) into a calendar.
+
+        The source is read as the tasks are sent, and up to twice `max_concurrency` PUTs are
+        kept in flight, so memory use does not grow with the size of the source. A PUT that fails
+        with a network or server error is retried with exponential backoff.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            source: The exported text, line by line, e.g. an open file.
+            progress: Where to record how far the import got; tasks it records as saved are skipped.
+            overwrite: Replace tasks that already exist; otherwise they are left as they are.
+            retries: Further attempts of a PUT that failed with a network or server error.
+
+        Returns:
+            dict[str, Any]: The numbers of tasks `created`, `existing` (left alone) and `resumed`
+                (skipped as recorded by `progress`), and the tasks that `failed`, with their UID and error.
+        """
+        url = await self.get_calendar_url(calendar_id)
+        progress = progress or ImportProgress(None, calendar_id)
+        summary: dict[str, Any] = {"created": 0, "existing": 0, "resumed": 0, "failed": []}
+        window = 2 * self.max_concurrency
+        pending: set[asyncio.Task] = set()
+
+        def collect(done: Iterable[asyncio.Task]) -> None:
+            for task in done:
+                index, uid, outcome = task.result()
+                if outcome in ("created", "existing"):
+                    summary[outcome] += 1
+                    progress.saved(index)
+                else:
+                    summary["failed"].append({"uid": uid, "message": outcome})
+
+        try:
+            for index, (uid, data) in enumerate(read_tasks(source)):
+                if index < progress.done:
+                    summary["resumed"] += 1
+                    continue
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                pending.add(asyncio.create_task(self._import_task(url, index, uid, data, overwrite, retries)))
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                collect(done)
+        finally:
+            for task in pending:
+                task.cancel()
+            progress.save()
+        return summary
+
+    async def _import_task(self, url: str, index: int, uid: str, data: str, overwrite: bool, retries: int) -> tuple[int, str, str]:
+        """PUT one imported task; returns its index, UID and "created", "existing" or an error message."""
+        headers = {"Content-Type": 'text/calendar; charset="utf-8"'}
+        if not overwrite:
+            headers["If-None-Match"] = "*"
+        target = urljoin(url, quote(f"{uid}.ics", safe=""))
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt))
+            try:
+                response = await self.request("PUT", target, data, headers)
+            except httpx.HTTPError as e:
+                message = f"{type(e).__name__}: {e}"
+                continue
+            if response.status in (200, 201, 204):
+                return index, uid, "created"
+            if response.status == 412:
+                return index, uid, "existing"
+            message = error.errmsg(response).strip()
+            if response.status < 500 and response.status not in RETRY_STATUSES:
+                break
+        return index, uid, message
@@ -0,0 +1,231 @@
+"""
+This module provides the formats of bulk task export and import (see `AsyncTaskDAVClient.tasks_export`
+and `tasks_import`), working on streams so a collection never has to be held in memory at once.
+
+Two formats are supported:
+
+- `ics`: one iCalendar object holding every VTODO. Each time zone definition is written once,
+  before the first task that uses it.
+- `jsonl`: one JSON object per line, with the task's `uid`, its iCalendar resource as `data`, and
+  its fields as `task`.
+
+`read_tasks` turns either format back into one resource per task, re-attaching the time zones each
+task refers to. Components are found with a line scan, without parsing them.
+
+`ImportProgress` records how far an import got, so an interrupted import can be resumed without
+sending again what was already saved.
+"""
+from __future__ import annotations
+from typing import Iterable, Iterator, Optional
+import itertools
+import json
+import os
+
+from todo_record import TodoRecord
+from task_store import extract_uid
+
+FORMATS = ("ics", "jsonl")
+CALENDAR_HEADER = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//caldav-agent//EN\r\n"
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+def iter_components(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Find the top-level components of one or more iCalendar objects.
+
+    Args:
+        lines: The iCalendar text, line by line (with or without line endings).
+
+    Returns:
+        Iterator[tuple[str, str]]: The name (e.g. VTODO) and the text, with CRLF line endings, of each
+            component directly inside a VCALENDAR. Properties of the VCALENDAR itself are skipped.
+    """
+    depth = 0
+    name = ""
+    block: list[str] = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        upper = line[:6].upper()
+        if upper == "BEGIN:":
+            depth += 1
+            if depth == 2:
+                name = line[6:].strip().upper()
+                block = []
+        elif upper[:4] == "END:":
+            if depth >= 2:
+                block.append(line)
+            if depth == 2:
+                yield name, "\r\n".join(block) + "\r\n"
+            depth = max(0, depth - 1)
+            continue
+        if depth >= 2:
+            block.append(line)
+
+def component_tzid(block: str) -> Optional[str]:
+    """Return the TZID of a VTIMEZONE component."""
+    for line in block.splitlines():
+        if line.upper().startswith("TZID"):
+            return line.split(":", 1)[-1].strip()
+    return None
+
+def uses_tzid(block: str, tzid: str) -> bool:
+    """Whether a component refers to a time zone."""
+    return f"TZID={tzid}" in block or f'TZID="{tzid}"' in block
+
+class ExportWriter:
+    """
+    Writes exported tasks in one of the `FORMATS`, one chunk per task.
+
+    Args:
+        format: "ics" or "jsonl".
+    """
+
+    def __init__(self, format: str = "ics"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format `{format}`; use one of: {', '.join(FORMATS)}")
+        self.format = format
+        self._timezones: set[str] = set()
+
+    def header(self) -> str:
+        return CALENDAR_HEADER if self.format == "ics" else ""
+
+    def footer(self) -> str:
+        return CALENDAR_FOOTER if self.format == "ics" else ""
+
+    def task(self, data: str) -> str:
+        """
+        Format one task resource.
+
+        Returns:
+            str: The chunk to write; empty if the resource holds no VTODO.
+        """
+        uid = extract_uid(data)
+        if uid is None:
+            return ""
+        if self.format == "jsonl":
+            return json.dumps({"uid": uid, "data": data, "task": TodoRecord.from_ical(data).to_dict()}, default=str) + "\n"
+        chunks = []
+        for name, block in iter_components(data.splitlines()):
+            if name == "VTIMEZONE":
+                tzid = component_tzid(block)
+                if tzid in self._timezones:
+                    continue
+                if tzid is not None:
+                    self._timezones.add(tzid)
+            elif name != "VTODO":
+                continue
+            chunks.append(block)
+        return "".join(chunks)
+
+def read_tasks(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Read exported tasks back, in either format, one resource per task.
+
+    In `ics` input, the VTODOs of a recurring task and its changed occurrences must follow each
+    other (as `ExportWriter` writes them); time zone definitions must come before their first use.
+
+    Args:
+        lines: The exported text, line by line, e.g. an open file.
+
+    Returns:
+        Iterator[tuple[str, str]]: The UID and iCalendar resource of each task, in input order.
+
+    Raises:
+        ValueError: If a line of `jsonl` input holds no task.
+    """
+    lines = iter(lines)
+    first = next((line for line in lines if line.strip()), None)
+    if first is None:
+        return
+    lines = itertools.chain([first], lines)
+    if first.lstrip().startswith("{"):
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            data = entry.get("data") if isinstance(entry, dict) else None
+            uid = entry.get("uid") or extract_uid(data) if data else None
+            if not data or not uid:
+                raise ValueError(f"Line {number} holds no task `data`.")
+            yield uid, data
+        return
+
+    timezones: dict[str, str] = {}
+    uid: Optional[str] = None
+    todos: list[str] = []
+    for name, block in iter_components(lines):
+        if name == "VTIMEZONE":
+            tzid = component_tzid(block)
+            if tzid is not None:
+                timezones[tzid] = block
+            continue
+        if name != "VTODO":
+            continue
+        block_uid = extract_uid(block)
+        if block_uid is None:
+            continue
+        if todos and block_uid != uid:
+            yield uid, _resource(todos, timezones)  # type: ignore[misc]
+            todos = []
+        uid = block_uid
+        todos.append(block)
+    if todos:
+        yield uid, _resource(todos, timezones)  # type: ignore[misc]
+
+def _resource(todos: list[str], timezones: dict[str, str]) -> str:
+    used = [block for tzid, block in timezones.items() if any(uses_tzid(todo, tzid) for todo in todos)]
+    return CALENDAR_HEADER + "".join(used) + "".join(todos) + CALENDAR_FOOTER
+
+class ImportProgress:
+    """
+    How far an import got: the number of tasks at the start of the source that are saved.
+
+    Tasks are saved out of order, so the count only moves past a task once every task before it
+    is saved too; a task that failed holds it until a later run saves it.
+
+    Args:
+        path: JSON file the progress is kept in, or None to not keep it.
+        calendar_id: The calendar imported into; a progress file of another calendar is refused.
+        save_every: Number of saved tasks after which the file is rewritten.
+
+    Raises:
+        ValueError: If the progress file belongs to an import into another calendar.
+    """
+
+    def __init__(self, path: Optional[str], calendar_id: str, save_every: int = 100):
+        self.path = path
+        self.calendar_id = calendar_id
+        self.save_every = save_every
+        self.done = 0
+        self._saved: set[int] = set()
+        self._unsaved = 0
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("calendar_id") != calendar_id:
+                raise ValueError(f"{path} records an import into calendar {state.get('calendar_id')}, not {calendar_id}.")
+            self.done = int(state.get("done", 0))
+
+    def saved(self, index: int) -> None:
+        """Record that the task at `index` of the source is on the server."""
+        self._saved.add(index)
+        while self.done in self._saved:
+            self._saved.discard(self.done)
+            self.done += 1
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self) -> None:
+        """Write the progress file, atomically."""
+        self._unsaved = 0
+        if self.path is None:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump({"calendar_id": self.calendar_id, "done": self.done}, f)
+        os.replace(temporary, self.path)
+
+    def remove(self) -> None:
+        """Delete the progress file, once the import is complete."""
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
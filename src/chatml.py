@@ -38,19 +38,72 @@ def chatml_prompt(
     Returns:
         Full prompt string
     """
-    blocks = [BEGIN]
+    return PromptBuilder(system).extend(history).render(next_user_prompt)
 
-    if system:
-        blocks.append(chatml_block("system", system))
 
-    for role, msg in history:
-        blocks.append(chatml_block(role, msg))
+class PromptBuilder:
+    """
+    Builds a ChatML-style prompt incrementally.
+
+    Each block is rendered once, when it is appended, and the rendered prefix only ever grows
+    by appending. A prompt rendered after more history is appended therefore starts with the
+    exact bytes of every earlier prompt, which lets Ollama/llama.cpp reuse their KV cache for
+    the shared prefix instead of re-evaluating the whole conversation each turn.
 
-    if next_user_prompt:
-        blocks.append(chatml_block("user", sanitize_chatml_input(next_user_prompt)))
-        blocks.append(chatml_role("assistant"))  # model's next turn to generate
+    Args:
+        system: System instruction text (optional)
+    """
 
-    return "\n".join(blocks).strip()
+    def __init__(self, system: str = ""):
+        self.system = system
+        self.blocks = 0
+        self._prefix = BEGIN
+        if system:
+            self._prefix += "\n" + chatml_block("system", system)
+
+    @property
+    def prefix(self) -> str:
+        """The rendered system prompt and history; stable byte-for-byte as blocks are appended."""
+        return self._prefix
+
+    def append(self, role: str, content: str) -> "PromptBuilder":
+        """Render one message and append it to the prefix."""
+        self._prefix += "\n" + chatml_block(role, content)
+        self.blocks += 1
+        return self
+
+    def extend(self, history: list[tuple[str, str]]) -> "PromptBuilder":
+        """Append several (role, message) tuples."""
+        for role, msg in history:
+            self.append(role, msg)
+        return self
+
+    def render(self, next_user_prompt: str = "") -> str:
+        """
+        Render the full prompt, as `chatml_prompt` would for the same system prompt and history.
+
+        Args:
+            next_user_prompt: Final user input for the model to respond to (optional)
+
+        Returns:
+            Full prompt string
+        """
+        if not next_user_prompt:
+            return self._prefix
+        return "\n".join([
+            self._prefix,
+            chatml_block("user", sanitize_chatml_input(next_user_prompt)),
+            chatml_role("assistant"),
+        ])
+
+    def render_for_generation(self) -> str:
+        """
+        Render the prefix followed by the assistant role tag, cueing the model's next turn.
+
+        Once the reply is appended as an assistant block, this prompt is an exact prefix of
+        the next one, since every block starts with its role tag.
+        """
+        return self._prefix + "\n" + chatml_role("assistant")
 
 
 
@@ -4,22 +4,44 @@ It includes functionality to add, update, and retrieve tasks, as well as to list
 
 TODO: 
 - Implement error handling for network issues.
-- Add support for recurring tasks.
 - Implement task deletion (or preferably, marking as deleted or archived).
-- Calendar event management (VEVENT components) could be added in the future.
+
+With a `TaskReplica`, the client works offline-first: tasks are read from the replica and changes
+are applied locally at once and pushed by a background `SyncWorker` (see the `task_replica` and
+`sync_worker` modules), so tool calls do not wait for the server.
+
+Events (VEVENT components) are served from a per-calendar `CalendarEvents` window, which also
+answers free/busy and free-slot queries; see the `event_store` module.
 
 This is designed to be used with the LangChain framework, allowing for integration with AI models and tools.
 See the `tools` module for LangChain tool definitions that utilize this client.
 """
 from __future__ import annotations
-from typing import Annotated, Any, List, Optional, cast
-from datetime import datetime
-from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, cast
+from datetime import datetime, time, timedelta, timezone
+import contextlib
+import threading
+import uuid
+from urllib.parse import quote, unquote
 
 import caldav
 import icalendar
-import vobject
-from langchain_core.tools import InjectedToolArg
+from caldav.davclient import DAVResponse
+from caldav.lib import error
+
+from discovery_cache import DiscoveryCache
+from event_store import CalendarEvents, EventOccurrence, format_moment, free_slots, local_datetime, merge_intervals
+from memo import DEFAULT_MAXSIZE, DEFAULT_TTL, MemoCache, invalidates, memoized
+from task_listing import DEFAULT_LIMIT, SORT_KEYS, paginate
+from recurrence import DONE_STATUSES, RecurrenceSeries
+from task_query import TaskQuery, naive_datetime
+from task_store import CachedTask, CalendarTaskStore
+from todo_record import TodoRecord
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from sync_worker import SyncWorker
+    from task_replica import TaskReplica
 
 class CalendarNotFound(Exception):
     """Raised when a calendar is not found by ID."""
@@ -29,6 +51,36 @@ class TaskNotFound(Exception):
     """Raised when a task is not found by UID in a calendar."""
     pass
 
+class TaskConflict(Exception):
+    """Raised when a task changed on the server since it was fetched (an `If-Match` precondition failed)."""
+    pass
+
+class EventNotFound(Exception):
+    """Raised when an event is not found by UID in a calendar."""
+    pass
+
+class EventConflict(Exception):
+    """Raised when an event changed on the server since it was fetched (an `If-Match` precondition failed)."""
+    pass
+
+# Events are fetched for at least this many days from the start of a query, so nearby queries
+# are answered from the same window.
+EVENT_WINDOW_DAYS = 31
+
+# Field names accepted by `TaskDAVClient.task_update`, mapped to their iCalendar property.
+TASK_FIELDS = {
+    'summary': 'SUMMARY',
+    'priority': 'PRIORITY',
+    'due': 'DUE',
+    'due_date': 'DUE',
+    'description': 'DESCRIPTION',
+    'dtstart': 'DTSTART',
+    'start_date': 'DTSTART',
+    'dtend': 'DTEND',
+    'end_date': 'DTEND',
+}
+DATETIME_PROPERTIES = ('DUE', 'DTSTART', 'DTEND')
+
 def serialize_ical_todo(input_todo: icalendar.Todo) -> dict[str, Any]:
     """Serialize an icalendar.Todo object to a dictionary, removing tzinfo and microseconds from datetimes.
 
@@ -55,29 +107,230 @@ def serialize_ical_todo(input_todo: icalendar.Todo) -> dict[str, Any]:
             result[k] = v
     return result
 
+def todo_sort_key(todo: icalendar.Todo | TodoRecord) -> tuple[str, int]:
+    """Sort key ordering tasks by due date, then priority, as `caldav.Calendar.todos()` does.
+
+    Args:
+        todo (icalendar.Todo | TodoRecord): The VTODO component or its record.
+
+    Returns:
+        tuple[str, int]: The sort key.
+    """
+    due = todo.get("DUE")
+    priority = todo.get("PRIORITY")
+    return (
+        getattr(due, "dt", due).strftime("%F%H%M%S") if due is not None else "2050-01-01",
+        int(priority) if priority is not None else 0,
+    )
+
+def apply_task_fields(todo: icalendar.Todo, fields: dict[str, Any]) -> None:
+    """Apply field changes to a VTODO component in memory.
+
+    Args:
+        todo (icalendar.Todo): The component to modify.
+        fields (dict[str, Any]): Field names from `TASK_FIELDS` (or `completed`) mapped to new values.
+            A value of None removes the property; datetimes may be given as ISO strings.
+
+    Raises:
+        ValueError: If a field name is unknown or a value cannot be converted.
+    """
+    for name, value in fields.items():
+        if name == 'completed':
+            todo.pop('STATUS', None)
+            todo.pop('COMPLETED', None)
+            if value:
+                todo.add('STATUS', 'COMPLETED')
+                todo.add('COMPLETED', datetime.now(timezone.utc))
+            else:
+                todo.add('STATUS', 'NEEDS-ACTION')
+            continue
+        if name not in TASK_FIELDS:
+            raise ValueError(f"Unknown task field `{name}`; must be one of: completed, {', '.join(TASK_FIELDS)}")
+        prop = TASK_FIELDS[name]
+        todo.pop(prop, None)
+        if value is None:
+            continue
+        if prop in DATETIME_PROPERTIES and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        elif prop == 'PRIORITY':
+            value = int(value)
+        todo.add(prop, value)
+
+# Properties of a recurring master that an occurrence override does not copy.
+SERIES_PROPERTIES = ("RRULE", "RDATE", "EXDATE", "RECURRENCE-ID", "DTSTART", "DUE", "STATUS", "COMPLETED")
+
+def apply_resource_fields(calendar: icalendar.Calendar, fields: dict[str, Any]) -> icalendar.Todo:
+    """Apply field changes to the task of a calendar resource in memory, as `apply_task_fields` does.
+
+    Completing a recurring task completes only its current occurrence, through an override
+    component (RFC 5545), so the series goes on with the next occurrence; reopening it reopens
+    the last completed occurrence. Every other change applies to the master VTODO.
+
+    Args:
+        calendar (icalendar.Calendar): The resource to modify.
+        fields (dict[str, Any]): As for `apply_task_fields`.
+
+    Returns:
+        icalendar.Todo: The master VTODO.
+
+    Raises:
+        ValueError: If a field name is unknown or a value cannot be converted.
+    """
+    todos = list(calendar.walk("VTODO"))
+    master = next((c for c in todos if "RECURRENCE-ID" not in c), todos[0])
+    if 'completed' in fields and set_occurrence_completed(calendar, master, bool(fields['completed'])):
+        fields = {name: value for name, value in fields.items() if name != 'completed'}
+    apply_task_fields(master, fields)
+    return master
+
+def set_occurrence_completed(calendar: icalendar.Calendar, master: icalendar.Todo, completed: bool) -> bool:
+    """Complete the current occurrence of a recurring task, or reopen the last completed one.
+
+    Returns:
+        bool: Whether an occurrence was changed. False if the task does not recur, its master
+            is completed or cancelled as a whole, or no occurrence is left to change; the
+            master's status is then changed as for any other task.
+    """
+    if ("RRULE" not in master and "RDATE" not in master) or str(master.get('STATUS', '')).upper() in DONE_STATUSES:
+        return False
+    overrides = {
+        naive_datetime(c['RECURRENCE-ID']): c
+        for c in calendar.walk("VTODO") if c is not master and "RECURRENCE-ID" in c
+    }
+    if completed:
+        start = RecurrenceSeries(calendar.to_ical().decode()).current_start()
+        if start is None:
+            return False
+        override = overrides.get(start)
+        if override is None:
+            override = occurrence_override(master, start)
+            calendar.add_component(override)
+    else:
+        done = [moment for moment, c in overrides.items() if str(c.get('STATUS', '')).upper() == 'COMPLETED']
+        if not done:
+            return False
+        override = overrides[max(done)]
+    apply_task_fields(override, {'completed': completed})
+    return True
+
+def occurrence_override(master: icalendar.Todo, start: datetime) -> icalendar.Todo:
+    """An override of the occurrence of `master` starting at `start` (a naive wall time), with the master's other properties."""
+    def like(prop, moment: datetime):
+        # The same value type and time zone as the master's property.
+        value = prop.dt
+        return moment.replace(tzinfo=value.tzinfo) if isinstance(value, datetime) else moment.date()
+
+    override = icalendar.Todo()
+    for name, value in master.items():
+        if name not in SERIES_PROPERTIES:
+            override[name] = value
+    anchor = master.get('DTSTART') or master.get('DUE')
+    override.add('RECURRENCE-ID', like(anchor, start))
+    if 'DTSTART' in master:
+        override.add('DTSTART', like(master['DTSTART'], start))
+    if 'DUE' in master:
+        due = start + (naive_datetime(master['DUE']) - naive_datetime(anchor))
+        override.add('DUE', like(master['DUE'], due))
+    return override
+
 class TaskDAVClient(caldav.DAVClient):
-    """A DAV client for managing tasks in CalDAV calendars."""
+    """A DAV client for managing tasks in CalDAV calendars.
 
-    def update_field(self, task:caldav.Todo, field_name, field_value):
-        v = cast(vobject.base.Component, task.vobject_instance)
-        if field_value is None:
-            if hasattr(v.vtodo, field_name):
-                delattr(v.vtodo, field_name)
-        else:
-            getattr(v.vtodo, field_name).value = field_value
+    Tasks are read through a per-calendar `CalendarTaskStore`, which is refreshed incrementally
+    from the server and updated write-through whenever this client saves a task.
+
+    Given a `replica`, the stores are restored from it instead, and only refreshed by the sync
+    worker (see `start_sync`); saving a task queues the change instead of sending it.
+
+    Given a `discovery_cache`, the calendars found by an earlier process are used at once and
+    revalidated in the background (see the `discovery_cache` module).
+    """
+
+    def __init__(self, *args, memo_ttl: float = DEFAULT_TTL, memo_maxsize: int = DEFAULT_MAXSIZE, replica: Optional[TaskReplica] = None, discovery_cache: Optional[DiscoveryCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Results of read-only tools; see the `memo` module.
+        self.memo = MemoCache(ttl=memo_ttl, maxsize=memo_maxsize)
+        self.replica = replica
+        self.discovery_cache = discovery_cache
+        self._revalidating = threading.Lock()
+        self.sync_worker: Optional[SyncWorker] = None
+        self._task_stores: dict[str, CalendarTaskStore] = {}
+        self._event_stores: dict[str, CalendarEvents] = {}
+        # Tool calls may run concurrently; writes to the same task are serialized.
+        self._task_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._task_locks_guard = threading.Lock()
+
+    def request(self, url: str, method: str = "GET", body: str | bytes = "", headers: Optional[dict[str, str]] = None) -> DAVResponse:
+        """Send one HTTP request, traced as an `http.request` span with its status and sizes."""
+        with tracer.span("http.request", method=method, url=str(url)) as span:
+            response = super().request(url, method, body, headers)
+            span.set(status=response.status)
+            span.count(
+                bytes_sent=len(body.encode() if isinstance(body, str) else body or b""),
+                bytes_received=len(getattr(response, "_raw", b"") or b""),
+            )
+            return response
+
+    def close(self) -> None:
+        if self.sync_worker is not None:
+            self.sync_worker.stop()
+        super().close()
 
-    @lru_cache()
+    @memoized(ttl=300)
     def get_calendars_by_id(self) -> dict[str, caldav.Calendar]:
         """Return a dictionary of calendars by their ID.
 
+        With a replica, the calendars it knows are used without asking the server. Otherwise the
+        calendars in the discovery cache are used, if any, while they are revalidated in the background.
+
         Returns:
             dict[str, caldav.Calendar]: A dictionary mapping calendar IDs to Calendar objects.
         """
-        return dict(
-            (c.id, c)
-            for c in self.principal().calendars()
-            if c.id is not None
-        )
+        if self.replica is not None:
+            urls = self.replica.calendars()
+            if urls:
+                return self._calendars(urls)
+        elif self.discovery_cache is not None:
+            urls = self.discovery_cache.load()
+            if urls:
+                self._revalidate_calendars()
+                return self._calendars(urls)
+        return self.refresh_calendars()
+
+    def _calendars(self, urls: dict[str, str]) -> dict[str, caldav.Calendar]:
+        return {calendar_id: caldav.Calendar(self, url=url, id=calendar_id) for calendar_id, url in urls.items()}
+
+    def refresh_calendars(self) -> dict[str, caldav.Calendar]:
+        """Discover the calendars on the server, recording them in the replica or discovery cache if there is one."""
+        with tracer.span("calendar.discover"):
+            calendars = dict(
+                (c.id, c)
+                for c in self.principal().calendars()
+                if c.id is not None
+            )
+        urls = {calendar_id: str(c.url) for calendar_id, c in calendars.items()}
+        if self.replica is not None:
+            self.replica.save_calendars(urls)
+            self.memo.invalidate()
+        elif self.discovery_cache is not None and self.discovery_cache.save(urls):
+            self.memo.invalidate()
+        return calendars
+
+    def _revalidate_calendars(self) -> None:
+        """Rediscover the calendars in a daemon thread, unless that is already running."""
+        if not self._revalidating.acquire(blocking=False):
+            return
+
+        def revalidate() -> None:
+            try:
+                self.refresh_calendars()
+            except Exception:
+                # The cached calendars stay in use; the next call with an empty memo cache retries.
+                pass
+            finally:
+                self._revalidating.release()
+
+        threading.Thread(target=revalidate, name="discovery", daemon=True).start()
 
     def get_calendar_by_id(self, calendar_id: str) -> caldav.Calendar:
         """Get a calendar by its ID or raise CalendarNotFound.
@@ -92,11 +345,265 @@ class TaskDAVClient(caldav.DAVClient):
             CalendarNotFound: If the calendar ID is not found.
         """
         all_calendars = self.get_calendars_by_id()
+        if calendar_id not in all_calendars and self.replica is None and self.discovery_cache is not None:
+            # The cached calendars may predate the calendar; ask the server before giving up.
+            all_calendars = self.refresh_calendars()
         if calendar_id in all_calendars:
             return all_calendars[calendar_id]
         raise CalendarNotFound(f"Argument `calendar_id` must be one of: {', '.join(all_calendars.keys())}")
 
-    def task_get_by_id(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str) -> caldav.Todo:
+    def task_store(self, calendar_id: str, refresh: bool = True) -> CalendarTaskStore:
+        """Return the local task store for a calendar, brought up to date with the server.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            refresh: Whether to fetch changes from the server before returning.
+
+        Returns:
+            CalendarTaskStore: The store holding the calendar's tasks.
+
+        Raises:
+            CalendarNotFound: If the calendar ID is not found.
+        """
+        store = self._store(calendar_id)
+        if self.replica is not None:
+            # Offline-first: the sync worker refreshes the store; only a calendar that was never
+            # downloaded is loaded here.
+            if not store.loaded:
+                self.pull(calendar_id)
+        elif refresh:
+            store.refresh()
+        return store
+
+    def _store(self, calendar_id: str) -> CalendarTaskStore:
+        store = self._task_stores.get(calendar_id)
+        if store is None:
+            store = CalendarTaskStore(self.get_calendar_by_id(calendar_id))
+            if self.replica is not None:
+                store.track_changes()
+                self.replica.restore(calendar_id, store)
+            store = self._task_stores.setdefault(calendar_id, store)
+        return store
+
+    def pull(self, calendar_id: str) -> bool:
+        """Refresh a calendar's store from the server and write the changes to the replica.
+
+        Returns:
+            bool: Whether anything changed.
+        """
+        store = self._store(calendar_id)
+        # The store takes its lock only to apply the changes, so tools are not kept waiting.
+        store.refresh()
+        changed = self.replica.persist(calendar_id, store) if self.replica is not None else True
+        if changed:
+            self.memo.invalidate(calendar_id)
+        return changed
+
+    def start_sync(self, interval: float = 30, retry_base: float = 1, retry_max: float = 300) -> SyncWorker:
+        """Start the background worker pushing queued changes and pulling server changes; see `SyncWorker`."""
+        from sync_worker import SyncWorker
+
+        if self.sync_worker is None:
+            self.sync_worker = SyncWorker(self, interval, retry_base, retry_max).start()
+        return self.sync_worker
+
+    def queue_task(self, calendar_id: str, task: CachedTask, create: bool = False) -> None:
+        """Apply a change to the local store and queue it for the server (offline-first mode).
+
+        Args:
+            calendar_id: The ID of the calendar holding the task.
+            task: The new version of the task; its `etag` is the server version it is based on.
+            create: Whether the task is new.
+        """
+        assert self.replica is not None
+        store = self.task_store(calendar_id, refresh=False)
+        with store.lock:
+            store.pinned.add(task.uid)
+            store.put(task)
+            self.replica.enqueue(calendar_id, store, task, create)
+        if self.sync_worker is not None:
+            self.sync_worker.wake()
+
+    def event_store(self, calendar_id: str, start: datetime, end: datetime) -> CalendarEvents:
+        """Return the local events of a calendar, loaded for a window covering `[start, end)`.
+
+        A window loaded less than `memo.ttl` seconds ago is reused. Otherwise the events from
+        the start of the day of `start` until `end` (but at least `EVENT_WINDOW_DAYS` days) are
+        fetched with one REPORT.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            start: Start of the range that will be queried.
+            end: End of the range that will be queried.
+
+        Returns:
+            CalendarEvents: The calendar's events in a window covering the range.
+
+        Raises:
+            CalendarNotFound: If the calendar ID is not found.
+        """
+        events = self._event_stores.get(calendar_id)
+        if events is None:
+            events = CalendarEvents(self.get_calendar_by_id(calendar_id))
+            events = self._event_stores.setdefault(calendar_id, events)
+        with events.lock:
+            if not events.covers(start, end, self.memo.ttl):
+                window_start = datetime.combine(start.date(), time())
+                events.load(window_start, max(end, window_start + timedelta(days=EVENT_WINDOW_DAYS)))
+        return events
+
+    def find_event(self, calendar_id: str, event_id: str) -> tuple[CalendarEvents, str, Optional[str], str]:
+        """Find an event resource by UID.
+
+        Returns:
+            tuple[CalendarEvents, str, Optional[str], str]: The calendar's events, and the event's
+                href, ETag and iCalendar text.
+
+        Raises:
+            CalendarNotFound: If the calendar ID is not found.
+            EventNotFound: If no event with the given ID exists in the calendar.
+        """
+        events = self._event_stores.get(calendar_id)
+        if events is None:
+            events = self._event_stores.setdefault(calendar_id, CalendarEvents(self.get_calendar_by_id(calendar_id)))
+        found = events.find(event_id)
+        if found is None:
+            raise EventNotFound(f"No event exists with ID {event_id} inside calendar with ID {calendar_id}.")
+        return (events, *found)
+
+    def busy_intervals(self, start: datetime, end: datetime, calendar_ids: Optional[list[str]] = None) -> list[tuple[datetime, datetime]]:
+        """Return the merged busy time of several calendars within `[start, end)`, clipped to the range."""
+        intervals = []
+        for calendar_id in calendar_ids or self.calendar_list_ids():
+            for occurrence in self.event_store(calendar_id, start, end).overlapping(start, end):
+                if occurrence.busy and occurrence.end > occurrence.start:
+                    intervals.append((max(start, occurrence.start), min(end, occurrence.end)))
+        return merge_intervals(intervals)
+
+    @contextlib.contextmanager
+    def locked_tasks(self, keys: Iterable[tuple[str, str]]) -> Iterator[None]:
+        """Hold the write locks of several tasks while a block runs.
+
+        Locks are acquired in sorted order, so concurrent callers locking overlapping sets of
+        tasks cannot deadlock.
+
+        Args:
+            keys: (calendar_id, task_id) pairs of the tasks to lock.
+        """
+        with self._task_locks_guard:
+            locks = [self._task_locks.setdefault(key, threading.Lock()) for key in sorted(set(keys))]
+        with contextlib.ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            yield
+
+    def save_task(self, calendar_id: str, task: caldav.Todo, if_match: Optional[str] = None) -> None:
+        """Save a modified task to the server and write it through to the local store.
+
+        With a replica, the task is only saved locally and queued; the sync worker pushes it
+        with `if_match` and reports a conflict through `task_sync_status`.
+
+        Args:
+            calendar_id: The ID of the calendar holding the task.
+            task: The task to save.
+            if_match: The ETag the task was fetched with. If given, the save only succeeds when
+                the task has not changed on the server since.
+
+        Raises:
+            TaskConflict: If the task changed on the server since `if_match` was fetched.
+            caldav.error.PutError: If the server rejects the update.
+        """
+        component = task.icalendar_component
+        if "SEQUENCE" in component:
+            component["SEQUENCE"] = int(component.pop("SEQUENCE")) + 1
+        if self.replica is not None:
+            self.queue_task(calendar_id, CachedTask(str(task.id), unquote(task.url.path), if_match, task.data))
+            return
+        headers = {"Content-Type": 'text/calendar; charset="utf-8"'}
+        if if_match:
+            headers["If-Match"] = if_match
+        response = self.put(str(task.url), task.data, headers)
+        if response.status == 412:
+            raise TaskConflict(f"Task {task.id} in calendar {calendar_id} was changed by someone else; fetch it again.")
+        if response.status not in (200, 201, 204):
+            raise caldav.error.PutError(caldav.lib.error.errmsg(response))
+        # Servers only return an ETag when they stored the data unmodified; otherwise the
+        # next refresh notices the unknown ETag and downloads the task again.
+        etag = response.headers.get("ETag")
+        store = self.task_store(calendar_id, refresh=False)
+        store.put(CachedTask(str(task.id), unquote(task.url.path), etag, task.data))
+
+    def pending_tasks(self, calendar_id: str) -> list[CachedTask]:
+        """Return the calendar's tasks that still need action, ordered by due date and priority.
+
+        This mirrors what `caldav.Calendar.todos()` returns, but is served from the local store.
+
+        Args:
+            calendar_id: The ID of the calendar.
+
+        Returns:
+            list[CachedTask]: The pending tasks.
+        """
+        tasks = [t for t in self.task_store(calendar_id).all() if t.pending]
+        tasks.sort(key=lambda t: todo_sort_key(t.record))
+        return tasks
+
+    def upcoming_records(self, calendar_id: str, days: int = 7, now: Optional[datetime] = None) -> list[TodoRecord]:
+        """Return the pending tasks due within the next days, with one record per occurrence of recurring tasks.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            days: Length of the window, starting now.
+            now: Start of the window; defaults to the current time.
+
+        Returns:
+            list[TodoRecord]: The tasks and occurrences, ordered by due date and priority.
+        """
+        start = now or datetime.now()
+        query = TaskQuery(due_after=start, due_before=start + timedelta(days=days))
+        records = []
+        for task in self.task_store(calendar_id).all():
+            series = task.series
+            if series is None:
+                candidates: Iterable[TodoRecord] = [task.record]
+            elif task.record.status in ("COMPLETED", "CANCELLED"):
+                continue
+            else:
+                # Occurrences before the current one were superseded by a later completion.
+                current_due = naive_datetime(task.record.due)
+                window_start = max(query.due_after, current_due) if current_due is not None else query.due_after
+                candidates = series.occurrences(window_start, query.due_before)
+            records.extend(r for r in candidates if query.matches(r))
+        records.sort(key=todo_sort_key)
+        return records
+
+    def overdue_tasks(self, calendar_id: str) -> list[CachedTask]:
+        """Return the calendar's overdue tasks, ordered by due date and priority.
+
+        The first call on a calendar asks the server for overdue tasks only; once the calendar
+        is held locally, the filter is evaluated over the local copy.
+
+        Args:
+            calendar_id: The ID of the calendar.
+
+        Returns:
+            list[CachedTask]: The overdue tasks.
+        """
+        query = TaskQuery.overdue()
+        store = self.task_store(calendar_id, refresh=False)
+        if store.loaded:
+            # The store already mirrors the calendar; an incremental refresh is cheaper than any query.
+            tasks = [t for t in self.pending_tasks(calendar_id) if query.matches(t.record)]
+        else:
+            try:
+                tasks = store.search(query)
+            except caldav.error.ReportError:
+                # Server cannot handle the filter; evaluate it over the whole calendar instead.
+                tasks = [t for t in self.pending_tasks(calendar_id) if query.matches(t.record)]
+            tasks.sort(key=lambda t: todo_sort_key(t.record))
+        return tasks
+
+    def task_get_by_id(self, calendar_id: str, task_id: str) -> caldav.Todo:
         """Retrieve a task from a calendar by its UID.
 
         Args:
@@ -109,13 +616,14 @@ class TaskDAVClient(caldav.DAVClient):
         Raises:
             TaskNotFound: If no task with the given ID exists in the calendar.
         """
-        calendar = self.get_calendar_by_id(calendar_id)
-        try:
-            return cast(caldav.Todo, calendar.todo_by_uid(task_id))
-        except caldav.error.NotFoundError:
+        store = self.task_store(calendar_id)
+        cached = store.get(task_id)
+        if cached is None:
             raise TaskNotFound(f"No task exists with ID {task_id} inside calendar with ID {calendar_id}.")
+        return cached.to_todo(store.calendar)
 
-    def calendar_list_ids(self: Annotated['TaskDAVClient', InjectedToolArg]) -> List[str]:
+    @memoized()
+    def calendar_list_ids(self) -> List[str]:
         """List all accessible calendar IDs.
 
         Args:
@@ -126,7 +634,8 @@ class TaskDAVClient(caldav.DAVClient):
         """
         return [*self.get_calendars_by_id().keys()]
 
-    def task_add_to_calendar(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, summary: str, priority: Optional[int] = 5, due: Optional[datetime] = None) -> dict[str, Any]:
+    @invalidates
+    def task_add_to_calendar(self, calendar_id: str, summary: str, priority: Optional[int] = 5, due: Optional[datetime] = None) -> dict[str, Any]:
         """Add a new task (VTODO component) to the specified calendar.
 
         Args:
@@ -145,10 +654,23 @@ class TaskDAVClient(caldav.DAVClient):
             todo.add('priority', priority)
         if due:
             todo.add('due', due)
-        calendar.add_todo(todo.to_ical().decode())
-        return serialize_ical_todo(todo)
+        if self.replica is not None:
+            todo.add('uid', str(uuid.uuid4()))
+            todo.add('dtstamp', datetime.now(timezone.utc))
+            cal = icalendar.Calendar()
+            cal.add('prodid', '-//caldav-agent//EN')
+            cal.add('version', '2.0')
+            cal.add_component(todo)
+            href = unquote(calendar.url.join(quote(f"{todo['UID']}.ics")).path)
+            self.queue_task(calendar_id, CachedTask(str(todo['UID']), href, None, cal.to_ical().decode()), create=True)
+            return serialize_ical_todo(todo)
+        saved = calendar.add_todo(todo.to_ical().decode())
+        self.task_store(calendar_id, refresh=False).put(
+            CachedTask(str(saved.id), unquote(saved.url.path), None, saved.data)
+        )
+        return serialize_ical_todo(saved.icalendar_component)
 
-    def task_mark_complete(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str) -> None:
+    def task_mark_complete(self, calendar_id: str, task_id: str) -> None:
         """Mark the task as complete.
 
         Args:
@@ -158,11 +680,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        task.complete()
-        task.save()
+        self.task_update(calendar_id, task_id, completed=True)
 
-    def task_mark_incomplete(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str) -> None:
+
+    def task_mark_incomplete(self, calendar_id: str, task_id: str) -> None:
         """Mark a previously completed task as incomplete.
 
         Args:
@@ -172,11 +693,113 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        task.uncomplete()
-        task.save()
+        self.task_update(calendar_id, task_id, completed=False)
+
+
+    def task_update(self, calendar_id: str, task_id: str, **fields: Any) -> dict[str, Any]:
+        """Change several fields of a task with one fetch and one save.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            **fields: New values by field name: summary, priority, due, description, dtstart,
+                dtend or completed (bool). None removes the field.
+
+        Returns:
+            dict[str, Any]: The serialized task after the update.
+
+        Raises:
+            TaskNotFound: If no task with the given ID exists in the calendar.
+            TaskConflict: If the task changed on the server while it was being updated.
+            ValueError: If a field name or value is invalid.
+        """
+        result = self.tasks_apply([{'calendar_id': calendar_id, 'task_id': task_id, 'fields': fields}])[0]
+        if result['status'] == 'not_found':
+            raise TaskNotFound(result['message'])
+        elif result['status'] == 'conflict':
+            raise TaskConflict(result['message'])
+        elif result['status'] == 'invalid':
+            raise ValueError(result['message'])
+        elif result['status'] == 'error':
+            raise caldav.error.PutError(result['message'])
+        return result['task']
+
+    def tasks_apply(self, changes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Apply field changes to many tasks, fetching each calendar's tasks in one request and saving each task once.
+
+        Args:
+            changes: A list of changes, each a dict with `calendar_id`, `task_id` and `fields`
+                (a dict of field name to new value, as accepted by `task_update`).
+
+        Returns:
+            list[dict[str, Any]]: One result per change, in order, with `calendar_id`, `task_id`
+                and `status` (updated, not_found, conflict, invalid or error). Updated results
+                include the serialized `task`; the others include a `message`.
+
+        Raises:
+            caldav.error.AuthorizationError: If the server rejects the credentials.
+        """
+        # Changes to the same task are merged so it is written only once.
+        merged: dict[tuple[str, str], dict[str, Any]] = {}
+        for change in changes:
+            key = (change['calendar_id'], change['task_id'])
+            merged.setdefault(key, {}).update(change.get('fields') or {})
 
-    def task_update_summary(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str, summary: str) -> None:
+        outcome: dict[tuple[str, str], dict[str, Any]] = {}
+        by_calendar: dict[str, list[str]] = {}
+        for calendar_id, task_id in merged:
+            by_calendar.setdefault(calendar_id, []).append(task_id)
+
+        try:
+            for calendar_id, task_ids in by_calendar.items():
+                with self.locked_tasks((calendar_id, task_id) for task_id in task_ids):
+                    try:
+                        store = self.task_store(calendar_id, refresh=False)
+                        if self.replica is not None:
+                            # Offline-first: change the local version; the push checks it is still current.
+                            fetched = {t: store.get(t) for t in task_ids if store.get(t) is not None}
+                        else:
+                            fetched = store.fetch(task_ids)
+                    except caldav.error.AuthorizationError:
+                        # Rejected credentials fail every change; the caller has to see them.
+                        raise
+                    except (CalendarNotFound, caldav.error.DAVError) as e:
+                        for task_id in task_ids:
+                            outcome[(calendar_id, task_id)] = {'status': 'error', 'message': str(e)}
+                        continue
+                    for task_id in task_ids:
+                        outcome[(calendar_id, task_id)] = self._apply_to_task(
+                            calendar_id, store, fetched.get(task_id), task_id, merged[(calendar_id, task_id)]
+                        )
+        finally:
+            # Every task write goes through here, so this is where their calendars' memoized results are dropped.
+            for calendar_id in by_calendar:
+                self.memo.invalidate(calendar_id)
+
+        return [
+            {'calendar_id': change['calendar_id'], 'task_id': change['task_id'], **outcome[(change['calendar_id'], change['task_id'])]}
+            for change in changes
+        ]
+
+    def _apply_to_task(self, calendar_id: str, store: CalendarTaskStore, cached: Optional[CachedTask], task_id: str, fields: dict[str, Any]) -> dict[str, Any]:
+        if cached is None:
+            return {'status': 'not_found', 'message': f"No task exists with ID {task_id} inside calendar with ID {calendar_id}."}
+        task = cached.to_todo(store.calendar)
+        try:
+            apply_resource_fields(task.icalendar_instance, fields)
+        except (ValueError, TypeError) as e:
+            return {'status': 'invalid', 'message': str(e)}
+        try:
+            self.save_task(calendar_id, task, if_match=cached.etag)
+        except TaskConflict as e:
+            return {'status': 'conflict', 'message': str(e)}
+        except caldav.error.AuthorizationError:
+            raise
+        except caldav.error.DAVError as e:
+            return {'status': 'error', 'message': str(e)}
+        return {'status': 'updated', 'task': serialize_ical_todo(task.icalendar_component)}
+
+    def task_update_summary(self, calendar_id: str, task_id: str, summary: str) -> None:
         """Set the summary (title) of the task.
 
         Args:
@@ -187,11 +810,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        self.update_field(task, 'summary', summary)
-        task.save()
+        self.task_update(calendar_id, task_id, summary=summary)
+
 
-    def task_update_priority(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str, priority: Optional[int]) -> None:
+    def task_update_priority(self, calendar_id: str, task_id: str, priority: Optional[int]) -> None:
         """Set the priority of the task.
 
         Args:
@@ -202,11 +824,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        self.update_field(task, 'priority', priority)
-        task.save()
+        self.task_update(calendar_id, task_id, priority=priority)
 
-    def task_update_due_date(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str, due_date: Optional[datetime]) -> None:
+
+    def task_update_due_date(self, calendar_id: str, task_id: str, due_date: Optional[datetime]) -> None:
         """Set the due date of the task.
 
         Args:
@@ -217,11 +838,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        self.update_field(task, 'due_date', due_date)
-        task.save()
+        self.task_update(calendar_id, task_id, due=due_date)
+
 
-    def task_update_description(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str, description: Optional[str]) -> None:
+    def task_update_description(self, calendar_id: str, task_id: str, description: Optional[str]) -> None:
         """Set the task description.
 
         Args:
@@ -232,11 +852,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        self.update_field(task, 'description', description)
-        task.save()
+        self.task_update(calendar_id, task_id, description=description)
+
 
-    def task_update_start_date(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str, dtstart: Optional[datetime]) -> None:
+    def task_update_start_date(self, calendar_id: str, task_id: str, dtstart: Optional[datetime]) -> None:
         """Set when the task started.
 
         Args:
@@ -247,12 +866,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        
-        self.update_field(task, 'dtstart', dtstart)
-        task.save()
+        self.task_update(calendar_id, task_id, dtstart=dtstart)
 
-    def task_update_end_date(self: Annotated['TaskDAVClient', InjectedToolArg], calendar_id: str, task_id: str, dtend: Optional[datetime]) -> None:
+
+    def task_update_end_date(self, calendar_id: str, task_id: str, dtend: Optional[datetime]) -> None:
         """Set when the task ends.
 
         Args:
@@ -263,10 +880,10 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             None
         """
-        task = self.task_get_by_id(calendar_id, task_id)
-        self.update_field(task, 'dtend', dtend)
-        task.save()
+        self.task_update(calendar_id, task_id, dtend=dtend)
+
 
+    @memoized()
     def task_list_by_calendar(self, calendar_id: str) -> list[dict[str, Any]]:
         """List all tasks within a specific calendar.
 
@@ -276,12 +893,9 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             list[dict[str, Any]]: A list of serialized task data.
         """
-        calendar = self.get_calendar_by_id(calendar_id)
-        return [
-            serialize_ical_todo(t.icalendar_component)
-            for t in calendar.todos()
-        ]
+        return [t.record.to_dict() for t in self.pending_tasks(calendar_id)]
 
+    @memoized()
     def task_list_overdue(self, calendar_id: str) -> list[dict[str, Any]]:
         """List all tasks within a specific calendar that are overdue.
 
@@ -291,30 +905,264 @@ class TaskDAVClient(caldav.DAVClient):
         Returns:
             list[dict[str, Any]]: A list of serialized task data.
         """
+        return [t.record.to_dict() for t in self.overdue_tasks(calendar_id)]
+
+    @memoized()
+    def task_list_upcoming(self, calendar_id: str, days: int = 7) -> list[dict[str, Any]]:
+        """List the tasks due within the next days, including each upcoming occurrence of recurring tasks.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            days: Number of days to look ahead.
+
+        Returns:
+            list[dict[str, Any]]: A list of serialized task data, soonest first.
+        """
+        return [r.to_dict() for r in self.upcoming_records(calendar_id, days)]
+
+    @memoized()
+    def task_list_page(self, calendar_id: str, limit: int = DEFAULT_LIMIT, cursor: Optional[str] = None, fields: Optional[list[str]] = None, sort_by: str = "due", max_tokens: Optional[int] = None, overdue_only: bool = False) -> dict[str, Any]:
+        """List one page of a calendar's pending tasks in a compact row format. Prefer this over task_list_by_calendar for large calendars.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            limit: Maximum number of tasks to return.
+            cursor: The next_cursor value of the previous page, to continue a listing.
+            fields: Columns to include, from UID, SUMMARY, STATUS, DESCRIPTION, DUE, DTSTART, COMPLETED and PRIORITY. Defaults to UID, SUMMARY, DUE and PRIORITY.
+            sort_by: Sort order: due, dtstart, priority or summary.
+            max_tokens: Approximate maximum size of the output in tokens.
+            overdue_only: Only list overdue tasks.
+
+        Returns:
+            dict[str, Any]: `fields` (column names), `rows` (one list of values per task), `total` and `next_cursor` (null on the last page).
+        """
+        tasks = self.overdue_tasks(calendar_id) if overdue_only else self.pending_tasks(calendar_id)
+        return paginate([t.record for t in tasks], limit, cursor, fields, sort_by, max_tokens)
+
+    def task_search(self, query: str, calendar_ids: Optional[list[str]] = None, due_before: Optional[datetime] = None, priority_max: Optional[int] = None, limit: int = DEFAULT_LIMIT, include_completed: bool = False) -> dict[str, Any]:
+        """Find tasks by words in their summary, description or categories. Prefer this over listing whole calendars to find a task.
+
+        Args:
+            query: Words that must all occur in the task; a word also matches longer words starting with it. Empty to filter by due date or priority only.
+            calendar_ids: Calendars to search. Defaults to all calendars.
+            due_before: Only tasks due before this date and time.
+            priority_max: Only tasks with a priority from 1 (highest) up to this value.
+            limit: Maximum number of tasks to return.
+            include_completed: Also return completed and cancelled tasks.
+
+        Returns:
+            dict[str, Any]: `fields` (column names), `rows` (one list of values per task, best matches first) and `total` (number of matches).
+        """
+        fields = ["CALENDAR", "UID", "SUMMARY", "DUE", "PRIORITY"]
+        matches = []
+        for calendar_id in calendar_ids or self.calendar_list_ids():
+            store = self.task_store(calendar_id)
+            with store.lock:
+                found = store.index.search(query, due_before, priority_max)
+                tasks = [(relevance, store.get(uid)) for relevance, uid in found]
+            for relevance, task in tasks:
+                if task is not None and (include_completed or task.pending):
+                    matches.append((-relevance, SORT_KEYS["due"](task.record), calendar_id, task.record))
+        matches.sort(key=lambda match: (*match[:3], match[3].uid or ""))
+        rows = []
+        for _, _, calendar_id, record in matches[:max(1, limit)]:
+            serialized = record.to_dict()
+            rows.append([calendar_id] + [serialized.get(f) for f in fields[1:]])
+        return {"fields": fields, "rows": rows, "total": len(matches)}
+
+    def event_list_range(self, calendar_id: str, start: datetime, end: datetime) -> list[dict[str, Any]]:
+        """List the events of a calendar between two moments, with each occurrence of recurring events.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            start: Start of the range.
+            end: End of the range.
+
+        Returns:
+            list[dict[str, Any]]: The events overlapping the range, earliest first, with UID, SUMMARY, START, END and LOCATION.
+        """
+        return [o.to_dict() for o in self.event_store(calendar_id, start, end).overlapping(start, end)]
+
+    def event_add_to_calendar(self, calendar_id: str, summary: str, start: datetime, end: Optional[datetime] = None, duration_minutes: int = 60, location: Optional[str] = None, description: Optional[str] = None) -> dict[str, Any]:
+        """Add a new event (VEVENT component) to the specified calendar.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            summary: The title of the event.
+            start: When the event starts.
+            end: When the event ends. Defaults to `duration_minutes` after the start.
+            duration_minutes: Length of the event when no end is given.
+            location: Where the event takes place.
+            description: Notes on the event.
+
+        Returns:
+            dict[str, Any]: The serialized event.
+        """
+        if end is None:
+            end = start + timedelta(minutes=duration_minutes)
+        if end < start:
+            raise ValueError("Argument `end` must not be before `start`.")
         calendar = self.get_calendar_by_id(calendar_id)
-        now = datetime.now()
-        overdue_tasks = []
-        for t in calendar.todos():
-            comp = t.icalendar_component
-            due = comp.get("DUE")
-            completed = comp.get("COMPLETED")
-            due_dt = None
-
-            if due:
-                due_val = due.dt if hasattr(due, "dt") else due
-                if isinstance(due_val, datetime):
-                    due_dt = due_val
-                else:
-                    try:
-                        due_dt = datetime.fromisoformat(str(due_val))
-                    except Exception:
-                        continue
+        event = icalendar.Event()
+        event.add('summary', summary)
+        event.add('dtstart', start)
+        event.add('dtend', end)
+        if location:
+            event.add('location', location)
+        if description:
+            event.add('description', description)
+        saved = calendar.add_event(event.to_ical().decode())
+        events = self._event_stores.get(calendar_id)
+        if events is not None:
+            events.put(unquote(saved.url.path), None, saved.data)
+        return {
+            "UID": str(saved.id), "SUMMARY": summary, "START": format_moment(start), "END": format_moment(end),
+            **({"LOCATION": location} if location else {}),
+        }
 
-            # Make both due_dt and now timezone-naive for comparison
-            if due_dt is not None and hasattr(due_dt, "tzinfo") and due_dt.tzinfo is not None:
-                due_dt = due_dt.replace(tzinfo=None)
-            now_naive = now.replace(tzinfo=None) if now.tzinfo is not None else now
+    def event_move(self, calendar_id: str, event_id: str, start: datetime, end: Optional[datetime] = None) -> dict[str, Any]:
+        """Move an event to a new time, keeping its length unless a new end is given.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            event_id: The UID of the event.
+            start: The new start.
+            end: The new end. Defaults to the new start plus the event's current length.
+
+        Returns:
+            dict[str, Any]: The event at its new time.
 
-            if due_dt and due_dt < now_naive and not completed:
-                overdue_tasks.append(serialize_ical_todo(comp))
-        return overdue_tasks
+        Raises:
+            EventNotFound: If no event with the given ID exists in the calendar.
+            EventConflict: If the event changed on the server while it was being moved.
+            ValueError: If the event is recurring, or `end` is before `start`.
+        """
+        events, href, etag, data = self.find_event(calendar_id, event_id)
+        calendar = icalendar.Calendar.from_ical(data)
+        masters = [c for c in calendar.walk("VEVENT") if "RECURRENCE-ID" not in c]
+        if len(masters) != 1 or "RRULE" in masters[0] or "RDATE" in masters[0] or len(calendar.walk("VEVENT")) > 1:
+            raise ValueError(f"Event {event_id} is recurring; moving single occurrences is not supported.")
+        event = masters[0]
+        old_start = event["DTSTART"].dt
+        old_end = event["DTEND"].dt if "DTEND" in event else None
+        length = local_datetime(old_end) - local_datetime(old_start) if old_end is not None else timedelta(0)
+        end_given = end is not None
+        if end is None:
+            end = start + length
+        if end < start:
+            raise ValueError("Argument `end` must not be before `start`.")
+        for prop in ("DTSTART", "DTEND", "DURATION"):
+            event.pop(prop, None)
+        if not isinstance(old_start, datetime):
+            # All-day events stay all-day: keep their number of days, or cover every day up to a given end.
+            if end_given:
+                end_date = end.date() if end.time() == time() else end.date() + timedelta(days=1)
+            else:
+                end_date = start.date() + timedelta(days=length.days)
+            event.add("dtstart", start.date())
+            event.add("dtend", max(end_date, start.date() + timedelta(days=1)))
+        elif old_start.tzinfo is not None:
+            # Keep the event's time zone; the new times are local wall times.
+            event.add("dtstart", start.astimezone(old_start.tzinfo))
+            event.add("dtend", end.astimezone(old_start.tzinfo))
+        else:
+            event.add("dtstart", start)
+            event.add("dtend", end)
+        event["SEQUENCE"] = int(event.get("SEQUENCE", 0)) + 1
+        body = calendar.to_ical().decode()
+        headers = {"Content-Type": 'text/calendar; charset="utf-8"'}
+        if etag:
+            headers["If-Match"] = etag
+        response = self.put(str(events.calendar.url.join(href)), body, headers)
+        if response.status == 412:
+            raise EventConflict(f"Event {event_id} in calendar {calendar_id} was changed by someone else; try again.")
+        if response.status not in (200, 201, 204):
+            raise error.PutError(error.errmsg(response))
+        events.put(href, response.headers.get("ETag"), body)
+        moved = EventOccurrence.from_component(href, event, recurring=False)
+        return moved.to_dict()
+
+    def event_delete(self, calendar_id: str, event_id: str) -> None:
+        """Delete an event, with all its occurrences if it is recurring.
+
+        Args:
+            calendar_id: The ID of the calendar.
+            event_id: The UID of the event.
+
+        Returns:
+            None
+
+        Raises:
+            EventNotFound: If no event with the given ID exists in the calendar.
+            EventConflict: If the event changed on the server since it was fetched.
+        """
+        events, href, etag, _ = self.find_event(calendar_id, event_id)
+        headers = {"If-Match": etag} if etag else {}
+        response = self.request(str(events.calendar.url.join(href)), "DELETE", "", headers)
+        if response.status == 412:
+            raise EventConflict(f"Event {event_id} in calendar {calendar_id} was changed by someone else; try again.")
+        if response.status == 404:
+            events.remove(href)
+            raise EventNotFound(f"No event exists with ID {event_id} inside calendar with ID {calendar_id}.")
+        if response.status not in (200, 204):
+            raise error.DeleteError(error.errmsg(response))
+        events.remove(href)
+
+    def calendar_free_busy(self, start: datetime, end: datetime, calendar_ids: Optional[list[str]] = None) -> dict[str, Any]:
+        """List the busy periods between two moments, merged across calendars.
+
+        Args:
+            start: Start of the range.
+            end: End of the range.
+            calendar_ids: Calendars to consider. Defaults to all calendars.
+
+        Returns:
+            dict[str, Any]: `busy` and `free`, each a list of [start, end] periods within the range.
+        """
+        busy = self.busy_intervals(start, end, calendar_ids)
+        free = []
+        cursor = start
+        for busy_start, busy_end in busy:
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if cursor < end:
+            free.append((cursor, end))
+        return {
+            "busy": [[format_moment(s), format_moment(e)] for s, e in busy],
+            "free": [[format_moment(s), format_moment(e)] for s, e in free],
+        }
+
+    def calendar_find_free_slot(self, duration_minutes: int, start: datetime, end: datetime, calendar_ids: Optional[list[str]] = None, day_start: str = "09:00", day_end: str = "17:00", limit: int = 3) -> list[list[str]]:
+        """Find the earliest free slots of a given length, for example to schedule a meeting.
+
+        Args:
+            duration_minutes: Length of the wanted slot in minutes.
+            start: Earliest start of a slot.
+            end: Latest end of a slot.
+            calendar_ids: Calendars that must be free. Defaults to all calendars.
+            day_start: Time of day (HH:MM) before which slots may not start.
+            day_end: Time of day (HH:MM) by which slots must end; 00:00 means midnight.
+            limit: Maximum number of slots to return.
+
+        Returns:
+            list[list[str]]: The slots as [start, end] pairs, earliest first.
+        """
+        busy = self.busy_intervals(start, end, calendar_ids)
+        slots = free_slots(
+            busy, start, end, timedelta(minutes=duration_minutes),
+            time.fromisoformat(day_start), time.fromisoformat(day_end), max(1, limit),
+        )
+        return [[format_moment(s), format_moment(e)] for s, e in slots]
+
+    def task_sync_status(self) -> dict[str, Any]:
+        """Report task changes not saved to the server yet, and changes the server rejected (for example because someone else changed the task first).
+
+        Returns:
+            dict[str, Any]: `pending` (number of changes waiting), `rejected` (calendar_id, task_id, reason and message of each rejected change), `last_sync` and, after a failure, `last_error`.
+        """
+        if self.sync_worker is not None:
+            return self.sync_worker.status()
+        if self.replica is not None:
+            return self.replica.status()
+        return {"pending": 0, "rejected": []}
@@ -0,0 +1,85 @@
+"""
+This module provides `DiscoveryCache`, which keeps the calendars found by discovery in a JSON file.
+
+Finding the calendars of a user takes several PROPFIND round trips (principal, calendar home,
+calendars) before the first tool call can be answered. With a cache, a new process uses the
+calendars found by an earlier one right away, and `TaskDAVClient` revalidates them with the server
+in the background (stale-while-revalidate); a change it finds replaces the cached calendars and
+clears the memo cache.
+
+One file can hold the calendars of several servers and users. Entries older than `max_age`
+seconds are not used, so discovery then blocks as it would without a cache.
+"""
+from __future__ import annotations
+from typing import Optional
+import json
+import os
+import threading
+import time
+
+class DiscoveryCache:
+    """
+    The calendar URLs of one user on one server, by calendar ID, kept in a JSON file.
+
+    Args:
+        path: The JSON file; created when calendars are first saved.
+        key: Identifies the server and user within the file.
+        max_age: Seconds a saved entry is used for.
+    """
+
+    def __init__(self, path: str, key: str, max_age: float = 86400):
+        self.path = path
+        self.key = key
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def load(self) -> Optional[dict[str, str]]:
+        """Return the saved calendar URLs by calendar ID, or None if there are none or they are too old."""
+        with self.lock:
+            entry = self._read().get(self.key)
+        if not isinstance(entry, dict) or time.time() - entry.get("saved_at", 0) > self.max_age:
+            return None
+        calendars = entry.get("calendars")
+        return dict(calendars) if isinstance(calendars, dict) and calendars else None
+
+    def save(self, urls: dict[str, str]) -> bool:
+        """
+        Record the calendars found on the server, atomically.
+
+        Returns:
+            bool: Whether they differ from the saved ones.
+        """
+        with self.lock:
+            entries = self._read()
+            previous = entries.get(self.key)
+            changed = not isinstance(previous, dict) or previous.get("calendars") != urls
+            entries[self.key] = {"calendars": urls, "saved_at": time.time()}
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temporary, "w") as f:
+                    json.dump(entries, f)
+                os.replace(temporary, self.path)
+            except OSError:
+                # The cache only saves time; discovery works without it.
+                pass
+        return changed
+
+def discovery_cache_from_config(config, url: str, username: str) -> Optional[DiscoveryCache]:
+    """
+    Build the discovery cache described by the `discovery_cache*` settings of a config module.
+
+    Returns:
+        None if `discovery_cache` is unset or empty, otherwise a `DiscoveryCache` for the user.
+    """
+    path = getattr(config, "discovery_cache", "")
+    if not path:
+        return None
+    return DiscoveryCache(path, f"{username}@{url}", max_age=getattr(config, "discovery_cache_max_age", 86400))
@@ -0,0 +1,334 @@
+"""
+This module provides a local window of calendar events (VEVENT components) for `TaskDAVClient`.
+
+`CalendarEvents` loads every event of a calendar overlapping a time window with a single
+`calendar-query` REPORT carrying a VEVENT `time-range` filter. Recurring events are expanded
+into their occurrences within the window (with `recurring_ical_events`, which applies RRULE,
+RDATE, EXDATE and RECURRENCE-ID overrides), and the occurrences are put in an `IntervalTree`.
+Listing a range, free/busy and free-slot questions are then answered locally.
+
+The client's own changes are written through: the affected resource is re-expanded and the tree
+rebuilt, so the window stays valid without another REPORT.
+
+Times are converted to naive local wall times (zoned times to the local zone, floating times as
+written), the convention of the task tools. All-day events span whole local days.
+"""
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+from datetime import datetime, time, timedelta, timezone
+import threading
+import time as _time
+
+import caldav
+import icalendar
+from caldav.elements import cdav, dav
+from caldav.lib import error
+
+from interval_tree import IntervalTree
+from recurrence import is_recurring
+from task_store import xml_body
+from todo_record import _split_content_line, parse_date_value, unescape_text, unfold
+from tracing import tracer
+
+def local_datetime(value: Any) -> datetime:
+    """Convert a DTSTART/DTEND value to a naive local datetime; dates become midnight."""
+    value = getattr(value, "dt", value)
+    if isinstance(value, datetime):
+        return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+    return datetime.combine(value, time())
+
+def format_moment(value: datetime) -> str:
+    return value.isoformat(" ", timespec="minutes")
+
+class EventOccurrence:
+    """One occurrence of an event within the loaded window."""
+    __slots__ = ("uid", "href", "summary", "location", "start", "end", "all_day", "busy", "recurring")
+
+    def __init__(self, uid: str, href: str, summary: str, location: Optional[str], start: datetime, end: datetime, all_day: bool, busy: bool = True, recurring: bool = False):
+        self.uid = uid
+        self.href = href
+        self.summary = summary
+        self.location = location
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.busy = busy
+        self.recurring = recurring
+
+    @classmethod
+    def from_component(cls, href: str, component: icalendar.Event, recurring: bool) -> EventOccurrence:
+        """Build an occurrence from an expanded VEVENT component."""
+        all_day = not isinstance(component["DTSTART"].dt, datetime)
+        start = local_datetime(component["DTSTART"])
+        end = component.get("DTEND")
+        return cls(
+            str(component.get("UID", "")),
+            href,
+            str(component.get("SUMMARY", "")),
+            str(component["LOCATION"]) if component.get("LOCATION") else None,
+            start,
+            local_datetime(end) if end is not None else start + (timedelta(days=1) if all_day else timedelta(0)),
+            all_day,
+            is_busy(component.get("TRANSP"), component.get("STATUS")),
+            recurring,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        result: dict[str, Any] = {"UID": self.uid, "SUMMARY": self.summary}
+        if self.all_day:
+            result["START"] = self.start.date().isoformat()
+            result["END"] = self.end.date().isoformat()
+            result["ALL_DAY"] = True
+        else:
+            result["START"] = format_moment(self.start)
+            result["END"] = format_moment(self.end)
+        if self.location:
+            result["LOCATION"] = self.location
+        if self.recurring:
+            result["RECURRING"] = True
+        return result
+
+def is_busy(transparency: Any, status: Any) -> bool:
+    """Transparent (e.g. "free" reminders) and cancelled events do not block time."""
+    return str(transparency or "OPAQUE").upper() != "TRANSPARENT" and str(status or "").upper() != "CANCELLED"
+
+def _scan_simple_event(href: str, data: str) -> Optional[EventOccurrence]:
+    """
+    Read a single, non-recurring event straight from its text, like `TodoRecord.from_ical` does.
+
+    Returns None when the resource needs the full parse: recurrence, several components, time
+    zone references or a DURATION.
+    """
+    fields: dict[str, tuple[str, str]] = {}
+    in_event = False
+    for line in unfold(data).splitlines():
+        if not in_event:
+            if line == "BEGIN:VEVENT":
+                if fields:
+                    return None
+                in_event = True
+            elif line.startswith("BEGIN:") and line != "BEGIN:VCALENDAR":
+                return None
+            continue
+        if line.startswith("BEGIN:") or line == "END:VEVENT":
+            if line != "END:VEVENT":
+                return None
+            in_event = False
+            continue
+        name, params, value = _split_content_line(line)
+        if name in ("RRULE", "RDATE", "RECURRENCE-ID", "DURATION") or "TZID=" in params:
+            return None
+        if name in ("UID", "SUMMARY", "LOCATION", "DTSTART", "DTEND", "TRANSP", "STATUS"):
+            fields[name] = (params, value)
+    if "DTSTART" not in fields:
+        return None
+    start, all_day = _scan_moment(*fields["DTSTART"])
+    end = _scan_moment(*fields["DTEND"])[0] if "DTEND" in fields else None
+    if start is None:
+        return None
+    if end is None:
+        end = start + (timedelta(days=1) if all_day else timedelta(0))
+    location = unescape_text(fields["LOCATION"][1]) if fields.get("LOCATION", ("", ""))[1] else None
+    return EventOccurrence(
+        fields.get("UID", ("", ""))[1], href, unescape_text(fields.get("SUMMARY", ("", ""))[1]), location,
+        start, end, all_day, is_busy(fields.get("TRANSP", ("", None))[1], fields.get("STATUS", ("", None))[1]),
+    )
+
+def _scan_moment(params: str, value: str) -> tuple[Optional[datetime], bool]:
+    """A DATE or DATE-TIME value as a naive local datetime, and whether it was a DATE."""
+    moment = parse_date_value(value, params)
+    if moment is None:
+        return None, False
+    if not isinstance(moment, datetime):
+        return datetime.combine(moment, time()), True
+    if value.endswith("Z"):
+        moment = moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return moment, False
+
+def expand_resource(href: str, data: str, start: datetime, end: datetime) -> list[EventOccurrence]:
+    """
+    Expand the events of one calendar object resource into their occurrences within a window.
+
+    Args:
+        href: The resource's path.
+        data: Its iCalendar text.
+        start: Window start.
+        end: Window end (exclusive).
+
+    Returns:
+        list[EventOccurrence]: The occurrences; empty if the resource holds no VEVENT.
+    """
+    if "BEGIN:VEVENT" not in data:
+        return []
+    if not is_recurring(data):
+        simple = _scan_simple_event(href, data)
+        if simple is not None:
+            overlaps = simple.start < end and (simple.end > start or simple.start == simple.end >= start)
+            return [simple] if overlaps else []
+    # Only needed for recurring or unusual events, and slow to import.
+    import recurring_ical_events
+
+    calendar = icalendar.Calendar.from_ical(data)
+    recurring = any("RRULE" in c or "RDATE" in c for c in calendar.walk("VEVENT"))
+    return [
+        EventOccurrence.from_component(href, component, recurring)
+        for component in recurring_ical_events.of(calendar).between(start, end)
+        if "DTSTART" in component
+    ]
+
+def merge_intervals(intervals: Iterable[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime]]:
+    """Merge overlapping or touching intervals into a sorted list of disjoint ones."""
+    merged: list[tuple[datetime, datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def free_slots(
+    busy: list[tuple[datetime, datetime]],
+    start: datetime,
+    end: datetime,
+    duration: timedelta,
+    day_start: time = time(0),
+    day_end: time = time(0),
+    limit: int = 3,
+) -> list[tuple[datetime, datetime]]:
+    """
+    Find the earliest gaps of at least `duration` between busy intervals.
+
+    Args:
+        busy: Disjoint busy intervals, sorted by start (see `merge_intervals`).
+        start: Earliest possible slot start.
+        end: Latest possible slot end.
+        duration: Length of the wanted slot.
+        day_start: Daily time before which slots may not start. With `day_end`, limits slots to working hours.
+        day_end: Daily time by which slots must end; midnight means the end of the day.
+        limit: Maximum number of slots to return.
+
+    Returns:
+        list[tuple[datetime, datetime]]: Up to `limit` slots, each exactly `duration` long.
+    """
+    slots: list[tuple[datetime, datetime]] = []
+    day = start.date()
+    i = 0
+    while day <= end.date() and len(slots) < limit:
+        window_start = max(start, datetime.combine(day, day_start))
+        window_end = datetime.combine(day + timedelta(days=1) if day_end == time(0) else day, day_end)
+        window_end = min(end, window_end)
+        cursor = window_start
+        # Skip busy intervals that ended before this day's window.
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while cursor + duration <= window_end and len(slots) < limit:
+            if j < len(busy) and busy[j][0] < cursor + duration:
+                cursor = max(cursor, busy[j][1])
+                j += 1
+                continue
+            slots.append((cursor, cursor + duration))
+            cursor += duration
+        day += timedelta(days=1)
+    return slots
+
+class CalendarEvents:
+    """The events of one calendar overlapping a loaded window, indexed by time."""
+
+    def __init__(self, calendar: caldav.Calendar):
+        self.calendar = calendar
+        self.window: Optional[tuple[datetime, datetime]] = None
+        self.loaded_at = 0.0
+        # href -> (ETag, iCalendar text) of every event resource in the window.
+        self.resources: dict[str, tuple[Optional[str], str]] = {}
+        self.occurrences: dict[str, list[EventOccurrence]] = {}
+        self.tree: IntervalTree[datetime, EventOccurrence] = IntervalTree()
+        self.lock = threading.RLock()
+
+    @property
+    def client(self) -> caldav.DAVClient:
+        return self.calendar.client
+
+    def covers(self, start: datetime, end: datetime, max_age: float) -> bool:
+        """Whether `[start, end)` lies in the loaded window and the window is recent enough."""
+        return (
+            self.window is not None
+            and self.window[0] <= start and end <= self.window[1]
+            and _time.monotonic() - self.loaded_at < max_age
+        )
+
+    def _query(self, start: Optional[datetime] = None, end: Optional[datetime] = None, uid: Optional[str] = None) -> dict[str, tuple[Optional[str], str]]:
+        """Run a VEVENT `calendar-query` REPORT and return the matching resources by href."""
+        vevent = cdav.CompFilter("VEVENT")
+        if uid is not None:
+            vevent += cdav.PropFilter("UID") + cdav.TextMatch(uid, collation="i;octet")
+        if start is not None:
+            vevent += cdav.TimeRange(start=start, end=end)
+        root = cdav.CalendarQuery() + [
+            dav.Prop() + [dav.GetEtag(), cdav.CalendarData()],
+            cdav.Filter() + (cdav.CompFilter("VCALENDAR") + vevent),
+        ]
+        response = self.client.report(str(self.calendar.url), xml_body(root), depth=1)
+        if response.status >= 400:
+            raise error.ReportError(error.errmsg(response))
+        with tracer.span("parse.multistatus") as span:
+            found = response.expand_simple_props([dav.GetEtag(), cdav.CalendarData()])
+            span.count(entries=len(found))
+        return {
+            href: (props.get(dav.GetEtag.tag), props[cdav.CalendarData.tag])
+            for href, props in found.items()
+            if props.get(cdav.CalendarData.tag)
+        }
+
+    def load(self, start: datetime, end: datetime) -> None:
+        """Replace the window with `[start, end)`, fetching its events with one REPORT."""
+        resources = self._query(start, end)
+        with self.lock:
+            self.window = (start, end)
+            self.loaded_at = _time.monotonic()
+            self.resources = resources
+            self.occurrences = {href: expand_resource(href, data, start, end) for href, (_, data) in resources.items()}
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.tree = IntervalTree(
+            (o.start, max(o.end, o.start), o) for occurrences in self.occurrences.values() for o in occurrences
+        )
+
+    def overlapping(self, start: datetime, end: datetime) -> list[EventOccurrence]:
+        """The loaded occurrences overlapping `[start, end)`, ordered by start."""
+        with self.lock:
+            tree = self.tree
+        return [item[2] for item in tree.overlapping(start, end)]
+
+    def find(self, uid: str) -> Optional[tuple[str, Optional[str], str]]:
+        """
+        Find an event resource by UID: in the window, or else on the server.
+
+        Returns:
+            Optional[tuple[str, Optional[str], str]]: (href, ETag, iCalendar text), or None.
+        """
+        with self.lock:
+            for href, occurrences in self.occurrences.items():
+                if occurrences and occurrences[0].uid == uid:
+                    return (href, *self.resources[href])
+        for href, (etag, data) in self._query(uid=uid).items():
+            return href, etag, data
+        return None
+
+    def put(self, href: str, etag: Optional[str], data: str) -> None:
+        """Write-through: record an event resource that was just saved to the server."""
+        with self.lock:
+            if self.window is None:
+                return
+            self.resources[href] = (etag, data)
+            self.occurrences[href] = expand_resource(href, data, *self.window)
+            self._rebuild()
+
+    def remove(self, href: str) -> None:
+        """Write-through: drop an event resource that was just deleted from the server."""
+        with self.lock:
+            self.resources.pop(href, None)
+            if self.occurrences.pop(href, None) is not None:
+                self._rebuild()
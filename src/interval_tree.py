@@ -0,0 +1,84 @@
+"""
+This module provides `IntervalTree`, an augmented search tree over half-open intervals.
+
+The intervals are kept sorted by start in a list, which doubles as an implicit balanced binary
+search tree: the middle element of a range is the root of that range's subtree. Each node also
+stores the largest end within its subtree, so an overlap query skips every subtree that ends
+before the query starts, and every right subtree that starts after it ends. A query therefore
+costs O(log n) plus the work of reporting the k overlapping intervals, instead of a scan of all
+n intervals.
+
+The tree is static: building it is O(n log n) and changes are made by building a new one, which
+suits calendars that are loaded once and changed a few events at a time.
+"""
+from __future__ import annotations
+from typing import Any, Generic, Iterable, Iterator, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+class IntervalTree(Generic[K, V]):
+    """
+    Intervals `[start, end)` with a value each, queried for overlaps with a range.
+
+    Args:
+        intervals: (start, end, value) triples; start and end must be comparable.
+    """
+
+    def __init__(self, intervals: Iterable[tuple[K, K, V]] = ()):
+        self.items: list[tuple[K, K, V]] = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.max_end: list[Any] = [None] * len(self.items)
+        self._build(0, len(self.items))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[tuple[K, K, V]]:
+        return iter(self.items)
+
+    def _build(self, lo: int, hi: int) -> Any:
+        """Fill `max_end` for the subtree over `items[lo:hi]` and return its largest end."""
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        largest = self.items[mid][1]
+        for end in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if end is not None and end > largest:
+                largest = end
+        self.max_end[mid] = largest
+        return largest
+
+    def overlapping(self, start: K, end: K) -> list[tuple[K, K, V]]:
+        """
+        Return the intervals overlapping `[start, end)`, ordered by start.
+
+        Args:
+            start: Start of the query range.
+            end: End of the query range (exclusive).
+
+        Returns:
+            list[tuple[K, K, V]]: The overlapping (start, end, value) triples.
+        """
+        found = []
+        # In-order traversal with an explicit stack of (lo, hi, visited_left) ranges.
+        stack: list[tuple[int, int, bool]] = [(0, len(self.items), False)]
+        while stack:
+            lo, hi, visited_left = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if not visited_left:
+                if self.max_end[mid] <= start:
+                    # Everything in this subtree ends before the range starts.
+                    continue
+                stack.append((lo, hi, True))
+                stack.append((lo, mid, False))
+                continue
+            item = self.items[mid]
+            if item[0] >= end:
+                # This and every later interval start after the range ends.
+                continue
+            if item[1] > start:
+                found.append(item)
+            stack.append((mid + 1, hi, False))
+        return found
@@ -1,77 +1,504 @@
+from __future__ import annotations
 import pprint
-from typing import Any, Dict, Callable
-import re
-import ast
-import inspect
-import pathlib
-import os
+from typing import TYPE_CHECKING, Any, Callable, Generator, Iterator, Optional, Union
+import contextvars
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import chatml
+from agent_memory import TOOL_OUTPUT_PREFIX, History, MemoryPolicy
+from tokens import estimate_tokens
+from tool_registry import Tool, ToolInputError, ToolRegistry, parse_tool_input
+from tracing import Span, format_summary, tracer
 
-def get_tool_signature(fn):
-    signature = inspect.signature(fn)
-    name = fn.__name__
-    params_str = ", ".join(str(param) for param in signature.parameters.values())
-    return f"{name}({params_str})"
+if TYPE_CHECKING:
+    # Only the native backend builds messages; the ReAct backend never imports them.
+    from langchain_core.messages import AIMessage, BaseMessage
 
-def get_system_prompt(tool_list) -> str:
-    with open(pathlib.Path(os.path.dirname(os.path.abspath(__file__)), "system_prompt.txt")) as f:
-        return f.read().format(tool_list=tool_list)
+# How the model calls tools: "react" parses `Tool:` / `Tool Input:` lines out of its text, and
+# "native" sends the tools' JSON schemas and reads the structured tool calls of the response.
+BACKENDS = ("react", "native")
+
+# Sent after a response that neither called a tool nor answered.
+FORMAT_REMINDERS = {
+    "react": "Your last response had neither a Tool call nor a Final Answer. Respond with `Tool:` and `Tool Input:` lines to call a tool, or with `Final Answer:` to answer.",
+    "native": "Your last response had neither a tool call nor an answer. Call one of the tools, or answer the user.",
+}
+
+# A tool call with its name, and its input as written (react) or its parsed arguments (native).
+ToolCall = tuple[str, Union[str, dict[str, Any]]]
+
+class RejectedCall(Future):
+    """The future of a tool call that failed validation and was not run; it holds the error."""
+    pass
+
+def native_messages(system_prompt: str, history: History) -> list[BaseMessage]:
+    """
+    Convert the agent's history into chat messages for a model with native tool calling.
+
+    Tool calls are kept in the history as `Tool:` / `Tool Input:` lines and their results as
+    `Tool Output:` messages, the same as with the ReAct backend, so memory policies work on
+    either. Here they become an `AIMessage` with `tool_calls`, followed by one `ToolMessage`
+    per call, in call order, holding only the tool's result.
+    """
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+    messages: list[BaseMessage] = [SystemMessage(system_prompt)]
+    pending: list[tuple[str, str]] = []
+    # Outputs of a step with several calls are recorded as `Tool Output: <name>: <result>`.
+    named = False
+    for role, text in history:
+        if role == "user":
+            messages.append(HumanMessage(text))
+        elif role == "system":
+            messages.append(SystemMessage(text))
+        elif text.startswith(TOOL_OUTPUT_PREFIX) and pending:
+            call_id, name = pending.pop(0)
+            content = text[len(TOOL_OUTPUT_PREFIX):]
+            if named and content.startswith(f"{name}: "):
+                content = content[len(name) + 2:]
+            messages.append(ToolMessage(content, tool_call_id=call_id))
+        else:
+            parser = ReActStreamParser()
+            parser.feed(text)
+            parser.finish()
+            calls = []
+            for name, raw in parser.tool_calls:
+                try:
+                    args = parse_tool_input(raw)
+                except ToolInputError:
+                    args = {}
+                calls.append({"name": name, "args": args, "id": f"call_{len(messages)}_{len(calls)}"})
+            pending = [(call["id"], call["name"]) for call in calls]
+            named = len(calls) > 1
+            messages.append(AIMessage("" if calls else text, tool_calls=calls))
+    return messages
 
 class ReActAgent:
-    tools: Dict[str, Callable[..., str]]
+    """
+    A tool-calling agent loop over a chat model.
+
+    Args:
+        model: The LangChain chat model.
+        memory: Policy bounding the history sent to the model; keeps everything by default.
+        max_parallel_tools: Number of tool calls of one step that run at the same time.
+        verbose: Print the system prompt, history and timing summary of each turn.
+        backend: "react" (tool calls written as text) or "native" (tool calls as structured
+            messages, for models with tool support, e.g. `llama3.1` on Ollama).
+        max_steps: Most model calls per turn before the turn is stopped.
+        max_retries: Most responses per turn that neither call a valid tool nor answer; each is
+            followed by a short reminder of the expected format instead of a bare retry.
+        prefetch: Called at the start of each turn, to load data the tools will likely need
+            while the model generates; must not block (see `prefetch.Prefetcher.start`).
+    """
+    tools: ToolRegistry
     
-    def __init__(self, model):
+    def __init__(
+        self,
+        model,
+        memory: MemoryPolicy | None = None,
+        max_parallel_tools: int = 4,
+        verbose: bool = False,
+        backend: str = "react",
+        max_steps: int = 10,
+        max_retries: int = 2,
+        prefetch: Optional[Callable[[], Any]] = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown agent backend `{backend}`; use one of: {', '.join(BACKENDS)}")
         self.model = model
-        self.tools = {}
+        # Print the system prompt, history and timing summary of each turn to the console.
+        self.verbose = verbose
+        self.backend = backend
+        self.max_steps = max(1, max_steps)
+        self.max_retries = max(0, max_retries)
+        self.prefetch = prefetch
+        self._retries_left = self.max_retries
+        self._bound_model = None
+        self._bound_schemas: Optional[list[dict[str, Any]]] = None
+        self.executor = ThreadPoolExecutor(max_workers=max_parallel_tools, thread_name_prefix="tool")
+        self.memory = memory or MemoryPolicy()
+        self.tools = ToolRegistry()
         self.history = []
+        self.prompt = None
+        # Per-phase timings, tokens and bytes of the last turn; see `tracing.Span.summary`.
+        self.last_summary: dict[str, dict[str, float]] = {}
     
     def add_tool(self, tool:Callable[..., Any]):
-        self.tools[tool.__name__] = tool
+        self.tools.add(tool)
     
     def get_tool_list(self):
-        return '\n'.join([f'- {get_tool_signature(v)}' for v in self.tools.values()])
+        return self.tools.tool_list
     
     def add_history(self, role, text):
-        pprint.pprint((role, text))
+        if self.verbose:
+            pprint.pprint((role, text))
         self.history.append((role, text))
+        if self.prompt is not None:
+            self.prompt.append(role, text)
     
-    def invoke_agent(self, user_prompt):
+    def _next_prompt(self, system_prompt: str) -> str:
+        with tracer.span("prompt.build") as span:
+            compacted = self.memory.compact(self.history)
+            span.set(compacted=compacted is not self.history)
+            if compacted is not self.history:
+                self.history = compacted
+                self.prompt = chatml.PromptBuilder(system_prompt).extend(self.history)
+            # The user prompt is already the last history block, so each prompt sent is a
+            # byte-for-byte prefix of the next one.
+            return self.prompt.render_for_generation()
+
+    def _native_messages(self, system_prompt: str) -> list[BaseMessage]:
+        with tracer.span("prompt.build") as span:
+            compacted = self.memory.compact(self.history)
+            span.set(compacted=compacted is not self.history)
+            self.history = compacted
+            return native_messages(system_prompt, self.history)
+
+    def _native_model(self):
+        """The model with the tools bound; bound again only after a tool is added."""
+        schemas = self.tools.schemas
+        if schemas is not self._bound_schemas:
+            self._bound_model = self.model.bind_tools(schemas)
+            self._bound_schemas = schemas
+        return self._bound_model
+
+    def _start_turn(self, user_prompt) -> str:
         self.add_history('user', user_prompt)
+        self._retries_left = self.max_retries
+        if self.prefetch is not None:
+            self.prefetch()
+
+        if self.backend == "native":
+            system_prompt = self.tools.native_system_prompt
+            if self.verbose:
+                print(system_prompt)
+            return system_prompt
+        system_prompt = self.tools.system_prompt
+        if self.verbose:
+            print(system_prompt)
+        if self.prompt is None or self.prompt.system != system_prompt:
+            # Re-render only when the tool list changed; otherwise keep extending the same prefix.
+            self.prompt = chatml.PromptBuilder(system_prompt).extend(self.history)
+        return system_prompt
+
+    def _submit_tool(self, action_name: str, action_input_raw: Union[str, dict[str, Any]]) -> Future:
+        """Validate one tool call's input and start running it on the thread pool.
+
+        Invalid calls are not run; their future (a `RejectedCall`) holds the error for the model instead.
+        """
+        try:
+            tool, action_input = self.tools.prepare(action_name, action_input_raw)
+        except ToolInputError as e:
+            if self.verbose:
+                print(f"Rejected tool call: {e}")
+            future: Future = RejectedCall()
+            future.set_result(f"ERROR: {e}")
+            return future
+        # Run in a copy of the current context, so the tool's spans are children of this step.
+        return self.executor.submit(contextvars.copy_context().run, self._call_tool, tool, action_input)
+
+    def _call_tool(self, tool: Tool, action_input: dict[str, Any]) -> Any:
+        with tracer.span("tool.call", tool=tool.name) as span:
+            try:
+                observation = tool.fn(**action_input)
+                if self.verbose:
+                    print(f"{tool.name}(**{action_input}) = {observation}")
+            except Exception as e:
+                #raise e
+                observation = f"ERROR: {' '.join(str(arg) for arg in e.args)}"
+                span.set(error=type(e).__name__)
+            span.count(output_tokens=estimate_tokens(str(observation)))
+        return observation
+
+    def _record_tool_outputs(self, calls: list[ToolCall], futures: list[Future]) -> None:
+        """Wait for the tool calls of one step and add their outputs to the history, in call order."""
+        for (action_name, _), future in zip(calls, futures):
+            observation = future.result()
+            if len(calls) == 1:
+                self.add_history('assistant', f"Tool Output: {observation}")
+            else:
+                self.add_history('assistant', f"Tool Output: {action_name}: {observation}")
+
+    def _end_turn(self, span: Span) -> None:
+        self.last_summary = span.summary()
+        if self.verbose:
+            print(format_summary(self.last_summary))
+
+    def _record_calls(self, calls: list[ToolCall]) -> str:
+        """Add a native response's tool calls to the history, written as ReAct lines."""
+        text = "\n".join(
+            f"Tool: {name}\nTool Input: {args if isinstance(args, str) else json.dumps(args, default=str)}"
+            for name, args in calls
+        )
+        self.add_history('assistant', text)
+        return text
+
+    def _check_progress(self, text: str, calls: list[ToolCall], futures: list[Future]) -> Optional[str]:
+        """
+        Count a step that neither answered nor ran a tool against the turn's retry budget.
+
+        A step without tool calls is followed by a reminder of the expected format; the errors of
+        rejected calls are already in the tool outputs.
+
+        Returns:
+            None to go on, or the answer to end the turn with once the budget is used up.
+        """
+        if any(not isinstance(future, RejectedCall) for future in futures):
+            return None
+        if self._retries_left == 0:
+            if not calls and text and not text.startswith("Thought:"):
+                # The model answered, just not in the expected format.
+                return text
+            return self._give_up("Sorry, the model did not give a usable response. Please rephrase the request.")
+        self._retries_left -= 1
+        if not calls:
+            self.add_history('system', FORMAT_REMINDERS[self.backend])
+        return None
+
+    def _give_up(self, message: str) -> str:
+        self.add_history('assistant', message if self.backend == "native" else f"Final Answer: {message}")
+        return message
+
+    def _steps_exhausted(self) -> str:
+        return self._give_up(f"Stopped after {self.max_steps} steps without a final answer.")
+
+    def invoke_agent(self, user_prompt):
+        with tracer.span("agent.turn") as turn:
+            try:
+                return self._invoke_turn(user_prompt)
+            finally:
+                self._end_turn(turn)
+
+    def _invoke_turn(self, user_prompt):
+        system_prompt = self._start_turn(user_prompt)
         
-        tool_list = self.get_tool_list()
-        system_prompt = get_system_prompt(tool_list)
-        print(system_prompt)
-        
-        while True:
-            response = self.model.invoke(chatml.chatml_prompt(system_prompt, self.history, user_prompt))
-            user_prompt = ""
+        for step in range(self.max_steps):
+            with tracer.span("agent.step", step=step):
+                if self.backend == "native":
+                    text, calls, answer = self._invoke_native(system_prompt)
+                else:
+                    text, calls, answer = self._invoke_react(system_prompt)
+                if answer is not None:
+                    return answer
+
+                futures = [self._submit_tool(name, args) for name, args in calls]
+                self._record_tool_outputs(calls, futures)
+                stop = self._check_progress(text, calls, futures)
+                if stop is not None:
+                    return stop
+        return self._steps_exhausted()
+
+    def _invoke_react(self, system_prompt: str) -> tuple[str, list[ToolCall], Optional[str]]:
+        prompt = self._next_prompt(system_prompt)
+        with tracer.span("model.call") as span:
+            response = self.model.invoke(prompt)
             text = str(response.content).strip()
-            self.add_history('assistant', text)
-            
-            if "Final Answer:" in text:
-                return text.split("Final Answer:")[-1].strip()
+            span.count(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(text))
+        self.add_history('assistant', text)
 
-            action_match = re.search(r"Tool:\s*(.+)", text)
-            input_match = re.search(r"Tool Input:\s*(.+)", text)
+        with tracer.span("parse"):
+            parser = ReActStreamParser()
+            parser.feed(text)
+            parser.finish()
+        if parser.answer_started:
+            return text, [], parser.answer_delta()
+        return text, list(parser.tool_calls), None
 
-            if not action_match or not input_match:
-                # Still thinking...
-                continue
+    def _invoke_native(self, system_prompt: str) -> tuple[str, list[ToolCall], Optional[str]]:
+        messages = self._native_messages(system_prompt)
+        with tracer.span("model.call", native=True) as span:
+            response = self._native_model().invoke(messages)
+            text = str(response.content).strip()
+            span.count(
+                prompt_tokens=sum(estimate_tokens(str(m.content)) for m in messages),
+                completion_tokens=estimate_tokens(text) + estimate_tokens(json.dumps(response.tool_calls, default=str)),
+            )
+        calls = native_tool_calls(response)
+        if calls:
+            return self._record_calls(calls), calls, None
+        if text:
+            self.add_history('assistant', text)
+            return text, [], text
+        return "", [], None
 
-            action_name = action_match.group(1).strip()
-            action_input_raw = input_match.group(1).strip()
+    def stream_agent(self, user_prompt) -> Iterator[str]:
+        """
+        Like `invoke_agent`, but streams the model's output.
 
+        With the ReAct backend, each tool call is started on the thread pool as soon as its
+        `Tool Input:` line is complete, while the model may still be writing further calls.
+        Generation is stopped once the block of tool calls ends, so the model's usual trailing
+        text is neither waited for nor kept. Parsing happens while the model streams, so it is
+        part of the `model.call` span. With the native backend, tool calls are started once the
+        response is complete. Either way the final answer is yielded in chunks as the model
+        produces it.
+        """
+        with tracer.span("agent.turn") as turn:
             try:
-                action_input = ast.literal_eval(action_input_raw)
-            except Exception as e:
-                print(f"Failed to parse input: {e.args}")
-                raise e
+                yield from self._stream_turn(user_prompt)
+            finally:
+                self._end_turn(turn)
+
+    def _stream_turn(self, user_prompt) -> Iterator[str]:
+        system_prompt = self._start_turn(user_prompt)
 
+        for step in range(self.max_steps):
+            with tracer.span("agent.step", step=step):
+                if self.backend == "native":
+                    text, calls, futures, answered = yield from self._stream_native(system_prompt)
+                else:
+                    text, calls, futures, answered = yield from self._stream_react(system_prompt)
+                if answered:
+                    return
+
+                self._record_tool_outputs(calls, futures)
+                stop = self._check_progress(text, calls, futures)
+                if stop is not None:
+                    yield stop
+                    return
+        yield self._steps_exhausted()
+
+    def _stream_react(self, system_prompt: str) -> Generator[str, None, tuple[str, list[ToolCall], list[Future], bool]]:
+        parser = ReActStreamParser()
+        futures: list[Future] = []
+        prompt = self._next_prompt(system_prompt)
+        with tracer.span("model.call", stream=True) as span:
+            chunks = self.model.stream(prompt)
             try:
-                observation = self.tools[action_name](**action_input)
-                print(f"{action_name}(**{action_input}) = {observation}")
-            except Exception as e:
-                #raise e
-                observation = f"ERROR: {' '.join(e.args)}"
-            self.add_history('assistant', f"Tool Output: {observation}")
+                for chunk in chunks:
+                    parser.feed(str(chunk.content))
+                    answer = parser.answer_delta()
+                    if answer:
+                        yield answer
+                    futures.extend(self._submit_tool(*call) for call in parser.tool_calls[len(futures):])
+                    if parser.tool_calls_done:
+                        break
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+            parser.finish()
+            span.count(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(parser.text))
+        futures.extend(self._submit_tool(*call) for call in parser.tool_calls[len(futures):])
+        text = parser.text.strip()
+        self.add_history('assistant', text)
+        return text, list(parser.tool_calls), futures, parser.answer_started
+
+    def _stream_native(self, system_prompt: str) -> Generator[str, None, tuple[str, list[ToolCall], list[Future], bool]]:
+        messages = self._native_messages(system_prompt)
+        response = None
+        sent = ""
+        with tracer.span("model.call", stream=True, native=True) as span:
+            for chunk in self._native_model().stream(messages):
+                response = chunk if response is None else response + chunk
+                if response.tool_call_chunks:
+                    continue
+                # Trailing whitespace is held back, so the chunks join up to the stripped answer.
+                text = str(response.content).strip()
+                if len(text) > len(sent):
+                    yield text[len(sent):]
+                    sent = text
+            calls = native_tool_calls(response) if response is not None else []
+            span.count(
+                prompt_tokens=sum(estimate_tokens(str(m.content)) for m in messages),
+                completion_tokens=estimate_tokens(sent) + estimate_tokens(json.dumps([c[1] for c in calls], default=str)),
+            )
+        if calls:
+            futures = [self._submit_tool(name, args) for name, args in calls]
+            return self._record_calls(calls), calls, futures, False
+        if sent:
+            self.add_history('assistant', sent)
+            return sent, [], [], True
+        return "", [], [], False
+
+def native_tool_calls(response: AIMessage) -> list[ToolCall]:
+    """The tool calls of a native response, including calls whose arguments were not valid JSON."""
+    calls: list[ToolCall] = [(call["name"], call["args"]) for call in response.tool_calls]
+    calls.extend((call.get("name") or "", call.get("args") or "") for call in response.invalid_tool_calls)
+    return calls
+
+class ReActStreamParser:
+    """
+    Incremental parser for a (possibly streamed) ReAct response.
+
+    Text is fed in as it arrives and parsed line by line. Each `Tool:` line followed by a
+    `Tool Input:` line is added to `tool_calls` as soon as the input line is complete. The
+    first other line after the calls ends the block: `tool_calls_done` is set, generation can
+    stop, and the text is cut after the last call, since anything the model writes there
+    (including a `Final Answer:`) is a guess at the tool outputs.
+
+    Without tool calls, `answer_delta` returns the part of the final answer received since
+    its previous call. Trailing whitespace is held back, so the chunks join up to the
+    stripped answer.
+    """
+    ANSWER_MARKER = "Final Answer:"
+
+    def __init__(self):
+        self.text = ""
+        self.tool_calls: list[tuple[str, str]] = []
+        self.tool_calls_done = False
+        self._tool_name: Optional[str] = None
+        self._line_start = 0
+        self._calls_end = 0
+        self._answer_start: Optional[int] = None
+        self._answer_sent = 0
+
+    @property
+    def answer_started(self) -> bool:
+        return self._answer_start is not None
+
+    def feed(self, chunk: str) -> None:
+        """Append a chunk of text."""
+        if self.tool_calls_done:
+            return
+        self.text += chunk
+        while self._answer_start is None and not self.tool_calls_done:
+            end = self.text.find("\n", self._line_start)
+            if end == -1:
+                # Start streaming the answer before its line is complete.
+                if not self.tool_calls and self.ANSWER_MARKER in self.text[self._line_start:]:
+                    self._parse_line(self._line_start, len(self.text))
+                break
+            self._parse_line(self._line_start, end)
+            self._line_start = end + 1
+
+    def finish(self) -> None:
+        """Mark the end of the text, parsing its last line even without a line break."""
+        if self._answer_start is None and not self.tool_calls_done:
+            self._parse_line(self._line_start, len(self.text))
+            self._line_start = len(self.text)
+        if self.tool_calls and not self.tool_calls_done:
+            self._end_calls()
+
+    def _parse_line(self, start: int, end: int) -> None:
+        line = self.text[start:end].strip()
+        if not self.tool_calls and self.ANSWER_MARKER in line:
+            self._answer_start = start + self.text[start:end].index(self.ANSWER_MARKER) + len(self.ANSWER_MARKER)
+            self._answer_sent = self._answer_start
+        elif line.startswith("Tool Input:") and self._tool_name is not None:
+            self.tool_calls.append((self._tool_name, line[len("Tool Input:"):].strip()))
+            self._tool_name = None
+            self._calls_end = end
+        elif line.startswith("Tool:"):
+            self._tool_name = line[len("Tool:"):].strip()
+        elif self.tool_calls and line and not line.startswith("Thought:"):
+            self._end_calls()
+
+    def _end_calls(self) -> None:
+        self.text = self.text[:self._calls_end]
+        self.tool_calls_done = True
+
+    def answer_delta(self) -> str:
+        """Return the final answer text received since the previous call."""
+        if self._answer_start is None:
+            return ""
+        pending = self.text[self._answer_sent:]
+        if self._answer_sent == self._answer_start:
+            stripped = pending.lstrip()
+            self._answer_start += len(pending) - len(stripped)
+            self._answer_sent = self._answer_start
+            pending = stripped
+        pending = pending.rstrip()
+        self._answer_sent += len(pending)
+        return pending
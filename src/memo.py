@@ -0,0 +1,225 @@
+"""
+This module provides memoization of `TaskDAVClient` tool results.
+
+Read-only tool methods are decorated with `@memoized`, which caches each result in the
+instance's `MemoCache` under a key built from the call's arguments. Entries expire after a TTL
+and the least recently used entries are evicted once the cache is full. Entries are tagged with
+the `calendar_id` argument of the call, so writes drop the cached results of the calendar they
+modified: methods decorated with `@invalidates`, or the write path itself calling `invalidate`
+(as `TaskDAVClient.tasks_apply` does, once per calendar, for every task change).
+A result computed while such a write finished is not stored, since it may have been read before it.
+
+A memoized method can also be primed ahead of time (see the `prefetch` module): `claim` reserves
+a call and returns a `Priming`, whose `run` calls the method bypassing the cache and stores the
+fresh result. From the claim on, regular calls with the same arguments wait for that result
+instead of asking the server a second time.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Hashable, Optional, TypeVar
+from collections import OrderedDict
+import functools
+import inspect
+import threading
+import time
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+DEFAULT_TTL = 60.0
+DEFAULT_MAXSIZE = 256
+
+class MemoCache:
+    """A per-instance TTL + LRU cache of method results.
+
+    Args:
+        ttl: Default number of seconds an entry stays valid.
+        maxsize: Maximum number of entries; the least recently used are evicted first.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, maxsize: int = DEFAULT_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # key -> (expiry, calendar_id, value)
+        self._entries: OrderedDict[Hashable, tuple[float, Optional[str], Any]] = OrderedDict()
+        # Keys being primed, with an event set once their entry is stored (or priming failed).
+        self._priming: dict[Hashable, tuple[threading.Event, Optional[str]]] = {}
+        # Invalidations so far, of everything and per calendar; see `generation`.
+        self._cleared = 0
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """Look up a key, counting the hit or miss.
+
+        Returns:
+            tuple[bool, Any]: Whether a valid entry was found, and its value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def generation(self, calendar_id: Optional[str] = None) -> tuple[int, int]:
+        """Return a token that changes whenever entries of `calendar_id` are invalidated."""
+        with self._lock:
+            return self._generation(calendar_id)
+
+    def _generation(self, calendar_id: Optional[str]) -> tuple[int, int]:
+        return self._cleared, self._generations.get(calendar_id, 0) if calendar_id is not None else 0
+
+    def set(self, key: Hashable, value: Any, calendar_id: Optional[str] = None, ttl: Optional[float] = None, generation: Optional[tuple[int, int]] = None) -> None:
+        """Store a result; with `generation`, only if the calendar was not invalidated since that token was taken."""
+        with self._lock:
+            if generation is not None and generation != self._generation(calendar_id):
+                return
+            self._set(key, value, calendar_id, ttl)
+
+    def _set(self, key: Hashable, value: Any, calendar_id: Optional[str], ttl: Optional[float]) -> None:
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), calendar_id, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def begin_priming(self, key: Hashable, calendar_id: Optional[str] = None) -> Optional[threading.Event]:
+        """Mark a key as being primed; returns None if it already is."""
+        with self._lock:
+            if key in self._priming:
+                return None
+            event = threading.Event()
+            self._priming[key] = (event, calendar_id)
+            return event
+
+    def end_priming(self, key: Hashable, event: threading.Event, value: Any = None, ttl: Optional[float] = None, store: bool = True) -> None:
+        """Store a primed result and wake the callers waiting for it.
+
+        The result is dropped if the key's calendar was invalidated while it was computed.
+        """
+        with self._lock:
+            current = self._priming.get(key)
+            if current is not None and current[0] is event:
+                del self._priming[key]
+                if store:
+                    self._set(key, value, current[1], ttl)
+        event.set()
+
+    def wait_for_priming(self, key: Hashable) -> bool:
+        """Wait for a key being primed, if it is; returns whether there was anything to wait for."""
+        with self._lock:
+            current = self._priming.get(key)
+        if current is None:
+            return False
+        current[0].wait()
+        return True
+
+    def invalidate(self, calendar_id: Optional[str] = None) -> None:
+        """Drop the entries of one calendar, or every entry if `calendar_id` is None."""
+        with self._lock:
+            # Results being primed were computed from data that is now outdated; let them go.
+            for key in [k for k, (_, c) in self._priming.items() if calendar_id is None or c == calendar_id]:
+                del self._priming[key]
+            if calendar_id is None:
+                self._cleared += 1
+                self._entries.clear()
+                return
+            self._generations[calendar_id] = self._generations.get(calendar_id, 0) + 1
+            for key in [k for k, entry in self._entries.items() if entry[1] == calendar_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counters and the current number of entries."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+def freeze(value: Any) -> Hashable:
+    """Turn an argument value into something hashable, for use in a cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    return value
+
+class Priming:
+    """A call reserved by `claim`; it must be `run` or `cancel`led, or callers waiting for it hang."""
+
+    def __init__(self, memo: MemoCache, key: Hashable, event: threading.Event, call: Callable[[], Any], ttl: Optional[float]):
+        self.memo = memo
+        self.key = key
+        self.event = event
+        self.call = call
+        self.ttl = ttl
+
+    def run(self, ttl: Optional[float] = None) -> None:
+        """Make the call and store its result for `ttl` seconds (by default the method's TTL)."""
+        try:
+            value = self.call()
+        except BaseException:
+            self.cancel()
+            raise
+        self.memo.end_priming(self.key, self.event, value, self.ttl if ttl is None else ttl)
+
+    def cancel(self) -> None:
+        """Give up the reservation; waiting callers then make the call themselves."""
+        self.memo.end_priming(self.key, self.event, store=False)
+
+def memoized(ttl: Optional[float] = None) -> Callable[[F], F]:
+    """Cache a method's results in `self.memo`, keyed by its arguments.
+
+    Args:
+        ttl: Seconds a result stays valid; defaults to the cache's TTL.
+    """
+    def decorator(fn: F) -> F:
+        signature = inspect.signature(fn)
+
+        def key_of(self, args, kwargs) -> tuple[Hashable, Optional[str]]:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = list(bound.arguments.items())[1:]
+            return (fn.__name__, freeze(arguments)), bound.arguments.get("calendar_id")
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            key, calendar_id = key_of(self, args, kwargs)
+            found, value = self.memo.get(key)
+            if found:
+                return value
+            if self.memo.wait_for_priming(key):
+                found, value = self.memo.get(key)
+                if found:
+                    return value
+            # Not stored if a write invalidated the calendar while `fn` ran; it may predate the write.
+            generation = self.memo.generation(calendar_id)
+            value = fn(self, *args, **kwargs)
+            self.memo.set(key, value, calendar_id=calendar_id, ttl=ttl, generation=generation)
+            return value
+
+        def claim(self, *args, **kwargs) -> Optional[Priming]:
+            """Reserve a call for priming; returns None if the same call is already being primed."""
+            key, calendar_id = key_of(self, args, kwargs)
+            event = self.memo.begin_priming(key, calendar_id)
+            if event is None:
+                return None
+            return Priming(self.memo, key, event, functools.partial(fn, self, *args, **kwargs), ttl)
+
+        wrapper.claim = claim  # type: ignore[attr-defined]
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+def invalidates(fn: F) -> F:
+    """Drop the cached results of the call's `calendar_id` once the method returns successfully."""
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        result = fn(self, *args, **kwargs)
+        self.memo.invalidate(signature.bind(self, *args, **kwargs).arguments["calendar_id"])
+        return result
+    return wrapper  # type: ignore[return-value]
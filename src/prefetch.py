@@ -0,0 +1,126 @@
+"""
+This module provides `Prefetcher`, which warms the memo cache of a `TaskDAVClient` in the background.
+
+Most sessions start with the model listing the calendars and then the tasks or overdue tasks of a
+calendar, each a model step followed by blocking requests. A prefetch makes these calls ahead of
+time, while the user is still typing or the model is generating, so the tools are then answered
+from memory. A tool call made while the prefetch of the same result is still running waits for
+it instead of sending the same requests again (see `memo`).
+
+Prefetched results are kept for `max_age` seconds, so the tools are never handed anything older.
+A new prefetch is only started once half of that has passed since the last one finished.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
+import threading
+import time
+
+from memo import Priming
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from dav import TaskDAVClient
+
+# Memoized tools primed for every calendar, with their default arguments. The listings come first,
+# so the calendar is downloaded once and the overdue tasks are then found locally.
+PREFETCH_TOOLS = ("task_list_page", "task_list_by_calendar", "task_list_overdue")
+
+class Prefetcher:
+    """
+    Runs the usual first tool calls of a session in the background.
+
+    Args:
+        client: The client whose memo cache is warmed.
+        max_age: Seconds prefetched results are served for.
+        max_workers: Number of calendars prefetched at the same time.
+        calendar_ids: Calendars to prefetch; defaults to all of them.
+    """
+
+    def __init__(self, client: TaskDAVClient, max_age: float = 30, max_workers: int = 4, calendar_ids: Optional[list[str]] = None):
+        self.client = client
+        self.max_age = max_age
+        self.calendar_ids = calendar_ids
+        self.last_error: Optional[str] = None
+        self._slots = threading.BoundedSemaphore(max(1, max_workers))
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+        self._finished: Optional[float] = None
+
+    def start(self) -> bool:
+        """
+        Start a prefetch unless one is running or the last one is still fresh. Never blocks.
+
+        Returns:
+            bool: Whether a prefetch was started.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                return False
+            if self._finished is not None and time.monotonic() - self._finished < self.max_age / 2:
+                return False
+            self._done.clear()
+        # Claimed here, so a `calendar_list_ids` call made right away waits for the prefetch.
+        listing = None if self.calendar_ids else type(self.client).calendar_list_ids.claim(self.client)
+        threading.Thread(target=self._run, args=(listing,), name="prefetch", daemon=True).start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the running prefetch, if any; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def _run(self, listing: Optional[Priming]) -> None:
+        try:
+            with tracer.span("prefetch") as span:
+                if listing is not None:
+                    listing.run(self.max_age)
+                calendar_ids = self.calendar_ids or self.client.calendar_list_ids()
+                span.set(calendars=len(calendar_ids))
+                # Every call is claimed before any is made, so tool calls wait for the prefetch
+                # instead of racing it.
+                claims = [
+                    [c for c in (getattr(type(self.client), name).claim(self.client, calendar_id) for name in PREFETCH_TOOLS) if c is not None]
+                    for calendar_id in calendar_ids
+                ]
+                # Daemon threads, so a prefetch never delays the exit of the process.
+                threads = [
+                    threading.Thread(target=self._prefetch_calendar, args=(calendar_id, calendar_claims), name="prefetch", daemon=True)
+                    for calendar_id, calendar_claims in zip(calendar_ids, claims)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self._finished = time.monotonic()
+                self._done.set()
+
+    def _prefetch_calendar(self, calendar_id: str, claims: list[Priming]) -> None:
+        with self._slots, tracer.span("prefetch.calendar", calendar_id=calendar_id):
+            for i, claim in enumerate(claims):
+                try:
+                    claim.run(self.max_age)
+                except Exception as e:
+                    # The tool calls will report the problem, if they are made.
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    for rest in claims[i + 1:]:
+                        rest.cancel()
+                    return
+
+def prefetcher_from_config(client: TaskDAVClient, config) -> Optional[Prefetcher]:
+    """
+    Build the prefetcher described by the `prefetch*` settings of a config module.
+
+    Returns:
+        None if `prefetch` is off, otherwise a `Prefetcher` (not started yet).
+    """
+    if not getattr(config, "prefetch", True):
+        return None
+    return Prefetcher(
+        client,
+        max_age=getattr(config, "prefetch_max_age", 30),
+        max_workers=getattr(config, "tool_max_concurrency", 4),
+    )
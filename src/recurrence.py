@@ -0,0 +1,209 @@
+"""
+This module expands recurring VTODOs into their occurrences.
+
+A recurring task is one master VTODO with RRULE, RDATE and EXDATE properties, plus optional
+override components (with a RECURRENCE-ID) that change or complete single occurrences.
+`RecurrenceSeries` turns such a resource into occurrences, each a `TodoRecord` with the DUE and
+DTSTART of that occurrence, so listings, filters and the search index handle them like any
+other task.
+
+Expansion is lazy: occurrence starts are generated with `dateutil.rrule` only as far as a query
+needs, and are kept, so later queries over the same window do not expand the rules again. A
+query far past the expanded range starts a new expansion there instead of generating every
+occurrence in between. A series is built from one version of a task, and `CachedTask` holds it
+for as long as it holds that version, so the expansion is cached per UID and ETag.
+
+Which occurrence a task currently stands for does not depend on the clock: it is the first
+occurrence after the last one that was completed. Clients either complete an occurrence through
+an override (RFC 5545) or move the master's DTSTART/DUE forward; both are handled.
+
+All times are naive local wall times, like everywhere else in the task tools; a UTC UNTIL is
+compared as written.
+"""
+from __future__ import annotations
+from typing import Iterator, Optional, Union
+from datetime import date, datetime, timedelta
+import bisect
+import re
+import threading
+
+import icalendar
+from dateutil import rrule
+
+from task_query import naive_datetime
+from todo_record import TodoRecord
+
+# Stop expanding a series after this many occurrences, whatever the window asked for.
+MAX_OCCURRENCES = 10000
+DONE_STATUSES = ("COMPLETED", "CANCELLED")
+
+_RECURRENCE_PROPERTY = re.compile(r"^(?:RRULE|RDATE)[;:]", re.MULTILINE)
+
+def is_recurring(data: str) -> bool:
+    """Whether a resource has recurrence rules or dates, without parsing it."""
+    return _RECURRENCE_PROPERTY.search(data) is not None
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _dates(value) -> list[datetime]:
+    """The naive datetimes of an RDATE or EXDATE property (which may repeat)."""
+    return [naive_datetime(d) for prop in _as_list(value) for d in prop.dts]
+
+class _Segment:
+    """Every occurrence start after `base` (or from the first, if None), expanded so far."""
+
+    def __init__(self, base: Optional[datetime], iterator: Iterator[datetime]):
+        self.base = base
+        self.starts: list[datetime] = []
+        self.iterator: Optional[Iterator[datetime]] = iterator
+
+    def covers(self, after: Optional[datetime]) -> bool:
+        """Whether the starts after `after` can be read from this segment without a gap."""
+        if after is None:
+            return self.base is None
+        if self.base is not None and after < self.base:
+            return False
+        return self.iterator is None or (bool(self.starts) and after <= self.starts[-1])
+
+    def expand_one(self) -> bool:
+        """Generate the next start; False once the series (or `MAX_OCCURRENCES`) is exhausted."""
+        if self.iterator is None:
+            return False
+        start = next(self.iterator, None) if len(self.starts) < MAX_OCCURRENCES else None
+        if start is None:
+            self.iterator = None
+            return False
+        self.starts.append(start)
+        return True
+
+class RecurrenceSeries:
+    """
+    The occurrences of one version of a recurring task.
+
+    Args:
+        data: The iCalendar text of the resource.
+    """
+
+    def __init__(self, data: str):
+        todos = list(icalendar.Calendar.from_ical(data).walk("VTODO"))
+        master = next((c for c in todos if "RECURRENCE-ID" not in c), todos[0])
+        self.master = TodoRecord.from_ical(data)
+        anchor = master.get("DTSTART") or master.get("DUE")
+        self.all_day = anchor is not None and not isinstance(anchor.dt, datetime)
+        self.start = naive_datetime(anchor)
+        self.has_start = "DTSTART" in master
+        due = naive_datetime(master.get("DUE"))
+        # DUE of each occurrence relative to its start; None if the task has no DUE.
+        self.due_offset: Optional[timedelta] = due - self.start if due is not None and self.start is not None else None
+
+        self.rules = rrule.rruleset()
+        if self.start is not None:
+            for rule in _as_list(master.get("RRULE")):
+                self.rules.rrule(rrule.rrulestr(rule.to_ical().decode(), dtstart=self.start, ignoretz=True))
+            # DTSTART is always the first occurrence, even when the rule would not produce it.
+            self.rules.rdate(self.start)
+            for moment in _dates(master.get("RDATE")):
+                self.rules.rdate(moment)
+            for moment in _dates(master.get("EXDATE")):
+                self.rules.exdate(moment)
+
+        self.overrides: dict[datetime, TodoRecord] = {}
+        for component in todos:
+            if component is not master and "RECURRENCE-ID" in component:
+                record = TodoRecord.from_ical(component.to_ical().decode())
+                if record is not None:
+                    self.overrides[naive_datetime(component["RECURRENCE-ID"])] = record
+
+        self._segment = _Segment(None, iter(self.rules))
+        self._lock = threading.Lock()
+        self._current: Optional[tuple[datetime, TodoRecord]] = None
+        self._current_known = False
+
+    def starts(self, after: Optional[datetime] = None) -> Iterator[datetime]:
+        """Yield occurrence starts in order, from `after` (exclusive) on, expanding as needed."""
+        if self.start is None:
+            return
+        with self._lock:
+            if not self._segment.covers(after):
+                self._segment = _Segment(after, self.rules.xafter(after) if after is not None else iter(self.rules))
+            segment = self._segment
+            i = 0 if after is None else bisect.bisect_right(segment.starts, after)
+        while True:
+            with self._lock:
+                if i == len(segment.starts) and not segment.expand_one():
+                    return
+                start = segment.starts[i]
+            yield start
+            i += 1
+
+    def occurrence(self, start: datetime) -> TodoRecord:
+        """The record of the occurrence starting at `start`: its override, or the master moved there."""
+        override = self.overrides.get(start)
+        if override is not None:
+            return override
+        due = start + self.due_offset if self.due_offset is not None else None
+        return self.master.copy(
+            due=self._value(due),
+            dtstart=self._value(start) if self.has_start else None,
+            status=self.master.status if self.master.status not in DONE_STATUSES else None,
+            completed=None,
+        )
+
+    def _value(self, moment: Optional[datetime]) -> Union[date, datetime, None]:
+        if moment is None:
+            return None
+        return moment.date() if self.all_day else moment
+
+    def occurrences(self, window_start: Optional[datetime] = None, window_end: Optional[datetime] = None) -> Iterator[TodoRecord]:
+        """
+        Yield the occurrences due within a window, in order.
+
+        Occurrences without a DUE are placed by their start instead.
+
+        Args:
+            window_start: Only occurrences due at or after this time.
+            window_end: Only occurrences due before this time; None expands to the end of the series.
+        """
+        offset = self.due_offset or timedelta(0)
+        after = window_start - offset - timedelta(microseconds=1) if window_start is not None else None
+        for start in self.starts(after):
+            if window_end is not None and start + offset >= window_end:
+                return
+            yield self.occurrence(start)
+
+    def current(self) -> Optional[TodoRecord]:
+        """
+        The occurrence the task stands for now: the first one after the last completed occurrence
+        that is neither completed nor cancelled.
+
+        Returns:
+            Optional[TodoRecord]: The occurrence, or None if the series is finished or the master
+                itself was completed or cancelled.
+        """
+        current = self._find_current()
+        return current[1] if current is not None else None
+
+    def current_start(self) -> Optional[datetime]:
+        """The start of the `current` occurrence, which identifies it (as its RECURRENCE-ID); None if there is none."""
+        current = self._find_current()
+        return current[0] if current is not None else None
+
+    def _find_current(self) -> Optional[tuple[datetime, TodoRecord]]:
+        if not self._current_known:
+            self._current = self._search_current()
+            self._current_known = True
+        return self._current
+
+    def _search_current(self) -> Optional[tuple[datetime, TodoRecord]]:
+        if self.master.status in DONE_STATUSES or self.start is None:
+            return None
+        done = [moment for moment, record in self.overrides.items() if record.status == "COMPLETED"]
+        after = max(done) if done else None
+        for start in self.starts(after):
+            record = self.occurrence(start)
+            if record.status not in DONE_STATUSES:
+                return start, record
+        return None
@@ -1,33 +1,67 @@
 
 
 if __name__ == "__main__":
-    import pprint
-    from langchain_ollama import ChatOllama
-
-    import llama_agent
     import dav
     import config
+    from discovery_cache import discovery_cache_from_config
+    import sync_worker
+    from prefetch import prefetcher_from_config
+    import tracing
+    from task_replica import replica_from_config
 
-    llm = ChatOllama(model="llama3.1", temperature=0.1)
+    tracing.configure_from_config(config)
 
     client = dav.TaskDAVClient(
         url=config.caldav_url,
         username=config.caldav_username,
-        password=config.caldav_password
+        password=config.caldav_password,
+        memo_ttl=getattr(config, "memo_ttl", 60),
+        replica=replica_from_config(config),
+        discovery_cache=discovery_cache_from_config(config, config.caldav_url, config.caldav_username),
     )
+    sync_worker.start_from_config(client, config)
+    prefetcher = prefetcher_from_config(client, config)
+    if prefetcher is not None:
+        # Discovery and the first listings run while the model's modules are imported.
+        prefetcher.start()
 
-    llama_agent = llama_agent.ReActAgent(llm)
+    from langchain_ollama import ChatOllama
+
+    import llama_agent
+    from agent_memory import memory_from_config
+
+    llm = ChatOllama(model="llama3.1", temperature=0.1)
+
+    llama_agent = llama_agent.ReActAgent(
+        llm,
+        memory=memory_from_config(config, llm),
+        max_parallel_tools=getattr(config, "tool_max_concurrency", 4),
+        verbose=getattr(config, "agent_verbose", False),
+        backend=getattr(config, "agent_backend", "react"),
+        max_steps=getattr(config, "agent_max_steps", 10),
+        max_retries=getattr(config, "agent_max_retries", 2),
+        prefetch=prefetcher.start if prefetcher is not None else None,
+    )
     llama_agent.add_tool(client.calendar_list_ids)
     llama_agent.add_tool(client.task_list_by_calendar)
+    llama_agent.add_tool(client.task_list_page)
+    llama_agent.add_tool(client.task_list_upcoming)
+    llama_agent.add_tool(client.task_search)
+    llama_agent.add_tool(client.event_list_range)
+    llama_agent.add_tool(client.calendar_free_busy)
+    llama_agent.add_tool(client.calendar_find_free_slot)
     
     while True:
+        if prefetcher is not None:
+            prefetcher.start()
         user_prompt = input("Ask: ").strip()
         if user_prompt == "":
             continue
         elif user_prompt.lower() in ['quit', 'exit', 'q']:
             break
-        answer = llama_agent.invoke_agent(user_prompt)
-    
-        pprint.pprint(llama_agent.history)
         print("----------")
-        print(answer)
+        for chunk in llama_agent.stream_agent(user_prompt):
+            print(chunk, end="", flush=True)
+        print()
+
+    client.close()
@@ -0,0 +1,83 @@
+"""Export the tasks of a calendar to a file, or import them from one.
+
+Exports are written as they are downloaded and imports are sent as they are read, so even very
+large calendars need little memory. An interrupted import continues where it stopped when it is
+run again with the same file; tasks that already exist are left alone unless `--overwrite` is given.
+
+Examples:
+    run-bulk.py export work -o work.ics
+    run-bulk.py export work -o work.jsonl
+    run-bulk.py import archive work.ics
+    run-bulk.py --url https://other.example/dav/ import archive work.jsonl
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from async_dav import AsyncTaskDAVClient
+from bulk import FORMATS, ImportProgress
+import config
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=config.caldav_url, help="CalDAV server URL (default: caldav_url of config.py)")
+    parser.add_argument("--username", default=config.caldav_username)
+    parser.add_argument("--password", default=config.caldav_password)
+    parser.add_argument("--concurrency", type=int, default=getattr(config, "bulk_concurrency", 8), help="requests in flight")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write every task of a calendar to a file")
+    export.add_argument("calendar_id")
+    export.add_argument("-o", "--output", default="-", help="file to write (default: standard output)")
+    export.add_argument("--format", choices=FORMATS, help="default: jsonl for .jsonl files, otherwise ics")
+
+    load = commands.add_parser("import", help="save the tasks of an export into a calendar")
+    load.add_argument("calendar_id")
+    load.add_argument("source", help="file to read, or - for standard input")
+    load.add_argument("--progress", help="progress file (default: the source file name plus .progress)")
+    load.add_argument("--overwrite", action="store_true", help="replace tasks that already exist")
+    return parser.parse_args()
+
+async def export(client: AsyncTaskDAVClient, args: argparse.Namespace) -> int:
+    format = args.format or ("jsonl" if args.output.endswith(".jsonl") else "ics")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    count = 0
+    try:
+        async for chunk in client.tasks_export(args.calendar_id, format):
+            out.write(chunk)
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {max(0, count - 2) if format == 'ics' else count} tasks.", file=sys.stderr)
+    return 0
+
+async def load(client: AsyncTaskDAVClient, args: argparse.Namespace) -> int:
+    progress_path = args.progress or (None if args.source == "-" else f"{args.source}.progress")
+    progress = ImportProgress(progress_path, args.calendar_id)
+    source = sys.stdin if args.source == "-" else open(args.source, newline="")
+    try:
+        summary = await client.tasks_import(args.calendar_id, source, progress, overwrite=args.overwrite)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    for failure in summary["failed"]:
+        print(json.dumps(failure), file=sys.stderr)
+    print(
+        f"Created {summary['created']}, left {summary['existing']} existing, "
+        f"skipped {summary['resumed']} imported before, {len(summary['failed'])} failed.",
+        file=sys.stderr,
+    )
+    if summary["failed"]:
+        return 1
+    progress.remove()
+    return 0
+
+async def main() -> int:
+    args = parse_args()
+    async with AsyncTaskDAVClient(args.url, args.username, args.password, max_concurrency=args.concurrency) as client:
+        return await (export if args.command == "export" else load)(client, args)
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -2,26 +2,61 @@
 
 This script sets up a basic conversation loop where a user can interact with an
 AI agent designed to manage tasks using a calendar service.
+
+LangChain and LangGraph are imported when the agent is built, after the client has started
+discovering calendars and prefetching tasks, so the network and the imports overlap.
 """
+from __future__ import annotations
 import pprint
-from typing import Any, cast
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from langchain.chat_models import init_chat_model
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence, cast
+
+from caldav.lib import error
 
 # Local project imports
 import dav
 import config
+from discovery_cache import discovery_cache_from_config
+from prefetch import Prefetcher, prefetcher_from_config
+import sync_worker
+from task_replica import replica_from_config
+import tracing
 
-from langchain_core.tools import tool, BaseTool
 from dav import TaskDAVClient
 
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
+    from tool_router import ToolRouter
+
+def task_update_tool(client: 'TaskDAVClient') -> BaseTool:
+    """Wrap `TaskDAVClient.task_update`, whose `**fields` cannot be described as a tool schema."""
+    def task_update(calendar_id: str, task_id: str, fields: dict[str, Any]) -> dict[str, Any]:
+        """Change several fields of a task at once. Prefer this over multiple task_update_* calls.
+
+        Args:
+            calendar_id: Calendar ID.
+            task_id: Task ID (uid).
+            fields: New values by field name: summary, priority, due, description, dtstart, dtend or completed (bool). A null value removes the field.
+
+        Returns:
+            dict[str, Any]: The serialized task after the update.
+        """
+        return client.task_update(calendar_id, task_id, **fields)
+    from langchain_core.tools import tool
+
+    return tool(task_update, parse_docstring=True)
+
 def get_taskdav_tools(client: 'TaskDAVClient') -> list[BaseTool]:
     """Return all LangChain tools for the given TaskDAVClient instance."""
+    from langchain_core.tools import tool
+
     return [
         tool(client.task_get_by_id, parse_docstring=True),
         tool(client.task_list_by_calendar, parse_docstring=True),
         tool(client.task_list_overdue, parse_docstring=True),
+        tool(client.task_list_upcoming, parse_docstring=True),
+        tool(client.task_list_page, parse_docstring=True),
+        tool(client.task_search, parse_docstring=True),
         tool(client.calendar_list_ids, parse_docstring=True),
         tool(client.task_add_to_calendar, parse_docstring=True),
         tool(client.task_mark_complete, parse_docstring=True),
@@ -32,16 +67,25 @@ def get_taskdav_tools(client: 'TaskDAVClient') -> list[BaseTool]:
         tool(client.task_update_description, parse_docstring=True),
         tool(client.task_update_start_date, parse_docstring=True),
         tool(client.task_update_end_date, parse_docstring=True),
-    ]
+        task_update_tool(client),
+        tool(client.tasks_apply, parse_docstring=True),
+        tool(client.event_list_range, parse_docstring=True),
+        tool(client.event_add_to_calendar, parse_docstring=True),
+        tool(client.event_move, parse_docstring=True),
+        tool(client.event_delete, parse_docstring=True),
+        tool(client.calendar_free_busy, parse_docstring=True),
+        tool(client.calendar_find_free_slot, parse_docstring=True),
+    ] + ([tool(client.task_sync_status, parse_docstring=True)] if client.replica is not None else [])
 
 
 
 def build_full_prompt(client: dav.TaskDAVClient, user_prompt:str):
     system_prompt:list[str] = [
-        "You are a terse agent for managing tasks.",
+        "You are a terse agent for managing tasks and events.",
         "Respond with only the direct output.",
         "Do not include follow-ups, explanations, or conversational tone.",
         "No questions or suggestions unless explicitly asked for.",
+        "Request independent tool calls together in one step; they run in parallel.",
         "Do not use markdown formatting.",
         f"Available calendar IDs are: {', '.join(client.calendar_list_ids())}"
     ]
@@ -52,13 +96,99 @@ def build_full_prompt(client: dav.TaskDAVClient, user_prompt:str):
         ],
     }
 
-def build_agent(client: dav.TaskDAVClient):
-    return create_react_agent(
-        model=init_chat_model(config.ai_model),
-        tools=get_taskdav_tools(client),
-        checkpointer=MemorySaver(),
+class RoutedAgent:
+    """
+    Run each request on a prebuilt agent bound to only the tools the request needs.
+
+    One agent is built per tool subset and reused. All of them share the checkpointer, so a
+    conversation continues across subsets.
+
+    Args:
+        router: Picks the tools for a request.
+        build: Builds an agent for a list of tools.
+    """
+
+    def __init__(self, router: ToolRouter, build: Callable[[Sequence[BaseTool]], Any]):
+        self.router = router
+        self.build = build
+        self.agents: dict[tuple[str, ...], Any] = {}
+        self.lock = threading.Lock()
+
+    def agent_for(self, request: str) -> Any:
+        with tracing.tracer.span("tool.route") as span:
+            tools = self.router.select(request)
+            span.set(tools=len(tools))
+        key = tuple(t.name for t in tools)
+        with self.lock:
+            agent = self.agents.get(key)
+            if agent is None:
+                agent = self.agents[key] = self.build(tools)
+        return agent
+
+    def invoke(self, input: dict[str, Any], config: Any = None, **kwargs: Any) -> Any:
+        return self.agent_for(last_user_message(input)).invoke(input, config, **kwargs)
+
+    def stream(self, input: dict[str, Any], config: Any = None, **kwargs: Any) -> Any:
+        return self.agent_for(last_user_message(input)).stream(input, config, **kwargs)
+
+def last_user_message(input: dict[str, Any]) -> str:
+    """Return the text of the last human message of an agent input."""
+    for message in reversed(input.get("messages", [])):
+        if isinstance(message, tuple):
+            role, content = message
+        else:
+            role, content = getattr(message, "type", ""), getattr(message, "content", "")
+        if role in ("human", "user"):
+            return str(content)
+    return ""
+
+def build_router(tools: Sequence[BaseTool]) -> ToolRouter:
+    from langchain.chat_models import init_chat_model
+    from tool_router import ToolRouter
+
+    router_model = getattr(config, "tool_router_model", "")
+    return ToolRouter(
+        tools,
+        top_k=getattr(config, "tool_router_top_k", 5),
+        min_score=getattr(config, "tool_router_min_score", 1.5),
+        # Tools working on one task or event need a way to find its ID.
+        companions={
+            **{t.name: ["task_search"] for t in tools if "task_id" in t.args},
+            **{t.name: ["event_list_range"] for t in tools if "event_id" in t.args},
+        },
+        router_model=init_chat_model(router_model) if router_model else None,
     )
 
+def tool_error_message(e: Exception) -> str:
+    """Report a failed tool call to the model, as `ToolNode` does by default.
+
+    Rejected credentials are raised instead: the model cannot fix them, and the caller (the HTTP
+    server answering 401, for one) has to see them.
+    """
+    from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
+
+    if isinstance(e, error.AuthorizationError):
+        raise e
+    return TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e))
+
+def build_agent(client: dav.TaskDAVClient, model=None, checkpointer=None):
+    """Build the prebuilt agent for a client; the model and checkpointer can be shared between agents."""
+    from langchain.chat_models import init_chat_model
+    from langgraph.prebuilt import ToolNode, create_react_agent
+    from sqlite_checkpoint import checkpointer_from_config
+
+    model = model or init_chat_model(config.ai_model)
+    checkpointer = checkpointer or checkpointer_from_config(config)
+    tools = get_taskdav_tools(client)
+
+    def build(subset: Sequence[BaseTool]):
+        tool_node = ToolNode(subset, handle_tool_errors=tool_error_message)
+        return create_react_agent(model=model, tools=tool_node, checkpointer=checkpointer)
+
+    if not getattr(config, "tool_routing", True):
+        return build(tools)
+    return RoutedAgent(build_router(tools), build)
+
 def handle_response(content):
     """Handle the response from the agent."""
     if content is None:
@@ -77,12 +207,22 @@ def handle_response(content):
     else:
         print(str(content))
 
-def run_conversation_loop(client: dav.TaskDAVClient):
-    """ Run a simple conversation loop with the agent."""
+def run_conversation_loop(client: dav.TaskDAVClient, prefetcher: Optional[Prefetcher] = None):
+    """ Run a simple conversation loop with the agent.
+
+    Args:
+        client: The CalDAV client the tools use.
+        prefetcher: Started before each prompt, to load the usual first tool results while the user types.
+    """
+    if prefetcher is not None:
+        # Discovery and the first listings run while the agent's modules are imported.
+        prefetcher.start()
     agent = build_agent(client)
     
     print("Type 'exit' or 'quit' to stop the conversation.")
     while True:
+        if prefetcher is not None:
+            prefetcher.start()
         
         print("-" * 80)
         user_prompt = input("You: ").strip()
@@ -92,7 +232,15 @@ def run_conversation_loop(client: dav.TaskDAVClient):
         elif user_prompt == "":
             continue
         
-        response = agent.invoke(build_full_prompt(client, user_prompt), {"configurable": {"thread_id": "123456"}})
+        with tracing.tracer.span("agent.turn"):
+            response = agent.invoke(
+                build_full_prompt(client, user_prompt),
+                {
+                    "configurable": {"thread_id": "123456"},
+                    # Parallel tool calls of one step run on a thread pool of this size.
+                    "max_concurrency": getattr(config, "tool_max_concurrency", 4),
+                },
+            )
         if "messages" in response:
             handle_response(response)
             continue
@@ -109,10 +257,18 @@ def run_conversation_loop(client: dav.TaskDAVClient):
 
 
 if __name__ == "__main__":
+    tracing.configure_from_config(config)
     client = dav.TaskDAVClient(
         url=config.caldav_url,
         username=config.caldav_username,
-        password=config.caldav_password
+        password=config.caldav_password,
+        memo_ttl=getattr(config, "memo_ttl", 60),
+        replica=replica_from_config(config),
+        discovery_cache=discovery_cache_from_config(config, config.caldav_url, config.caldav_username),
     )
+    sync_worker.start_from_config(client, config)
 
-    run_conversation_loop(client)
+    try:
+        run_conversation_loop(client, prefetcher_from_config(client, config))
+    finally:
+        client.close()
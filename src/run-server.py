@@ -0,0 +1,357 @@
+"""Serve the prebuilt task agent to many users over HTTP/JSON.
+
+Each request authenticates with HTTP Basic credentials, which are the user's CalDAV login:
+
+    curl -u alice:secret -d '{"message": "What is overdue?"}' http://127.0.0.1:8080/chat
+    {"reply": "...", "session_id": "3f0c..."}
+
+Sending the returned `session_id` with the next message continues the same conversation.
+`GET /health` returns pool and queue statistics.
+
+Credentials are checked against the CalDAV server before a client is pooled or a conversation is
+touched. Authenticated `TaskDAVClient` instances, each with its agent, are kept in a bounded `ClientPool`
+and closed after `server_idle_timeout` seconds without use. All agents share one model and one
+checkpointer, where every (user, session) pair has its own thread. Agent calls run on a pool of
+`server_workers` threads; once `server_max_pending` requests are waiting, new ones are rejected
+with 503 so clients back off instead of piling up.
+"""
+from __future__ import annotations
+from typing import Any, AsyncIterator, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import asyncio
+import base64
+import contextlib
+import hashlib
+import importlib
+import json
+import time
+import uuid
+import weakref
+
+from caldav.lib import error
+from langchain.chat_models import init_chat_model
+
+import config
+import dav
+from sqlite_checkpoint import checkpointer_from_config
+import tracing
+
+prebuilt = importlib.import_module("run-prebuilt")
+
+MAX_BODY_BYTES = 64 * 1024
+
+class HTTPError(Exception):
+    """Raised by request handlers to answer with an error status."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+class PooledClient:
+    """A user's CalDAV client and the agent built on it."""
+
+    def __init__(self, client: dav.TaskDAVClient, agent: Any):
+        self.client = client
+        self.agent = agent
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        # Set once the entry left the pool; the client is closed when the last user returns it.
+        self.discarded = False
+
+class ClientPool:
+    """A bounded pool of authenticated clients, keyed by credentials.
+
+    Args:
+        factory: Builds a `PooledClient` from a username and password. It is run on `executor`,
+            since building an agent blocks.
+        executor: Thread pool to run `factory` on.
+        max_clients: Maximum number of pooled clients; the least recently used idle client is
+            closed to make room.
+        idle_timeout: Seconds after which an unused client is closed by `evict_idle`.
+    """
+
+    def __init__(self, factory: Callable[[str, str], PooledClient], executor: ThreadPoolExecutor, max_clients: int = 64, idle_timeout: float = 900):
+        self.factory = factory
+        self.executor = executor
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.entries: dict[tuple[str, str], PooledClient] = {}
+        self._creating: dict[tuple[str, str], asyncio.Future] = {}
+
+    @staticmethod
+    def key(username: str, password: str) -> tuple[str, str]:
+        return username, hashlib.sha256(password.encode()).hexdigest()
+
+    @contextlib.asynccontextmanager
+    async def client(self, username: str, password: str) -> AsyncIterator[PooledClient]:
+        """Borrow the pooled client for these credentials, creating it if needed.
+
+        Raises:
+            HTTPError: 503 if the pool is full and every client is in use.
+        """
+        key = self.key(username, password)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = await self._create(key, username, password)
+        entry.in_use += 1
+        try:
+            yield entry
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.discarded and entry.in_use == 0:
+                entry.client.close()
+
+    async def _create(self, key: tuple[str, str], username: str, password: str) -> PooledClient:
+        # Concurrent first requests of the same user share one client.
+        creating = self._creating.get(key)
+        if creating is not None:
+            return await asyncio.shield(creating)
+        self._make_room()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self.factory, username, password)
+        self._creating[key] = future
+        try:
+            entry = await future
+        finally:
+            del self._creating[key]
+        self.entries[key] = entry
+        return entry
+
+    def _make_room(self) -> None:
+        while len(self.entries) + len(self._creating) >= self.max_clients:
+            idle = [(e.last_used, k) for k, e in self.entries.items() if e.in_use == 0]
+            if not idle:
+                raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many users are active; try again later.")
+            self.discard(min(idle)[1])
+
+    def discard(self, key: tuple[str, str]) -> None:
+        """Drop a client, e.g. because its credentials were rejected, closing it once no request uses it."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        entry.discarded = True
+        if entry.in_use == 0:
+            entry.client.close()
+
+    def evict_idle(self) -> int:
+        """Close clients that have not been used for `idle_timeout` seconds; returns how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [k for k, e in self.entries.items() if e.in_use == 0 and e.last_used < cutoff]
+        for key in expired:
+            self.discard(key)
+        return len(expired)
+
+class AgentServer:
+    """HTTP/JSON front end running agent calls on a bounded worker pool.
+
+    Args:
+        workers: Number of agent calls that run at the same time.
+        max_pending: Number of requests admitted (running or waiting) before answering 503.
+        max_clients: Size of the `ClientPool`.
+        idle_timeout: Seconds before an unused client is closed.
+        checkpointer: LangGraph checkpointer shared by all agents; defaults to the one set in config.
+        model: Chat model shared by all agents; defaults to `config.ai_model`.
+    """
+
+    def __init__(self, workers: int = 8, max_pending: int = 32, max_clients: int = 64, idle_timeout: float = 900, checkpointer=None, model=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.model = model or init_chat_model(config.ai_model)
+        self.checkpointer = checkpointer or checkpointer_from_config(config)
+        self.pool = ClientPool(self.build_client, self.executor, max_clients=max_clients, idle_timeout=idle_timeout)
+        # One conversation step at a time per thread; locks go away with their last user.
+        self.session_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def build_client(self, username: str, password: str) -> PooledClient:
+        """Log in to the CalDAV server and build the user's agent.
+
+        No discovery cache is used: it is keyed by username only, so calendars read from it would
+        answer a request whose password was never checked.
+
+        Raises:
+            error.AuthorizationError: If the server rejects the credentials.
+        """
+        client = dav.TaskDAVClient(
+            url=config.caldav_url,
+            username=username,
+            password=password,
+            memo_ttl=getattr(config, "memo_ttl", 60),
+        )
+        try:
+            # Discovery asks the server, so it checks the credentials (and primes the memo cache).
+            client.get_calendars_by_id()
+        except Exception:
+            client.close()
+            raise
+        return PooledClient(client, prebuilt.build_agent(client, model=self.model, checkpointer=self.checkpointer))
+
+    async def chat(self, username: str, password: str, body: dict[str, Any]) -> dict[str, Any]:
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "`message` must be a non-empty string.")
+        session_id = str(body.get("session_id") or uuid.uuid4().hex)
+        if self.pending >= self.max_pending:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Server is busy; try again later.")
+
+        self.pending += 1
+        try:
+            async with self.pool.client(username, password) as entry:
+                # Pooled clients are keyed by the password and built only once the server accepted
+                # it, so the user's threads are reached only after authentication.
+                thread_id = f"{username}:{session_id}"
+                lock = self.session_locks.get(thread_id)
+                if lock is None:
+                    lock = self.session_locks[thread_id] = asyncio.Lock()
+                async with lock:
+                    loop = asyncio.get_running_loop()
+                    reply = await loop.run_in_executor(self.executor, self.invoke, entry, message.strip(), thread_id)
+        except error.AuthorizationError:
+            # Raised when the pooled client is built, or later if the password stops working.
+            self.pool.discard(self.pool.key(username, password))
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "CalDAV server rejected the credentials.")
+        finally:
+            self.pending -= 1
+        return {"reply": reply, "session_id": session_id}
+
+    def invoke(self, entry: PooledClient, message: str, thread_id: str) -> str:
+        with tracing.tracer.span("agent.turn", thread_id=thread_id):
+            response = entry.agent.invoke(
+                prebuilt.build_full_prompt(entry.client, message),
+                {
+                    "configurable": {"thread_id": thread_id},
+                    "max_concurrency": getattr(config, "tool_max_concurrency", 4),
+                },
+            )
+        return str(response["messages"][-1].content)
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "clients": len(self.pool.entries),
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer one HTTP request on a connection, then close it."""
+        try:
+            try:
+                method, path, headers, body = await read_request(reader)
+                if path == "/health" and method == "GET":
+                    result = self.health()
+                elif path == "/chat" and method == "POST":
+                    username, password = basic_credentials(headers)
+                    try:
+                        payload = json.loads(body or b"{}")
+                    except ValueError:
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object.")
+                    if not isinstance(payload, dict):
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object.")
+                    result = await self.chat(username, password, payload)
+                else:
+                    raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+                status = HTTPStatus.OK
+            except HTTPError as e:
+                status, result = e.status, {"error": str(e)}
+            except Exception as e:
+                status, result = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+            await write_response(writer, status, result)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def evict_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.pool.idle_timeout / 4))
+            self.pool.evict_idle()
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes]:
+    """Read a request line, headers and body from the connection.
+
+    Raises:
+        HTTPError: If the request is malformed or its body is too large.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers are too large.")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body must be at most {MAX_BODY_BYTES} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+async def write_response(writer: asyncio.StreamWriter, status: HTTPStatus, result: dict[str, Any]) -> None:
+    body = json.dumps(result, default=str).encode()
+    head = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+    ]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        head.append("Retry-After: 1")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+def basic_credentials(headers: dict[str, str]) -> tuple[str, str]:
+    """Return the username and password of a Basic Authorization header.
+
+    Raises:
+        HTTPError: 401 if the header is missing or malformed.
+    """
+    scheme, _, encoded = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "basic":
+        try:
+            username, sep, password = base64.b64decode(encoded).decode().partition(":")
+            if sep and username:
+                return username, password
+        except ValueError:
+            pass
+    raise HTTPError(HTTPStatus.UNAUTHORIZED, "CalDAV credentials are required (HTTP Basic auth).")
+
+async def serve(server: AgentServer, host: str, port: int) -> None:
+    listener = await asyncio.start_server(server.handle, host, port)
+    evictor = asyncio.create_task(server.evict_periodically())
+    print(f"Serving on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        evictor.cancel()
+
+def build_server(checkpointer: Optional[Any] = None) -> AgentServer:
+    return AgentServer(
+        workers=getattr(config, "server_workers", 8),
+        max_pending=getattr(config, "server_max_pending", 32),
+        max_clients=getattr(config, "server_max_clients", 64),
+        idle_timeout=getattr(config, "server_idle_timeout", 900),
+        checkpointer=checkpointer,
+    )
+
+if __name__ == "__main__":
+    tracing.configure_from_config(config)
+    try:
+        asyncio.run(serve(
+            build_server(),
+            getattr(config, "server_host", "127.0.0.1"),
+            getattr(config, "server_port", 8080),
+        ))
+    except KeyboardInterrupt:
+        pass
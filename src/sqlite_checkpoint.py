@@ -0,0 +1,450 @@
+"""
+This module provides `SqliteCheckpointSaver`, a persistent LangGraph checkpointer for the prebuilt agent.
+
+Compared to `MemorySaver`, state survives restarts and memory use does not grow with the number
+of conversations:
+
+- Checkpoints live in a SQLite database in WAL mode, so reads do not block the writer.
+- Like `MemorySaver`, channel values are stored once per version rather than once per checkpoint,
+  so channels a step did not change are not stored again. A channel that did change is stored
+  whole: the agent's `messages` list is written again, in full, by every checkpoint that adds a
+  message.
+- Values are serialized with LangGraph's msgpack serializer and, above `COMPRESS_MIN_BYTES`,
+  compressed with zstandard.
+- A background thread prunes each thread down to its `keep_last` most recent checkpoints and
+  deletes threads that have not been written to for `max_age` seconds.
+"""
+from __future__ import annotations
+from typing import Any, Iterator, Optional, Sequence
+from contextlib import AbstractContextManager
+import random
+import sqlite3
+import threading
+import time
+
+import zstandard
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+COMPRESS_MIN_BYTES = 512
+ZSTD_SUFFIX = "+zstd"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints (thread_id, created_at);
+"""
+
+class CompressedSerializer(SerializerProtocol):
+    """Wraps a serializer, compressing its output with zstandard when it is large.
+
+    Args:
+        serde: The serializer to wrap; defaults to LangGraph's `JsonPlusSerializer`.
+        min_bytes: Values serializing to fewer bytes are stored uncompressed.
+        level: zstandard compression level.
+    """
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, min_bytes: int = COMPRESS_MIN_BYTES, level: int = 3):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+        self.level = level
+        self._local = threading.local()
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        # zstandard contexts are not thread-safe.
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_bytes:
+            return type_, data
+        return type_ + ZSTD_SUFFIX, self._compressor().compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(ZSTD_SUFFIX):
+            self._compressor()
+            payload = self._local.decompressor.decompress(payload)
+            type_ = type_[:-len(ZSTD_SUFFIX)]
+        return self.serde.loads_typed((type_, payload))
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str], AbstractContextManager):
+    """A LangGraph checkpointer storing compressed state in SQLite, with retention limits.
+
+    Args:
+        path: Database file; created if missing.
+        keep_last: Checkpoints kept per thread and namespace (at least 2, so the parent of
+            the latest checkpoint, which holds its pending sends, is kept too).
+        max_age: Seconds after its last checkpoint that a thread is deleted; None keeps threads forever.
+        prune_interval: Seconds between background pruning runs; None disables the thread
+            (call `prune` yourself).
+        serde: Serializer; defaults to a `CompressedSerializer`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        keep_last: int = 20,
+        max_age: Optional[float] = 30 * 24 * 3600,
+        prune_interval: Optional[float] = 300,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde or CompressedSerializer())
+        self.keep_last = max(2, keep_last)
+        self.max_age = max_age
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        # Threads written to since the last prune, which may exceed `keep_last`.
+        self._dirty: set[tuple[str, str]] = set()
+        self._stop = threading.Event()
+        self._pruner: Optional[threading.Thread] = None
+        if prune_interval:
+            self._pruner = threading.Thread(
+                target=self._prune_periodically, args=(prune_interval,), name="checkpoint-pruner", daemon=True
+            )
+            self._pruner.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the pruning thread and close the database."""
+        self._stop.set()
+        if self._pruner is not None:
+            self._pruner.join()
+        with self.lock:
+            self.conn.close()
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        # Same scheme as `MemorySaver`: increasing, and unique across concurrent writers.
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the checkpoint in `config`, or the latest checkpoint of its thread."""
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        params: list[Any] = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self.lock:
+            row = self.conn.execute(query, params).fetchone()
+            return self._to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first, optionally filtered by thread, metadata and `before`."""
+        query = "SELECT * FROM checkpoints WHERE 1 = 1"
+        params: list[Any] = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        # The tuples are built before the first is yielded, so a caller that stops iterating
+        # early does not keep the lock.
+        tuples = []
+        with self.lock:
+            for row in self.conn.execute(query, params).fetchall():
+                if limit is not None and len(tuples) >= limit:
+                    break
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                tuples.append(self._to_tuple(row))
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, storing only the channel values that changed."""
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # type: ignore[misc]
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version), *(
+                self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)
+            ))
+            for channel, version in new_versions.items()
+        ]
+        checkpoint_type, checkpoint_data = self.serde.dumps_typed(c)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self.lock:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                        checkpoint_type, checkpoint_data, metadata_type, metadata_data, time.time(),
+                    ),
+                )
+            self._dirty.add((thread_id, checkpoint_ns))
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save the pending writes of a task, linked to a checkpoint."""
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            rows.append((
+                configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"],
+                task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, data, task_path,
+            ))
+        # Special writes (negative index) replace; regular writes are only stored once.
+        replace = all(row[4] < 0 for row in rows)
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints, writes and values of a thread."""
+        with self.lock:
+            with self.conn:
+                for table in ("checkpoints", "blobs", "writes"):
+                    self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def prune(self) -> int:
+        """Apply the retention limits now.
+
+        Returns:
+            int: The number of checkpoints deleted.
+        """
+        deleted = 0
+        with self.lock:
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age
+                expired = [row[0] for row in self.conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?", (cutoff,)
+                )]
+            else:
+                expired = []
+            dirty, self._dirty = self._dirty, set()
+        for thread_id in expired:
+            with self.lock:
+                deleted += self.conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+            self.delete_thread(thread_id)
+        for thread_id, checkpoint_ns in dirty:
+            deleted += self._prune_thread(thread_id, checkpoint_ns)
+        return deleted
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str) -> int:
+        with self.lock:
+            with self.conn:
+                old = [row[0] for row in self.conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.keep_last),
+                )]
+                if not old:
+                    return 0
+                self.conn.executemany(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    [(thread_id, checkpoint_ns, cid) for cid in old],
+                )
+                self.conn.executemany(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    [(thread_id, checkpoint_ns, cid) for cid in old],
+                )
+                # Drop channel values no remaining checkpoint refers to.
+                referenced = set()
+                for type_, data in self.conn.execute(
+                    "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                    (thread_id, checkpoint_ns),
+                ):
+                    versions = self.serde.loads_typed((type_, data))["channel_versions"]
+                    referenced.update((channel, str(version)) for channel, version in versions.items())
+                stale = [
+                    (thread_id, checkpoint_ns, channel, version)
+                    for channel, version in self.conn.execute(
+                        "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                        (thread_id, checkpoint_ns),
+                    )
+                    if (channel, version) not in referenced
+                ]
+                self.conn.executemany(
+                    "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", stale
+                )
+        return len(old)
+
+    def _prune_periodically(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.prune()
+
+    def _to_tuple(self, row: tuple) -> CheckpointTuple:
+        """Assemble a checkpoint tuple from a `checkpoints` row; the lock must be held."""
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata_data, _ = row
+        checkpoint = self.serde.loads_typed((type_, data))
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self.conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed(blob)
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, blob FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        sends = []
+        if parent_id:
+            sends = self.conn.execute(
+                "SELECT type, blob FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+                " AND channel = ? ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, parent_id, TASKS),
+            ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **checkpoint,
+                "channel_values": channel_values,
+                "pending_sends": [self.serde.loads_typed(s) for s in sends],
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_data)),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, b))) for task_id, channel, t, b in writes],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+        )
+
+def checkpointer_from_config(config) -> BaseCheckpointSaver:
+    """
+    Build the checkpointer described by the `checkpoint_*` settings of a config module.
+
+    Args:
+        config: Module (or object) with optional `checkpoint_db`, `checkpoint_keep_last`,
+            `checkpoint_max_age_days` and `checkpoint_prune_interval` attributes
+
+    Returns:
+        `MemorySaver` if `checkpoint_db` is unset or empty, otherwise a `SqliteCheckpointSaver`
+    """
+    path = getattr(config, "checkpoint_db", "")
+    if not path:
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+    max_age_days = getattr(config, "checkpoint_max_age_days", 30)
+    return SqliteCheckpointSaver(
+        path,
+        keep_last=getattr(config, "checkpoint_keep_last", 20),
+        max_age=max_age_days * 24 * 3600 if max_age_days else None,
+        prune_interval=getattr(config, "checkpoint_prune_interval", 300),
+    )
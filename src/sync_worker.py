@@ -0,0 +1,193 @@
+"""
+This module provides `SyncWorker`, the background thread of an offline-first `TaskDAVClient`.
+
+The worker pushes the client's `TaskReplica` outbox to the server and pulls server changes:
+
+- Each queued change is saved with `If-Match` on the ETag it was based on (or `If-None-Match: *`
+  for new tasks). A 412 means the task changed on the server: the change is rejected as a
+  conflict and the server version is fetched, so the next read shows what is actually stored.
+  Other client errors reject the change too.
+- Network errors, timeouts and server errors (5xx, 408, 429) are retried with exponential
+  backoff and jitter, so a flaky host is not hammered and tool calls never wait for it.
+- Every `interval` seconds, every calendar is refreshed incrementally (see `task_store`) and
+  written to the replica, and its memoized results are dropped if anything changed.
+
+A change is pushed as soon as it is queued; the worker is woken by `wake`.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Optional
+from urllib.parse import quote
+import random
+import threading
+import time
+
+from caldav.lib import error
+
+from task_replica import CONFLICT, FAILED, OutboxEntry
+from task_store import CachedTask
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from dav import TaskDAVClient
+
+# HTTP statuses worth retrying; any other 4xx rejects the change.
+RETRY_STATUSES = (408, 425, 429)
+# Seconds between rediscoveries of the calendar list.
+CALENDAR_REFRESH_INTERVAL = 300
+
+class SyncWorker:
+    """
+    Pushes queued changes and pulls server changes for an offline-first client.
+
+    Args:
+        client: The client, which must have a replica.
+        interval: Seconds between pulls of server changes.
+        retry_base: Delay in seconds before the first retry of a failed push; doubled on every further failure.
+        retry_max: Longest delay between retries.
+    """
+
+    def __init__(self, client: TaskDAVClient, interval: float = 30, retry_base: float = 1, retry_max: float = 300):
+        if client.replica is None:
+            raise ValueError("SyncWorker needs a client with a replica.")
+        self.client = client
+        self.replica = client.replica
+        self.interval = interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.last_pull: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._last_calendar_refresh = time.monotonic()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> SyncWorker:
+        self._thread = threading.Thread(target=self._run, name="task-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Stop the thread after its current push or pull; queued changes stay in the replica."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self) -> None:
+        """Push queued changes now instead of at the next pull."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        next_pull = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.clear()
+            self.push()
+            if time.monotonic() >= next_pull:
+                self.pull()
+                next_pull = time.monotonic() + self.interval
+            wait = next_pull - time.monotonic()
+            due = self.replica.next_attempt()
+            if due is not None:
+                wait = min(wait, due - time.time())
+            self._wake.wait(max(0.0, wait))
+
+    def push(self) -> int:
+        """Push every change that is due; returns how many were saved."""
+        saved = 0
+        for entry in self.replica.due():
+            if self._stop.is_set():
+                break
+            saved += self._push(entry)
+        return saved
+
+    def _push(self, entry: OutboxEntry) -> bool:
+        headers = {"Content-Type": 'text/calendar; charset="utf-8"'}
+        if entry.create:
+            headers["If-None-Match"] = "*"
+        elif entry.base_etag:
+            headers["If-Match"] = entry.base_etag
+        with tracer.span("sync.push", calendar_id=entry.calendar_id, uid=entry.uid) as span:
+            try:
+                store = self.client.task_store(entry.calendar_id, refresh=False)
+                response = self.client.put(str(store.calendar.url.join(quote(entry.href))), entry.data, headers)
+            except Exception as e:
+                self._retry(entry, f"{type(e).__name__}: {e}")
+                return False
+            span.set(status=response.status)
+        if response.status in (200, 201, 204):
+            # Without an ETag the server changed the data; the next pull downloads its version.
+            etag = response.headers.get("ETag")
+            done = self.replica.complete(entry, etag)
+            with store.lock:
+                current = store.get(entry.uid)
+                if done:
+                    store.pinned.discard(entry.uid)
+                if current is not None and current.data == entry.data:
+                    store.put(CachedTask(entry.uid, entry.href, etag, entry.data))
+                self.replica.persist(entry.calendar_id, store)
+            return True
+        if response.status == 412:
+            self._reject(entry, CONFLICT, f"Task {entry.uid} was changed on the server before this change was saved; the change was discarded.")
+        elif 400 <= response.status < 500 and response.status not in RETRY_STATUSES:
+            self._reject(entry, FAILED, error.errmsg(response).strip())
+        else:
+            self._retry(entry, error.errmsg(response).strip())
+        return False
+
+    def _retry(self, entry: OutboxEntry, message: str) -> None:
+        delay = min(self.retry_max, self.retry_base * 2 ** entry.attempts) * random.uniform(0.5, 1.0)
+        self.last_error = message
+        self.replica.retry(entry, message, delay)
+
+    def _reject(self, entry: OutboxEntry, state: str, message: str) -> None:
+        """Drop a change the server refused, and replace the local version with the server's."""
+        self.replica.reject(entry, state, message)
+        store = self.client.task_store(entry.calendar_id, refresh=False)
+        with store.lock:
+            store.pinned.discard(entry.uid)
+        # Fetched without the store's lock, which `fetch` takes only to apply the download.
+        try:
+            if not store.fetch([entry.uid]):
+                store.remove(entry.uid)
+        except error.DAVError as e:
+            self.last_error = str(e)
+        self.replica.persist(entry.calendar_id, store)
+        self.client.memo.invalidate(entry.calendar_id)
+
+    def pull(self) -> None:
+        """Refresh every calendar from the server; failures are kept in `last_error`."""
+        with tracer.span("sync.pull"):
+            try:
+                if time.monotonic() - self._last_calendar_refresh >= CALENDAR_REFRESH_INTERVAL:
+                    self.client.refresh_calendars()
+                    self._last_calendar_refresh = time.monotonic()
+                for calendar_id in self.replica.calendars():
+                    self.client.pull(calendar_id)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return
+        self.last_pull = time.time()
+        self.last_error = None
+
+    def status(self) -> dict[str, Any]:
+        """The replica's outbox summary, with the time of the last successful pull."""
+        result = self.replica.status()
+        result["last_sync"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_pull)) if self.last_pull else None
+        if self.last_error:
+            result["last_error"] = self.last_error
+        return result
+
+def start_from_config(client: TaskDAVClient, config) -> Optional[SyncWorker]:
+    """
+    Start the sync worker of an offline-first client with the `sync_*` settings of a config module.
+
+    Returns:
+        The running worker, or None if the client has no replica.
+    """
+    if client.replica is None:
+        return None
+    return client.start_sync(
+        interval=getattr(config, "sync_interval", 30),
+        retry_base=getattr(config, "sync_retry_base", 1),
+        retry_max=getattr(config, "sync_retry_max", 300),
+    )
@@ -0,0 +1,146 @@
+"""
+This module provides `TaskIndex`, a local search index over the tasks of one calendar.
+
+The index holds:
+
+- an inverted index from words of SUMMARY, DESCRIPTION and CATEGORIES to task UIDs, with a
+  sorted vocabulary so a query word also matches longer words it is a prefix of ("dent"
+  finds "dentist");
+- a list of (due, UID) pairs sorted by due date, so "due before" is a binary search;
+- a list of (priority, UID) pairs sorted by priority (1 is highest), likewise for
+  "priority at most".
+
+`CalendarTaskStore` builds the index on first use and then updates it as tasks are added,
+changed or removed, so it never has to be rebuilt from scratch.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional, Union
+from datetime import date, datetime
+import bisect
+import re
+
+from todo_record import TodoRecord
+
+_WORD = re.compile(r"\w+")
+# Query words shorter than this only match whole words.
+MIN_PREFIX = 3
+
+def words(text: Optional[str]) -> list[str]:
+    """Split text into lowercase words."""
+    return _WORD.findall(text.casefold()) if text else []
+
+def due_key(value: Union[date, datetime, None]) -> Optional[str]:
+    """A sortable string for a DUE value; dates sort as midnight."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%dT00:00:00")
+    return None
+
+class TaskIndex:
+    """Word, due date and priority indexes over a set of task records, updated per task."""
+
+    def __init__(self):
+        self.postings: dict[str, set[str]] = {}
+        self.vocabulary: list[str] = []
+        self.by_due: list[tuple[str, str]] = []
+        self.by_priority: list[tuple[int, str]] = []
+        # What was indexed per UID, so a task can be removed again: (words, summary words, due key, priority).
+        self.entries: dict[str, tuple[frozenset[str], frozenset[str], Optional[str], Optional[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, uid: str, record: TodoRecord) -> None:
+        """Index a task, replacing what was indexed for its UID before."""
+        self.remove(uid)
+        all_words, _, due, priority = self._insert(uid, record)
+        for word in all_words:
+            if len(self.postings[word]) == 1:
+                bisect.insort(self.vocabulary, word)
+        if due is not None:
+            bisect.insort(self.by_due, (due, uid))
+        if priority is not None:
+            bisect.insort(self.by_priority, (priority, uid))
+
+    def rebuild(self, tasks: Iterable[tuple[str, TodoRecord]]) -> None:
+        """Replace the index with a whole set of tasks, sorting each index once."""
+        self.postings = {}
+        self.entries = {}
+        for uid, record in tasks:
+            self._insert(uid, record)
+        self.vocabulary = sorted(self.postings)
+        self.by_due = sorted((due, uid) for uid, (_, _, due, _) in self.entries.items() if due is not None)
+        self.by_priority = sorted((p, uid) for uid, (_, _, _, p) in self.entries.items() if p is not None)
+
+    def _insert(self, uid: str, record: TodoRecord) -> tuple[frozenset[str], frozenset[str], Optional[str], Optional[int]]:
+        """Add a task to the postings and entries, leaving the sorted lists to the caller."""
+        summary_words = frozenset(words(record.summary))
+        all_words = summary_words.union(words(record.description), *(words(c) for c in record.categories or []))
+        for word in all_words:
+            self.postings.setdefault(word, set()).add(uid)
+        entry = self.entries[uid] = (all_words, summary_words, due_key(record.due), record.priority or None)
+        return entry
+
+    def remove(self, uid: str) -> None:
+        """Drop a task from the index; unknown UIDs are ignored."""
+        entry = self.entries.pop(uid, None)
+        if entry is None:
+            return
+        all_words, _, due, priority = entry
+        for word in all_words:
+            uids = self.postings[word]
+            uids.discard(uid)
+            if not uids:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+        if due is not None:
+            del self.by_due[bisect.bisect_left(self.by_due, (due, uid))]
+        if priority is not None:
+            del self.by_priority[bisect.bisect_left(self.by_priority, (priority, uid))]
+
+    def _matching(self, word: str) -> set[str]:
+        """UIDs of the tasks containing the word, or (for longer words) a word starting with it."""
+        if len(word) < MIN_PREFIX:
+            return set(self.postings.get(word, ()))
+        found: set[str] = set()
+        for i in range(bisect.bisect_left(self.vocabulary, word), len(self.vocabulary)):
+            if not self.vocabulary[i].startswith(word):
+                break
+            found |= self.postings[self.vocabulary[i]]
+        return found
+
+    def search(self, query: str = "", due_before: Union[date, datetime, None] = None, priority_max: Optional[int] = None) -> list[tuple[int, str]]:
+        """
+        Find the tasks matching every word of a query and the given bounds.
+
+        Args:
+            query: Words that must all occur in the task (empty matches every task).
+            due_before: Only tasks due before this moment.
+            priority_max: Only tasks with a priority of 1 up to this value (1 is highest).
+
+        Returns:
+            list[tuple[int, str]]: (relevance, UID) pairs; relevance counts the query words
+                found in the summary.
+        """
+        candidates: Optional[set[str]] = None
+        terms = words(query)
+        for term in terms:
+            found = self._matching(term)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+        if due_before is not None:
+            end = bisect.bisect_left(self.by_due, (due_key(due_before), ""))
+            due = {uid for _, uid in self.by_due[:end]}
+            candidates = due if candidates is None else candidates & due
+        if priority_max is not None:
+            end = bisect.bisect_left(self.by_priority, (priority_max + 1, ""))
+            important = {uid for _, uid in self.by_priority[:end]}
+            candidates = important if candidates is None else candidates & important
+        if candidates is None:
+            candidates = set(self.entries)
+        return [
+            (sum(any(w.startswith(t) for w in self.entries[uid][1]) for t in terms), uid)
+            for uid in candidates
+        ]
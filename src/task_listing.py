@@ -0,0 +1,119 @@
+"""
+This module provides paginated, projected task listings sized for an LLM's context window.
+
+A page is returned in a compact row format, with the column names given once:
+
+    {"fields": ["UID", "SUMMARY", "DUE"], "rows": [["a1", "Pay rent", "2025-06-01 09:00:00"], ...],
+     "total": 312, "next_cursor": "..."}
+
+Pages are cut at `limit` rows or when the estimated size reaches `max_tokens`, whichever comes
+first. Cursors are keyset-based (they encode the sort key of the last row returned), so tasks
+added or completed between calls do not shift or repeat the following pages.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Iterable, Optional
+from datetime import date, datetime
+import base64
+import bisect
+import json
+
+from todo_record import SERIALIZED_FIELDS, TodoRecord
+from tokens import estimate_tokens
+
+DEFAULT_FIELDS = ("UID", "SUMMARY", "DUE", "PRIORITY")
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 200
+CURSOR_TOKENS = 16
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or was issued for a different sort order."""
+    pass
+
+def _date_key(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%dT00:00:00")
+    # Missing dates sort last.
+    return "~"
+
+# Each key maps a record to a JSON-friendly, totally ordered value; the UID breaks ties.
+SORT_KEYS: dict[str, Callable[[TodoRecord], Any]] = {
+    "due": lambda r: _date_key(r.due),
+    "dtstart": lambda r: _date_key(r.dtstart),
+    # iCalendar priority 1 is highest; 0 (or missing) means undefined and sorts last.
+    "priority": lambda r: r.priority if r.priority else 10,
+    "summary": lambda r: (r.summary or "").casefold(),
+}
+
+def encode_cursor(sort_by: str, key: list[Any]) -> str:
+    raw = json.dumps([sort_by, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_by: str) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {cursor}") from e
+    if cursor_sort != sort_by:
+        raise InvalidCursor(f"Cursor was issued for sort_by={cursor_sort!r}, not {sort_by!r}")
+    return key
+
+def paginate(
+    records: Iterable[TodoRecord],
+    limit: int = DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    fields: Optional[list[str]] = None,
+    sort_by: str = "due",
+    max_tokens: Optional[int] = None,
+) -> dict[str, Any]:
+    """Sort, project and cut one page out of a set of task records.
+
+    Args:
+        records: The tasks to list.
+        limit: Maximum rows in the page (capped at `MAX_LIMIT`).
+        cursor: The `next_cursor` of the previous page, or None for the first page.
+        fields: Columns to include, from `todo_record.SERIALIZED_FIELDS`. Defaults to `DEFAULT_FIELDS`.
+        sort_by: One of `SORT_KEYS`.
+        max_tokens: Approximate size limit of the page; at least one row is always returned.
+
+    Returns:
+        dict[str, Any]: `fields`, `rows`, `total` (tasks across all pages) and `next_cursor`
+            (None on the last page).
+
+    Raises:
+        ValueError: If a field or sort key is unknown, or the cursor is invalid.
+    """
+    fields = [f.upper() for f in (fields or DEFAULT_FIELDS)]
+    unknown = [f for f in fields if f not in SERIALIZED_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; must be from: {', '.join(SERIALIZED_FIELDS)}")
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Argument `sort_by` must be one of: {', '.join(SORT_KEYS)}")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    sort_key = SORT_KEYS[sort_by]
+    keyed = sorted((((sort_key(r), r.uid or ""), r) for r in records), key=lambda item: item[0])
+    total = len(keyed)
+    start = 0
+    if cursor:
+        start = bisect.bisect_right(keyed, tuple(decode_cursor(cursor, sort_by)), key=lambda item: item[0])
+
+    page = {"fields": fields, "rows": [], "total": total, "next_cursor": None}
+    # Reserve room for the cursor, which is only known once the page is cut.
+    budget = max_tokens - estimate_tokens(json.dumps(page)) - CURSOR_TOKENS if max_tokens else None
+    end = start
+    while end < total and len(page["rows"]) < limit:
+        serialized = keyed[end][1].to_dict()
+        row = [serialized.get(f) for f in fields]
+        if budget is not None:
+            cost = estimate_tokens(json.dumps(row, ensure_ascii=False)) + 1
+            if page["rows"] and cost > budget:
+                break
+            budget -= cost
+        page["rows"].append(row)
+        end += 1
+    if end < total:
+        page["next_cursor"] = encode_cursor(sort_by, list(keyed[end - 1][0]))
+    return page
@@ -0,0 +1,111 @@
+"""
+This module provides `TaskQuery`, a VTODO filter that can be sent to a CalDAV server as a
+`calendar-query` REPORT (RFC 4791, section 7.8) and evaluated locally with the same semantics.
+
+Pushing the filter to the server means only matching tasks are transferred and parsed. Since not
+every server honours every filter element, results are always re-checked with `TaskQuery.matches`,
+which is also used to answer queries directly from a populated `CalendarTaskStore`.
+"""
+from __future__ import annotations
+from typing import Optional
+from datetime import date, datetime
+
+import icalendar
+from caldav.elements import cdav, dav
+
+from todo_record import TodoRecord
+
+class TaskQuery:
+    """A filter over VTODO components.
+
+    Args:
+        due_before: Only match tasks with a DUE strictly before this time.
+        due_after: Only match tasks with a DUE at or after this time.
+        include_completed: Whether completed or cancelled tasks match.
+        uid: Only match the task with this UID.
+    """
+
+    def __init__(
+        self,
+        due_before: Optional[datetime] = None,
+        due_after: Optional[datetime] = None,
+        include_completed: bool = False,
+        uid: Optional[str] = None,
+    ):
+        self.due_before = due_before
+        self.due_after = due_after
+        self.include_completed = include_completed
+        self.uid = uid
+
+    @classmethod
+    def overdue(cls, now: Optional[datetime] = None) -> TaskQuery:
+        """Pending tasks whose due date has passed."""
+        return cls(due_before=now or datetime.now())
+
+    def to_xml(self) -> cdav.CalendarQuery:
+        """Build the `calendar-query` REPORT body for this filter.
+
+        Returns:
+            cdav.CalendarQuery: The query, requesting ETags and calendar data of matching resources.
+        """
+        vtodo = cdav.CompFilter("VTODO")
+        if self.uid is not None:
+            vtodo += cdav.PropFilter("UID") + cdav.TextMatch(self.uid, collation="i;octet")
+        if not self.include_completed:
+            vtodo += cdav.PropFilter("COMPLETED") + cdav.NotDefined()
+        if self.due_before is not None or self.due_after is not None:
+            vtodo += cdav.PropFilter("DUE") + cdav.TimeRange(start=self.due_after, end=self.due_before)
+        return cdav.CalendarQuery() + [
+            dav.Prop() + [dav.GetEtag(), cdav.CalendarData()],
+            cdav.Filter() + (cdav.CompFilter("VCALENDAR") + vtodo),
+        ]
+
+    def matches(self, todo: icalendar.Todo | TodoRecord) -> bool:
+        """Evaluate the filter against a VTODO locally.
+
+        Datetimes are compared as naive local times, so floating and zoned due dates compare
+        the way they read.
+
+        Args:
+            todo: The VTODO component, or its `TodoRecord`.
+
+        Returns:
+            bool: Whether the task matches.
+        """
+        if self.uid is not None and str(todo.get("UID", "")) != self.uid:
+            return False
+        if not self.include_completed and (
+            todo.get("COMPLETED") or todo.get("STATUS") in ("COMPLETED", "CANCELLED")
+        ):
+            return False
+        if self.due_before is None and self.due_after is None:
+            return True
+        due = naive_datetime(todo.get("DUE"))
+        if due is None:
+            return False
+        if self.due_before is not None and not due < naive_datetime(self.due_before):
+            return False
+        if self.due_after is not None and due < naive_datetime(self.due_after):
+            return False
+        return True
+
+def naive_datetime(value) -> Optional[datetime]:
+    """Coerce an iCalendar date/datetime property (or plain value) to a naive datetime.
+
+    Args:
+        value: An `icalendar.vDDDTypes`, `date`, `datetime` or ISO string.
+
+    Returns:
+        Optional[datetime]: The naive datetime, or None if the value cannot be interpreted.
+    """
+    if value is None:
+        return None
+    value = value.dt if hasattr(value, "dt") else value
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except ValueError:
+        return None
@@ -0,0 +1,293 @@
+"""
+This module provides `TaskReplica`, a SQLite copy of calendars and tasks with a durable outbox, for offline-first use of `TaskDAVClient`.
+
+With a replica, the client serves reads from its local task stores, which are restored from the
+replica at startup instead of being downloaded, and applies changes locally at once. Every change
+is also written to the outbox, in the same transaction as the new task data, so an accepted change
+survives a crash or restart. The `sync_worker` module pushes the outbox to the server and pulls
+server changes into the replica in the background.
+
+The outbox holds at most one pending change per task: a later change to a task that has not been
+pushed yet replaces the data of the earlier one, keeping the ETag the first change was based on,
+so the push still detects changes made on the server in the meantime.
+
+The database is written with `synchronous=FULL`, trading a little write latency for changes that
+also survive a power loss.
+"""
+from __future__ import annotations
+from typing import Any, Optional
+import sqlite3
+import threading
+import time
+
+from task_store import CachedTask, CalendarTaskStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendars (
+    calendar_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    sync_token TEXT,
+    ctag TEXT,
+    loaded INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS resources (
+    calendar_id TEXT NOT NULL,
+    href TEXT NOT NULL,
+    etag TEXT,
+    uid TEXT,
+    data TEXT,
+    PRIMARY KEY (calendar_id, href)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    calendar_id TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    href TEXT NOT NULL,
+    base_etag TEXT,
+    create_only INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS outbox_pending ON outbox (calendar_id, uid) WHERE state = 'pending';
+"""
+
+# Outbox states: waiting to be pushed, rejected because the task changed on the server, or
+# rejected by the server for another reason. Rejected changes are kept for `status` to report.
+PENDING = "pending"
+CONFLICT = "conflict"
+FAILED = "failed"
+# Seconds rejected changes are kept.
+REJECTED_RETENTION = 7 * 24 * 3600
+
+class OutboxEntry:
+    """One queued change: the full new data of a task, and the ETag it was based on."""
+    __slots__ = ("id", "calendar_id", "uid", "href", "base_etag", "create", "data", "revision", "attempts")
+
+    def __init__(self, id: int, calendar_id: str, uid: str, href: str, base_etag: Optional[str], create: bool, data: str, revision: int, attempts: int):
+        self.id = id
+        self.calendar_id = calendar_id
+        self.uid = uid
+        self.href = href
+        self.base_etag = base_etag
+        self.create = create
+        self.data = data
+        self.revision = revision
+        self.attempts = attempts
+
+class TaskReplica:
+    """
+    Calendars, tasks and queued changes stored in SQLite.
+
+    Args:
+        path: Database file; created if missing.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    def calendars(self) -> dict[str, str]:
+        """Return the known calendars' URLs by calendar ID."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT calendar_id, url FROM calendars"))
+
+    def save_calendars(self, urls: dict[str, str]) -> None:
+        """Record the calendars found on the server, dropping the data of calendars that are gone."""
+        with self.lock, self.conn:
+            for calendar_id, url in urls.items():
+                self.conn.execute(
+                    "INSERT INTO calendars (calendar_id, url) VALUES (?, ?) "
+                    "ON CONFLICT (calendar_id) DO UPDATE SET url = excluded.url",
+                    (calendar_id, url),
+                )
+            known = [row[0] for row in self.conn.execute("SELECT calendar_id FROM calendars")]
+            for calendar_id in known:
+                if calendar_id not in urls:
+                    for table in ("calendars", "resources", "outbox"):
+                        self.conn.execute(f"DELETE FROM {table} WHERE calendar_id = ?", (calendar_id,))
+
+    def restore(self, calendar_id: str, store: CalendarTaskStore) -> bool:
+        """
+        Fill an empty store with the replica's copy of a calendar.
+
+        Tasks with pending changes are pinned, so refreshes keep their local version.
+
+        Returns:
+            bool: Whether the calendar had been loaded before, so the store is usable without a refresh.
+        """
+        with self.lock:
+            state = self.conn.execute(
+                "SELECT sync_token, ctag, loaded FROM calendars WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+            if state is None or not state[2]:
+                return False
+            rows = self.conn.execute(
+                "SELECT href, etag, uid, data FROM resources WHERE calendar_id = ?", (calendar_id,)
+            ).fetchall()
+            pinned = {row[0] for row in self.conn.execute(
+                "SELECT uid FROM outbox WHERE calendar_id = ? AND state = ?", (calendar_id, PENDING)
+            )}
+        with store.lock:
+            store.sync_token, store.ctag = state[0], state[1]
+            for href, etag, uid, data in rows:
+                store.etags[href] = etag
+                if uid is not None:
+                    store.tasks[uid] = CachedTask(uid, href, etag, data)
+                    store.uid_by_href[href] = uid
+            store.pinned.update(pinned)
+            store.loaded = True
+        return True
+
+    def persist(self, calendar_id: str, store: CalendarTaskStore) -> bool:
+        """
+        Write what changed in a store since the last call.
+
+        Returns:
+            bool: Whether any resource changed.
+        """
+        with store.lock, self.lock, self.conn:
+            return self._persist(calendar_id, store)
+
+    def _persist(self, calendar_id: str, store: CalendarTaskStore) -> bool:
+        self.conn.execute(
+            "UPDATE calendars SET sync_token = ?, ctag = ?, loaded = ? WHERE calendar_id = ?",
+            (store.sync_token, store.ctag, int(store.loaded), calendar_id),
+        )
+        changed = store.take_changes()
+        for href in changed:
+            uid = store.uid_by_href.get(href)
+            task = store.tasks.get(uid) if uid is not None else None
+            if task is not None and task.href == href:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO resources (calendar_id, href, etag, uid, data) VALUES (?, ?, ?, ?, ?)",
+                    (calendar_id, href, task.etag, uid, task.data),
+                )
+            elif href in store.etags:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO resources (calendar_id, href, etag, uid, data) VALUES (?, ?, ?, NULL, NULL)",
+                    (calendar_id, href, store.etags[href]),
+                )
+            else:
+                self.conn.execute("DELETE FROM resources WHERE calendar_id = ? AND href = ?", (calendar_id, href))
+        return bool(changed)
+
+    def enqueue(self, calendar_id: str, store: CalendarTaskStore, task: CachedTask, create: bool = False) -> None:
+        """
+        Queue a task's new data for the server, together with the store's changes, in one transaction.
+
+        Args:
+            calendar_id: The calendar holding the task.
+            store: The calendar's store, already holding the new version of the task.
+            task: The new version; its `etag` is the version the change was based on.
+            create: Whether the task is new, so the push must not overwrite an existing resource.
+        """
+        now = time.time()
+        with store.lock, self.lock, self.conn:
+            self._persist(calendar_id, store)
+            updated = self.conn.execute(
+                "UPDATE outbox SET data = ?, href = ?, revision = revision + 1, updated_at = ? "
+                "WHERE calendar_id = ? AND uid = ? AND state = ?",
+                (task.data, task.href, now, calendar_id, task.uid, PENDING),
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    "INSERT INTO outbox (calendar_id, uid, href, base_etag, create_only, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (calendar_id, task.uid, task.href, task.etag, int(create), task.data, now),
+                )
+
+    def due(self, now: Optional[float] = None) -> list[OutboxEntry]:
+        """Return the pending changes whose next attempt is due, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, calendar_id, uid, href, base_etag, create_only, data, revision, attempts FROM outbox "
+                "WHERE state = ? AND next_attempt <= ? ORDER BY id",
+                (PENDING, time.time() if now is None else now),
+            ).fetchall()
+        return [OutboxEntry(*row[:5], bool(row[5]), *row[6:]) for row in rows]
+
+    def next_attempt(self) -> Optional[float]:
+        """When the next pending change is due, or None if nothing is pending."""
+        with self.lock:
+            return self.conn.execute("SELECT MIN(next_attempt) FROM outbox WHERE state = ?", (PENDING,)).fetchone()[0]
+
+    def complete(self, entry: OutboxEntry, etag: Optional[str]) -> bool:
+        """
+        Record that a change was saved on the server.
+
+        Returns:
+            bool: True if the change was the latest one for its task. Otherwise the task was
+                changed again while the push was in flight; that change stays queued, now based
+                on the pushed version.
+        """
+        with self.lock, self.conn:
+            deleted = self.conn.execute(
+                "DELETE FROM outbox WHERE id = ? AND revision = ?", (entry.id, entry.revision)
+            ).rowcount
+            if not deleted:
+                self.conn.execute(
+                    "UPDATE outbox SET base_etag = ?, create_only = 0, attempts = 0, next_attempt = 0 WHERE id = ?",
+                    (etag, entry.id),
+                )
+        return bool(deleted)
+
+    def retry(self, entry: OutboxEntry, message: str, delay: float) -> None:
+        """Schedule another attempt of a change that could not be pushed."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, message, entry.id),
+            )
+
+    def reject(self, entry: OutboxEntry, state: str, message: str) -> None:
+        """Give up on a change (`CONFLICT` or `FAILED`), keeping it for `status`."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM outbox WHERE state != ? AND (calendar_id = ? AND uid = ? OR updated_at < ?)",
+                (PENDING, entry.calendar_id, entry.uid, time.time() - REJECTED_RETENTION),
+            )
+            self.conn.execute(
+                "UPDATE outbox SET state = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (state, message, time.time(), entry.id),
+            )
+
+    def status(self) -> dict[str, Any]:
+        """Summarize the outbox: the number of pending changes, and the rejected ones."""
+        with self.lock:
+            pending, attempts, error = self.conn.execute(
+                "SELECT COUNT(*), MAX(attempts), MAX(last_error) FROM outbox WHERE state = ?", (PENDING,)
+            ).fetchone()
+            rejected = self.conn.execute(
+                "SELECT calendar_id, uid, state, last_error FROM outbox WHERE state != ? ORDER BY updated_at DESC",
+                (PENDING,),
+            ).fetchall()
+        result: dict[str, Any] = {"pending": pending}
+        if pending and attempts:
+            result["retrying"] = error
+        result["rejected"] = [
+            {"calendar_id": calendar_id, "task_id": uid, "reason": state, "message": message}
+            for calendar_id, uid, state, message in rejected
+        ]
+        return result
+
+def replica_from_config(config) -> Optional[TaskReplica]:
+    """
+    Build the replica described by the `replica_db` setting of a config module.
+
+    Returns:
+        None if `replica_db` is unset or empty (the client then works online), otherwise a `TaskReplica`.
+    """
+    path = getattr(config, "replica_db", "")
+    return TaskReplica(path) if path else None
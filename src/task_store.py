@@ -0,0 +1,463 @@
+"""
+This module provides a local, write-through store of tasks for `TaskDAVClient`.
+
+Each calendar gets a `CalendarTaskStore` holding the raw VTODO data of every task keyed by UID,
+together with the href and ETag it was fetched with. Instead of re-downloading the whole collection
+on every read, the store is refreshed incrementally:
+
+1. An RFC 6578 `sync-collection` REPORT with the last sync token returns only the hrefs that were
+   added, changed or removed since the previous refresh.
+2. Servers without sync tokens fall back to comparing the calendar CTag, and if it moved, to a
+   depth-1 `getetag` PROPFIND that is diffed against the known ETags.
+
+Changed hrefs are then downloaded with one `calendar-multiget` REPORT. Parsing into an
+`icalendar.Todo` is deferred until a caller actually needs the component.
+
+The store's lock is only held while changes are applied, never during a request, so reads and
+write-throughs do not wait for the server. A task written through while a refresh is under way
+is left as written, since the server's answer may predate the write.
+
+For offline-first use, the store can record which hrefs changed (see `track_changes`), so a
+`TaskReplica` persists only those, and can pin tasks with local changes that were not pushed
+yet, so a refresh does not replace them with the older server version.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+from urllib.parse import quote
+import re
+import threading
+
+import caldav
+import icalendar
+from caldav.elements import cdav, dav
+from caldav.elements.base import BaseElement
+from caldav.lib import error
+from lxml import etree
+
+from recurrence import RecurrenceSeries, is_recurring
+from task_index import TaskIndex
+from task_query import TaskQuery
+from todo_record import TodoRecord
+from tracing import tracer
+
+# Hrefs are requested from the server in batches of this size when multigetting.
+MULTIGET_BATCH_SIZE = 250
+
+_UID_LINE = re.compile(r"^UID(?:;[^:\r\n]*)?:(.*?)\r?$", re.MULTILINE)
+_FOLD = re.compile(r"\r?\n[ \t]")
+
+class GetCTag(BaseElement):
+    """The `getctag` property from the CalendarServer namespace (a collection-wide change tag)."""
+    tag = "{http://calendarserver.org/ns/}getctag"
+
+def extract_uid(data: str) -> Optional[str]:
+    """Return the UID of a VTODO resource without parsing the whole calendar object.
+
+    Args:
+        data: The iCalendar text of the resource.
+
+    Returns:
+        Optional[str]: The UID, or None if the resource does not contain a VTODO.
+    """
+    if "BEGIN:VTODO" not in data:
+        return None
+    match = _UID_LINE.search(_FOLD.sub("", data))
+    return match.group(1).strip() if match else None
+
+class CachedTask:
+    """A single VTODO resource held by a `CalendarTaskStore`."""
+    __slots__ = ("uid", "href", "etag", "data", "_component", "_master", "_record", "_series")
+
+    def __init__(self, uid: str, href: str, etag: Optional[str], data: str):
+        self.uid = uid
+        self.href = href
+        self.etag = etag
+        self.data = data
+        self._component: Optional[icalendar.Todo] = None
+        self._master: Optional[TodoRecord] = None
+        self._record: Optional[TodoRecord] = None
+        self._series: Optional[RecurrenceSeries] = None
+
+    @property
+    def component(self) -> icalendar.Todo:
+        """The master VTODO component, parsed on first access."""
+        if self._component is None:
+            todos = [
+                c for c in icalendar.Calendar.from_ical(self.data).walk("VTODO")
+            ]
+            masters = [c for c in todos if "RECURRENCE-ID" not in c]
+            self._component = (masters or todos)[0]
+        return self._component
+
+    @property
+    def master(self) -> TodoRecord:
+        """The exposed fields of the master VTODO, scanned from the raw data on first access."""
+        if self._master is None:
+            self._master = TodoRecord.from_ical(self.data)
+        return self._master
+
+    @property
+    def series(self) -> Optional[RecurrenceSeries]:
+        """The occurrences of a recurring task (None for other tasks), expanded lazily."""
+        if self._series is None and is_recurring(self.data):
+            self._series = RecurrenceSeries(self.data)
+        return self._series
+
+    @property
+    def record(self) -> TodoRecord:
+        """The exposed fields of the task: the master VTODO, or for a recurring task, its current occurrence.
+
+        Listings and filters use this instead of `component`, which needs a full parse. A
+        recurring task whose occurrences are all done is reported as completed.
+        """
+        if self._record is None:
+            series = self.series
+            if series is None:
+                self._record = self.master
+            else:
+                self._record = series.current() or self.master.copy(status="COMPLETED")
+        return self._record
+
+    @property
+    def pending(self) -> bool:
+        """Whether the task still needs action (same rule `caldav.Calendar.todos()` applies)."""
+        return self.record.status not in ("COMPLETED", "CANCELLED")
+
+    def to_todo(self, calendar: caldav.Calendar) -> caldav.Todo:
+        """Build a fresh `caldav.Todo` for this task, so callers can modify it without touching the store."""
+        return caldav.Todo(
+            calendar.client,
+            url=calendar.url.join(quote(self.href)),
+            data=self.data,
+            parent=calendar,
+            id=self.uid,
+            props={dav.GetEtag.tag: self.etag} if self.etag else None,
+        )
+
+class CalendarTaskStore:
+    """Local copy of the tasks in one calendar, kept in sync with the server."""
+
+    def __init__(self, calendar: caldav.Calendar):
+        self.calendar = calendar
+        self.sync_token: Optional[str] = None
+        self.ctag: Optional[str] = None
+        self.supports_sync: Optional[bool] = None
+        self.loaded = False
+        self.tasks: dict[str, CachedTask] = {}
+        # ETags of every known href, including non-VTODO resources, so unchanged
+        # events are not downloaded again on each refresh.
+        self.etags: dict[str, Optional[str]] = {}
+        self.uid_by_href: dict[str, str] = {}
+        self.lock = threading.RLock()
+        # Serializes refreshes, which hold `lock` only to apply what they downloaded.
+        self.refresh_lock = threading.Lock()
+        # Hrefs written through since the current refresh started; None outside a refresh.
+        self._written: Optional[set[str]] = None
+        # Built on first search, then kept up to date by `put` and `_forget_href`.
+        self._index: Optional[TaskIndex] = None
+        # UIDs of tasks whose local version must survive refreshes until it is on the server.
+        self.pinned: set[str] = set()
+        # Hrefs changed since `take_changes`; None unless `track_changes` was called.
+        self._changed: Optional[set[str]] = None
+
+    @property
+    def client(self) -> caldav.DAVClient:
+        return self.calendar.client
+
+    def refresh(self) -> None:
+        """Bring the store up to date with the server, downloading only what changed."""
+        with self.refresh_lock:
+            with self.lock:
+                self._written = set()
+            try:
+                if self.supports_sync is not False:
+                    try:
+                        self._refresh_by_sync_token()
+                        self.supports_sync = True
+                        return
+                    except error.DAVError:
+                        if self.supports_sync:
+                            raise
+                        self.supports_sync = False
+                        self.sync_token = None
+                self._refresh_by_etags()
+            finally:
+                with self.lock:
+                    self._written = None
+
+    def search(self, query: TaskQuery) -> list[CachedTask]:
+        """Run a `calendar-query` REPORT so the server only returns matching tasks.
+
+        Results are re-checked locally, since some servers ignore parts of the filter, and are
+        written into the store so later reads do not download them again.
+
+        Args:
+            query: The filter to apply.
+
+        Returns:
+            list[CachedTask]: The matching tasks.
+
+        Raises:
+            caldav.error.ReportError: If the server rejects the query.
+        """
+        response = self.client.report(str(self.calendar.url), xml_body(query.to_xml()), depth=1)
+        if response.status >= 400:
+            raise error.ReportError(error.errmsg(response))
+        with tracer.span("parse.multistatus") as span:
+            found = response.expand_simple_props([dav.GetEtag(), cdav.CalendarData()])
+            span.count(entries=len(found))
+        matches = []
+        with self.lock:
+            for href, props in found.items():
+                data = props.get(cdav.CalendarData.tag)
+                uid = extract_uid(data) if data else None
+                if uid is None or self._is_collection(href):
+                    continue
+                task = CachedTask(uid, href, props.get(dav.GetEtag.tag), data)
+                known = self.tasks.get(uid)
+                if known is not None and (uid in self.pinned or known.etag is not None and known.etag == task.etag):
+                    task = known
+                else:
+                    self.put(task)
+                if query.matches(task.record):
+                    matches.append(task)
+        return matches
+
+    def fetch(self, uids: Iterable[str]) -> dict[str, CachedTask]:
+        """Download the current version of specific tasks.
+
+        Tasks whose href is already known are fetched together with one `calendar-multiget`
+        REPORT; unknown UIDs are looked up with a UID `calendar-query`.
+
+        Args:
+            uids: The UIDs to fetch.
+
+        Returns:
+            dict[str, CachedTask]: The tasks found, by UID.
+        """
+        uids = list(dict.fromkeys(uids))
+        with self.lock:
+            hrefs = [self.tasks[uid].href for uid in uids if uid in self.tasks]
+        found = {}
+        for start in range(0, len(hrefs), MULTIGET_BATCH_SIZE):
+            for task in self._load(hrefs[start:start + MULTIGET_BATCH_SIZE]):
+                found[task.uid] = task
+        for uid in uids:
+            if uid not in found:
+                for task in self.search(TaskQuery(uid=uid, include_completed=True)):
+                    found[task.uid] = task
+        return {uid: found[uid] for uid in uids if uid in found}
+
+    @property
+    def index(self) -> TaskIndex:
+        """The search index over the held tasks, built on first access."""
+        with self.lock:
+            if self._index is None:
+                index = TaskIndex()
+                index.rebuild((t.uid, t.record) for t in self.tasks.values())
+                self._index = index
+            return self._index
+
+    def track_changes(self) -> None:
+        """Start recording the hrefs that are added, changed or removed, for `take_changes`."""
+        with self.lock:
+            if self._changed is None:
+                self._changed = set()
+
+    def take_changes(self) -> set[str]:
+        """Return the hrefs changed since the previous call, and start over."""
+        with self.lock:
+            changed = self._changed or set()
+            if self._changed is not None:
+                self._changed = set()
+            return changed
+
+    def get(self, uid: str) -> Optional[CachedTask]:
+        return self.tasks.get(uid)
+
+    def all(self) -> list[CachedTask]:
+        with self.lock:
+            return list(self.tasks.values())
+
+    def put(self, task: CachedTask) -> None:
+        """Write-through: record a task that was just saved to the server."""
+        with self.lock:
+            self._store(task)
+            if self._written is not None:
+                self._written.add(task.href)
+
+    def _store(self, task: CachedTask) -> None:
+        with self.lock:
+            previous = self.tasks.get(task.uid)
+            if previous is not None and previous.href != task.href:
+                self._forget_href(previous.href)
+            self.tasks[task.uid] = task
+            self.etags[task.href] = task.etag
+            self.uid_by_href[task.href] = task.uid
+            if self._changed is not None:
+                self._changed.add(task.href)
+            if self._index is not None:
+                self._index.add(task.uid, task.record)
+            # Our own write changes the CTag; force the next fallback refresh to list ETags.
+            self.ctag = None
+
+    def remove(self, uid: str) -> None:
+        """Write-through: drop a task that was just deleted from the server."""
+        with self.lock:
+            task = self.tasks.get(uid)
+            if task is not None:
+                self._forget_href(task.href)
+                if self._written is not None:
+                    self._written.add(task.href)
+
+    def _forget_href(self, href: str) -> None:
+        if self.uid_by_href.get(href) in self.pinned:
+            # A local change not pushed yet, e.g. a new task the server does not list yet.
+            return
+        if self._changed is not None:
+            self._changed.add(href)
+        self.etags.pop(href, None)
+        uid = self.uid_by_href.pop(href, None)
+        if uid is not None and uid in self.tasks and self.tasks[uid].href == href:
+            del self.tasks[uid]
+            if self._index is not None:
+                self._index.remove(uid)
+
+    def _is_collection(self, href: str) -> bool:
+        collection = self.calendar.url.canonical().strip_trailing_slash()
+        return self.calendar.url.join(quote(href)).canonical().strip_trailing_slash() == collection
+
+    def _refresh_by_sync_token(self) -> None:
+        root = dav.SyncCollection() + [
+            dav.SyncLevel(value="1"),
+            dav.SyncToken(value=self.sync_token),
+            dav.Prop() + dav.GetEtag(),
+        ]
+        try:
+            response = self.client.report(str(self.calendar.url), xml_body(root), depth=1)
+        except error.AuthorizationError:
+            # `DAVClient.request` raises on 403, which is also how servers refuse a token.
+            if self.sync_token is None:
+                raise
+            response = None
+        if response is None or response.status >= 400:
+            if self.sync_token is not None and (response is None or response.status in (403, 409)):
+                # The server no longer knows our token (valid-sync-token precondition); start over.
+                self.sync_token = None
+                return self._refresh_by_sync_token()
+            raise error.ReportError(error.errmsg(response))
+
+        with tracer.span("parse.multistatus") as span:
+            found = response.expand_simple_props([dav.GetEtag()])
+            span.count(entries=len(found))
+        full_listing = self.sync_token is None
+        listed: dict[str, Optional[str]] = {}
+        removed: list[str] = []
+        for href, props in found.items():
+            if self._is_collection(href):
+                continue
+            status = response.statuses.get(href) or ""
+            if " 404 " in status:
+                removed.append(href)
+            else:
+                listed[href] = props.get(dav.GetEtag.tag)
+        self._apply(listed, removed, full_listing)
+        self.sync_token = getattr(response, "sync_token", None) or _find_sync_token(response)
+
+    def _refresh_by_etags(self) -> None:
+        ctag = None
+        try:
+            props = self.calendar.get_properties([GetCTag()])
+            ctag = props.get(GetCTag.tag)
+        except error.DAVError:
+            pass
+        if self.loaded and ctag is not None and ctag == self.ctag:
+            return
+
+        response = self.client.propfind(
+            str(self.calendar.url), xml_body(dav.Propfind() + (dav.Prop() + dav.GetEtag())), depth=1
+        )
+        if response.status >= 400:
+            raise error.PropfindError(error.errmsg(response))
+        with tracer.span("parse.multistatus") as span:
+            found = response.expand_simple_props([dav.GetEtag()])
+            span.count(entries=len(found))
+        listed = {
+            href: props.get(dav.GetEtag.tag)
+            for href, props in found.items()
+            if not self._is_collection(href)
+        }
+        self._apply(listed, [], full_listing=True)
+        self.ctag = ctag
+
+    def _apply(self, listed: dict[str, Optional[str]], removed: list[str], full_listing: bool = False) -> None:
+        """Drop the removed hrefs and download the changed ones; with `full_listing`, every href not listed was removed."""
+        with self.lock:
+            written = self._written or set()
+            if full_listing:
+                removed = removed + [h for h in self.etags if h not in listed]
+            for href in removed:
+                if href not in written:
+                    self._forget_href(href)
+            changed = [
+                href for href, etag in listed.items()
+                if href not in written and (etag is None or href not in self.etags or self.etags[href] != etag)
+            ]
+        for start in range(0, len(changed), MULTIGET_BATCH_SIZE):
+            self._load(changed[start:start + MULTIGET_BATCH_SIZE])
+        self.loaded = True
+
+    def _load(self, hrefs: list[str]) -> list[CachedTask]:
+        """Download the given hrefs with a single `calendar-multiget` REPORT and return the tasks among them."""
+        root = (
+            cdav.CalendarMultiGet()
+            + (dav.Prop() + [dav.GetEtag(), cdav.CalendarData()])
+            + [dav.Href(value=quote(href)) for href in hrefs]
+        )
+        response = self.client.report(str(self.calendar.url), xml_body(root), depth=1)
+        if response.status >= 400:
+            raise error.ReportError(error.errmsg(response))
+        with tracer.span("parse.multistatus") as span:
+            found = response.expand_simple_props([dav.GetEtag(), cdav.CalendarData()])
+            span.count(entries=len(found))
+        loaded = []
+        with self.lock:
+            for href, props in found.items():
+                task = self._apply_loaded(href, props)
+                if task is not None:
+                    loaded.append(task)
+        return loaded
+
+    def _apply_loaded(self, href: str, props: dict) -> Optional[CachedTask]:
+        """Store one downloaded resource; the lock must be held. Returns the task, if it is one."""
+        if self._written is not None and href in self._written:
+            # Written through since the refresh started; the download may be older.
+            uid = self.uid_by_href.get(href)
+            return self.tasks.get(uid) if uid is not None else None
+        data = props.get(cdav.CalendarData.tag)
+        if data is None:
+            # Deleted between the listing and the multiget.
+            self._forget_href(href)
+            return None
+        etag = props.get(dav.GetEtag.tag)
+        uid = extract_uid(data)
+        if uid is None:
+            # Not a task; remember the ETag so it is not fetched again.
+            self._forget_href(href)
+            self.etags[href] = etag
+            if self._changed is not None:
+                self._changed.add(href)
+            return None
+        if uid in self.pinned and uid in self.tasks:
+            return self.tasks[uid]
+        task = CachedTask(uid, href, etag, data)
+        self._store(task)
+        return task
+
+def xml_body(root: BaseElement) -> bytes:
+    """Serialize a caldav XML element into a request body."""
+    return etree.tostring(root.xmlelement(), encoding="utf-8", xml_declaration=True)
+
+def _find_sync_token(response) -> Optional[str]:
+    found = response.tree.findall(".//" + dav.SyncToken.tag) if response.tree is not None else []
+    return found[0].text if found else None
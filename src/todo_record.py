@@ -0,0 +1,180 @@
+"""
+This module provides `TodoRecord`, a lightweight parse of the VTODO fields the tools expose.
+
+`dav.serialize_ical_todo` needs a full `icalendar.Todo`, and building that object graph for
+every task dominates the CPU cost of large listings. `TodoRecord.from_ical` instead scans the raw
+iCalendar text once and keeps only UID, SUMMARY, DUE, PRIORITY, STATUS, COMPLETED, DTSTART,
+DESCRIPTION and CATEGORIES. `TodoRecord.to_dict` produces the same values `serialize_ical_todo`
+produces for those fields.
+
+Records also answer `get(name)` like a component does (with plain Python values), so
+`TaskQuery.matches` and `dav.todo_sort_key` work on them without a full parse.
+"""
+from __future__ import annotations
+from typing import Any, Optional, Union
+from datetime import date, datetime
+import re
+
+TEXT_FIELDS = ("UID", "SUMMARY", "STATUS", "DESCRIPTION")
+DATE_FIELDS = ("DUE", "DTSTART", "COMPLETED")
+FIELDS = TEXT_FIELDS + DATE_FIELDS + ("PRIORITY", "CATEGORIES")
+# Fields included by `TodoRecord.to_dict` (CATEGORIES is kept for searching only).
+SERIALIZED_FIELDS = TEXT_FIELDS + DATE_FIELDS + ("PRIORITY",)
+
+def unfold(data: str) -> str:
+    """Join folded content lines (RFC 5545, section 3.1)."""
+    if "\n " not in data and "\n\t" not in data:
+        return data
+    return data.replace("\r\n ", "").replace("\r\n\t", "").replace("\n ", "").replace("\n\t", "")
+
+def unescape_text(value: str) -> str:
+    """Undo iCalendar TEXT escaping, in the same order as `icalendar.parser.unescape_char`."""
+    if "\\" not in value:
+        return value
+    return (
+        value.replace("\\N", "\\n")
+        .replace("\\n", "\n")
+        .replace("\\,", ",")
+        .replace("\\;", ";")
+        .replace("\\\\", "\\")
+    )
+
+def parse_date_value(value: str, params: str) -> Union[date, datetime, None]:
+    """Parse a DATE or DATE-TIME value as written, dropping any time zone.
+
+    `serialize_ical_todo` removes tzinfo without converting, so the wall time as written is
+    exactly what it outputs.
+    """
+    try:
+        if len(value) == 8 or "VALUE=DATE;" in params + ";":
+            return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+        return datetime(
+            int(value[0:4]), int(value[4:6]), int(value[6:8]),
+            int(value[9:11]), int(value[11:13]), int(value[13:15]),
+        )
+    except ValueError:
+        return None
+
+def _split_content_line(line: str) -> tuple[str, str, str]:
+    """Split a content line into (NAME, params, value), honouring quoted parameter values."""
+    colon = line.find(":")
+    quote = line.find('"')
+    if quote != -1 and quote < colon:
+        in_quotes = False
+        for i, char in enumerate(line):
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ":" and not in_quotes:
+                colon = i
+                break
+    head, value = line[:colon], line[colon + 1:]
+    semi = head.find(";")
+    if semi == -1:
+        return head.upper(), "", value
+    return head[:semi].upper(), head[semi + 1:].upper(), value
+
+class TodoRecord:
+    """The exposed fields of one VTODO, parsed straight from iCalendar text."""
+    __slots__ = ("uid", "summary", "due", "priority", "status", "completed", "dtstart", "description", "categories")
+
+    def __init__(self):
+        self.uid: Optional[str] = None
+        self.summary: Optional[str] = None
+        self.due: Union[date, datetime, None] = None
+        self.priority: Optional[int] = None
+        self.status: Optional[str] = None
+        self.completed: Union[date, datetime, None] = None
+        self.dtstart: Union[date, datetime, None] = None
+        self.description: Optional[str] = None
+        self.categories: Optional[list[str]] = None
+
+    @classmethod
+    def from_ical(cls, data: str) -> Optional[TodoRecord]:
+        """Parse the master VTODO of a calendar object resource.
+
+        Args:
+            data: The iCalendar text.
+
+        Returns:
+            Optional[TodoRecord]: The record, or None if the data holds no VTODO.
+        """
+        record = None
+        master_found = False
+        depth_in_todo = 0
+        current: Optional[TodoRecord] = None
+        is_override = False
+        for line in unfold(data).splitlines():
+            if line[:6] == "BEGIN:":
+                if depth_in_todo:
+                    depth_in_todo += 1
+                elif line.rstrip() == "BEGIN:VTODO":
+                    depth_in_todo = 1
+                    current = cls()
+                    is_override = False
+                continue
+            if not depth_in_todo:
+                continue
+            if line[:4] == "END:":
+                depth_in_todo -= 1
+                if depth_in_todo == 0:
+                    if record is None or (not master_found and not is_override):
+                        record = current
+                        master_found = not is_override
+                continue
+            if depth_in_todo != 1:
+                # Inside a VALARM or other nested component.
+                continue
+            name, params, value = _split_content_line(line)
+            if name == "RECURRENCE-ID":
+                is_override = True
+            elif name in TEXT_FIELDS:
+                setattr(current, name.lower(), unescape_text(value))
+            elif name in DATE_FIELDS:
+                setattr(current, name.lower(), parse_date_value(value.strip(), params))
+            elif name == "PRIORITY":
+                try:
+                    current.priority = int(value)
+                except ValueError:
+                    pass
+            elif name == "CATEGORIES":
+                current.categories = (current.categories or []) + [
+                    unescape_text(c) for c in re.split(r"(?<!\\),", value) if c
+                ]
+        return record
+
+    def copy(self, **changes: Any) -> TodoRecord:
+        """Return a copy of the record with some attributes replaced, e.g. `due=...`."""
+        record = TodoRecord()
+        for name in self.__slots__:
+            setattr(record, name, changes.get(name, getattr(self, name)))
+        return record
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Look up a field by its iCalendar property name, like `icalendar.Todo.get`."""
+        name = name.upper()
+        if name not in FIELDS:
+            return default
+        value = getattr(self, name.lower())
+        return default if value is None else value
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the record the way `serialize_ical_todo` serializes these fields.
+
+        Returns:
+            dict[str, Any]: The non-empty fields, with datetimes as ISO strings.
+        """
+        result: dict[str, Any] = {}
+        for name in ("UID", "SUMMARY", "DESCRIPTION", "STATUS"):
+            value = getattr(self, name.lower())
+            if value:
+                result[name] = value
+        if self.priority:
+            result["PRIORITY"] = self.priority
+        for name in DATE_FIELDS:
+            value = getattr(self, name.lower())
+            if value is not None:
+                result[name] = value.isoformat(" ") if isinstance(value, datetime) else value.isoformat()
+        return result
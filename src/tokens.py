@@ -0,0 +1,19 @@
+"""
+Cheap token counting for prompt and tool-output budgets.
+
+Exact counts depend on the model's tokenizer, which is not available for every backend (and
+loading one is slow), so budgets are enforced with a character-based estimate instead. For
+English text and JSON, Llama and GPT tokenizers average roughly four characters per token.
+"""
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        int: The estimated token count (rounded up).
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
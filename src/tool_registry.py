@@ -0,0 +1,379 @@
+"""
+This module provides the tool registry of `ReActAgent`.
+
+Everything the agent needs to know about its tools is worked out once, when a tool is added:
+its signature line for the system prompt, its parameters and their type hints, and the
+rendered system prompt itself. A turn then only looks things up.
+
+Tool input written by the model is parsed (as JSON, or as a Python literal) and checked against
+the tool's parameters before the tool runs. Values are coerced where the intent is clear, e.g.
+ISO strings to `datetime` and numeric strings to `int`, and anything else is rejected with a
+`ToolInputError` that names the problem, so a bad call costs no requests to the server.
+
+Each tool also gets a JSON schema of its parameters, built from its type hints and the `Args:`
+section of its docstring, for models that are sent tools as native tool definitions instead of
+a list in the system prompt.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Optional, Union, get_args, get_origin, get_type_hints
+from datetime import date, datetime
+import ast
+import functools
+import inspect
+import json
+import os
+import pathlib
+import re
+import types
+
+class ToolInputError(Exception):
+    """Raised when the input of a tool call does not match the tool's parameters."""
+    pass
+
+def get_tool_signature(fn: Callable[..., Any]) -> str:
+    signature = inspect.signature(fn)
+    name = fn.__name__
+    params_str = ", ".join(str(param) for param in signature.parameters.values())
+    return f"{name}({params_str})"
+
+@functools.lru_cache(maxsize=None)
+def load_system_prompt_template(name: str = "system_prompt.txt") -> str:
+    with open(pathlib.Path(os.path.dirname(os.path.abspath(__file__)), name)) as f:
+        return f.read()
+
+def get_system_prompt(tool_list: str) -> str:
+    return load_system_prompt_template().format(tool_list=tool_list)
+
+SECTION_HEADER = re.compile(r"^[A-Z][A-Za-z ]*:$")
+ARG_LINE = re.compile(r"^(\*{0,2}\w+)(?:\s*\([^)]*\))?:\s*(.*)$")
+
+def parse_docstring(doc: Optional[str]) -> tuple[str, dict[str, str]]:
+    """Split a Google-style docstring into its description and its `Args:` entries.
+
+    Args:
+        doc: The docstring, or None.
+
+    Returns:
+        tuple[str, dict[str, str]]: The text before the first section, and the description of
+            each argument by name (`**fields` is kept with its stars).
+    """
+    lines = inspect.cleandoc(doc or "").splitlines()
+    description: list[str] = []
+    args: dict[str, str] = {}
+    section = None
+    current = None
+    for line in lines:
+        stripped = line.strip()
+        if SECTION_HEADER.match(stripped) and not line.startswith(" "):
+            section = stripped[:-1]
+            current = None
+        elif section is None:
+            description.append(stripped)
+        elif section == "Args" and stripped:
+            match = ARG_LINE.match(stripped)
+            if match and line.startswith(" ") and not line.startswith(" " * 5):
+                current = match.group(1)
+                args[current] = match.group(2)
+            elif current is not None:
+                args[current] += " " + stripped
+    return " ".join(" ".join(description).split()), args
+
+def json_schema(hint: Any) -> dict[str, Any]:
+    """Describe the values `coerce` accepts for a type hint as a JSON schema.
+
+    Args:
+        hint: The parameter's type hint.
+
+    Returns:
+        dict[str, Any]: The schema; empty (anything) for unknown or missing hints.
+    """
+    origin = get_origin(hint)
+    if origin is Union or origin is types.UnionType:
+        options = [json_schema(option) for option in get_args(hint) if option is not type(None)]
+        if type(None) in get_args(hint):
+            options.append({"type": "null"})
+        return options[0] if len(options) == 1 else {"anyOf": options}
+    if origin in (list, tuple, set):
+        item_hint = (get_args(hint) or (Any,))[0]
+        return {"type": "array", "items": json_schema(item_hint)}
+    if origin is dict or hint is dict:
+        return {"type": "object"}
+    if hint is datetime:
+        return {"type": "string", "format": "date-time"}
+    if hint is date:
+        return {"type": "string", "format": "date"}
+    simple = {bool: "boolean", int: "integer", float: "number", str: "string"}
+    if hint in simple:
+        return {"type": simple[hint]}
+    return {}
+
+def parse_tool_input(raw: str) -> dict[str, Any]:
+    """Parse the text after `Tool Input:` into keyword arguments.
+
+    Args:
+        raw: A JSON object, or a Python dict literal. Empty input means no arguments.
+
+    Returns:
+        dict[str, Any]: The arguments.
+
+    Raises:
+        ToolInputError: If the text is neither, or is not a dict.
+    """
+    if not raw.strip():
+        return {}
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        try:
+            value = ast.literal_eval(raw)
+        except (ValueError, SyntaxError) as e:
+            raise ToolInputError(f"Tool Input is not a valid JSON object: {e}")
+    if not isinstance(value, dict):
+        raise ToolInputError("Tool Input must be a JSON object of arguments.")
+    return value
+
+def coerce(value: Any, hint: Any) -> Any:
+    """Convert a value parsed from the model's input to the type a parameter is annotated with.
+
+    Args:
+        value: The parsed value.
+        hint: The parameter's type hint.
+
+    Returns:
+        Any: The value, converted if needed.
+
+    Raises:
+        ValueError: If the value cannot be converted.
+    """
+    origin = get_origin(hint)
+    if hint is Any or hint is inspect.Parameter.empty:
+        return value
+    if origin is Union or origin is types.UnionType:
+        options = get_args(hint)
+        if value is None:
+            if type(None) in options:
+                return None
+            raise ValueError("must not be null")
+        errors = []
+        for option in options:
+            if option is type(None):
+                continue
+            try:
+                return coerce(value, option)
+            except ValueError as e:
+                errors.append(str(e))
+        raise ValueError(" or ".join(errors))
+    if value is None:
+        raise ValueError("must not be null")
+    if origin in (list, tuple, set):
+        if not isinstance(value, (list, tuple)):
+            raise ValueError("must be a list")
+        item_hint = (get_args(hint) or (Any,))[0]
+        return origin(coerce(item, item_hint) for item in value)
+    if origin is dict or hint is dict:
+        if not isinstance(value, dict):
+            raise ValueError("must be an object")
+        return value
+    if hint is datetime:
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        raise ValueError("must be an ISO 8601 date and time, e.g. 2024-05-01T17:00:00")
+    if hint is date:
+        if isinstance(value, date):
+            return value
+        if isinstance(value, str):
+            try:
+                return date.fromisoformat(value)
+            except ValueError:
+                pass
+        raise ValueError("must be an ISO 8601 date, e.g. 2024-05-01")
+    if hint is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise ValueError("must be true or false")
+    if hint is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str):
+            try:
+                return int(value.strip())
+            except ValueError:
+                pass
+        raise ValueError("must be an integer")
+    if hint is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value.strip())
+            except ValueError:
+                pass
+        raise ValueError("must be a number")
+    if hint is str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        raise ValueError("must be a string")
+    return value
+
+class Tool:
+    """A registered tool with its precomputed signature and parameters.
+
+    Attributes:
+        name: The tool's name, as the model writes it.
+        fn: The callable.
+        signature: The line describing the tool in the system prompt.
+        parameters: The keyword parameters, by name.
+        hints: The type hints of the parameters, by name.
+        extra_kwargs: Whether the tool takes arbitrary keyword arguments (`**fields`).
+        schema: The tool definition sent to models with native tool calling (OpenAI function format).
+    """
+
+    def __init__(self, fn: Callable[..., Any]):
+        self.name = fn.__name__
+        self.fn = fn
+        self.signature = get_tool_signature(fn)
+        parameters = inspect.signature(fn).parameters
+        self.extra_kwargs = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+        self.parameters = {
+            name: p for name, p in parameters.items()
+            if p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+        }
+        try:
+            hints = get_type_hints(fn)
+        except (NameError, TypeError):
+            hints = {}
+        self.hints = {name: hints.get(name, inspect.Parameter.empty) for name in self.parameters}
+        self.schema = self._build_schema(parameters)
+
+    def _build_schema(self, parameters) -> dict[str, Any]:
+        description, arg_docs = parse_docstring(self.fn.__doc__)
+        properties = {}
+        for name, p in self.parameters.items():
+            prop = json_schema(self.hints[name])
+            if name in arg_docs:
+                prop["description"] = arg_docs[name]
+            if p.default is not inspect.Parameter.empty and isinstance(p.default, (str, int, float, bool)):
+                prop["default"] = p.default
+            properties[name] = prop
+        schema: dict[str, Any] = {
+            "type": "object",
+            "properties": properties,
+            "required": [name for name, p in self.parameters.items() if p.default is inspect.Parameter.empty],
+        }
+        if self.extra_kwargs:
+            schema["additionalProperties"] = True
+            extra = [f"Other arguments: {doc}" for name, doc in arg_docs.items() if name.startswith("**")]
+            description = " ".join([description, *extra]).strip()
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": description, "parameters": schema},
+        }
+
+    def bind(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Check arguments against the parameters and coerce them to their type hints.
+
+        Args:
+            arguments: The parsed tool input.
+
+        Returns:
+            dict[str, Any]: The keyword arguments to call the tool with.
+
+        Raises:
+            ToolInputError: If an argument is unknown, missing or of the wrong type.
+        """
+        problems = []
+        bound = {}
+        for name, value in arguments.items():
+            if name not in self.parameters:
+                if self.extra_kwargs:
+                    bound[name] = value
+                else:
+                    problems.append(f"unknown argument `{name}`")
+                continue
+            try:
+                bound[name] = coerce(value, self.hints[name])
+            except ValueError as e:
+                problems.append(f"`{name}` {e}")
+        missing = [
+            name for name, p in self.parameters.items()
+            if p.default is inspect.Parameter.empty and name not in arguments
+        ]
+        if missing:
+            problems.append(f"missing {', '.join(f'`{name}`' for name in missing)}")
+        if problems:
+            raise ToolInputError(f"Invalid input for {self.name}: {'; '.join(problems)}")
+        return bound
+
+class ToolRegistry:
+    """The tools of an agent, with the system prompt rendered for them."""
+
+    def __init__(self):
+        self.tools: dict[str, Tool] = {}
+        self._system_prompt: Optional[str] = None
+        self._schemas: Optional[list[dict[str, Any]]] = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def add(self, fn: Callable[..., Any]) -> Tool:
+        tool = Tool(fn)
+        self.tools[tool.name] = tool
+        self._system_prompt = None
+        self._schemas = None
+        return tool
+
+    @property
+    def tool_list(self) -> str:
+        return '\n'.join(f'- {tool.signature}' for tool in self.tools.values())
+
+    @property
+    def system_prompt(self) -> str:
+        """The system prompt listing the tools; rendered again only after a tool is added."""
+        if self._system_prompt is None:
+            self._system_prompt = get_system_prompt(self.tool_list)
+        return self._system_prompt
+
+    @property
+    def native_system_prompt(self) -> str:
+        """The system prompt for native tool calling, where the tools are sent as `schemas` instead."""
+        return load_system_prompt_template("system_prompt_native.txt")
+
+    @property
+    def schemas(self) -> list[dict[str, Any]]:
+        """The tool definitions for native tool calling; a new list only after a tool is added."""
+        if self._schemas is None:
+            self._schemas = [tool.schema for tool in self.tools.values()]
+        return self._schemas
+
+    def prepare(self, name: str, raw_input: Union[str, dict[str, Any]]) -> tuple[Tool, dict[str, Any]]:
+        """Look up a tool and validate the input the model wrote for it.
+
+        Args:
+            name: The tool name from the `Tool:` line.
+            raw_input: The text after `Tool Input:`, or the arguments of a native tool call.
+
+        Returns:
+            tuple[Tool, dict[str, Any]]: The tool and its coerced keyword arguments.
+
+        Raises:
+            ToolInputError: If the tool is unknown or its input is invalid.
+        """
+        tool = self.tools.get(name)
+        if tool is None:
+            raise ToolInputError(f"Unknown tool `{name}`; use one of: {', '.join(self.tools)}")
+        arguments = raw_input if isinstance(raw_input, dict) else parse_tool_input(raw_input)
+        return tool, tool.bind(arguments)
@@ -0,0 +1,157 @@
+"""
+This module picks the tools relevant to a user request, so only their schemas are sent to the model.
+
+Every tool schema bound to a chat model is part of every prompt of the conversation, and local
+models slow down with prompt length. `ToolRouter` ranks the tools against the user's message
+with BM25 over each tool's name, description and argument names, and keeps the best matches.
+A few synonyms map everyday words ("done", "deadline", "urgent") onto the vocabulary of the
+tool descriptions.
+
+When no tool matches well enough, the router can ask a small chat model to choose, and
+otherwise falls back to the full tool set: a missing tool costs a failed turn, an extra one
+only some tokens.
+"""
+from __future__ import annotations
+from typing import Any, Iterable, Optional, Sequence
+import math
+import re
+
+from langchain_core.tools import BaseTool
+
+# Everyday words mapped onto the words used by the tool names and descriptions.
+SYNONYMS = {
+    "done": "complete", "finish": "complete", "finished": "complete",
+    "reopen": "incomplete", "undo": "incomplete", "uncheck": "incomplete",
+    "late": "overdue", "missed": "overdue", "behind": "overdue",
+    "deadline": "due", "tomorrow": "due", "today": "due", "week": "due", "when": "due",
+    "soon": "upcoming", "coming": "upcoming", "next": "upcoming",
+    "important": "priority", "urgent": "priority", "prioritize": "priority",
+    "rename": "summary", "title": "summary", "name": "summary",
+    "note": "description", "notes": "description", "detail": "description", "details": "description",
+    "create": "add", "new": "add", "remind": "add", "reminder": "add",
+    "show": "list", "todo": "list", "todos": "list",
+    "calendars": "calendar", "lists": "calendar",
+    "bulk": "many",
+    "begin": "start", "started": "start", "ending": "end",
+    "meeting": "event", "meetings": "event", "appointment": "event", "appointments": "event", "events": "event",
+    "available": "free", "availability": "free", "schedule": "event", "reschedule": "move", "cancel": "delete",
+    "remove": "delete", "postpone": "move",
+}
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do for from i in is it me my of on or please that the this to "
+    "with you your can could would should".split()
+)
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words of a text, split at underscores, with stopwords dropped and synonyms mapped."""
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    return [SYNONYMS.get(w, w) for w in words if w not in STOPWORDS]
+
+class ToolRouter:
+    """
+    Selects a subset of tools for a request.
+
+    Args:
+        tools: All available tools.
+        top_k: Most tools to select by score.
+        min_score: BM25 score the best tool must reach to trust the ranking.
+        relative_cutoff: Tools scoring below this fraction of the best score are left out.
+        companions: Tools to add whenever a tool is selected, by tool name. Tools taking a
+            `task_id` usually need a listing tool to find the ID, for example.
+        router_model: Optional chat model asked to choose when the ranking is not trusted.
+        k1: BM25 term frequency saturation.
+        b: BM25 length normalization.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        top_k: int = 5,
+        min_score: float = 1.5,
+        relative_cutoff: float = 0.5,
+        companions: Optional[dict[str, list[str]]] = None,
+        router_model: Optional[Any] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.tools = list(tools)
+        self.by_name = {t.name: t for t in self.tools}
+        self.top_k = top_k
+        self.min_score = min_score
+        self.relative_cutoff = relative_cutoff
+        self.companions = companions or {}
+        self.router_model = router_model
+        self.k1 = k1
+        self.b = b
+
+        # The name is repeated so it weighs more than the description.
+        self.documents = [
+            tokenize(" ".join([t.name] * 3 + [t.description] + list(t.args))) for t in self.tools
+        ]
+        self.average_length = sum(map(len, self.documents)) / max(1, len(self.documents))
+        document_frequency: dict[str, int] = {}
+        for document in self.documents:
+            for term in set(document):
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        n = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def scores(self, request: str) -> list[tuple[float, BaseTool]]:
+        """Score every tool against a request, best first."""
+        terms = set(tokenize(request)) & self.idf.keys()
+        scored = []
+        for tool, document in zip(self.tools, self.documents):
+            score = 0.0
+            for term in terms:
+                tf = document.count(term)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * len(document) / self.average_length)
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scored.append((score, tool))
+        scored.sort(key=lambda item: -item[0])
+        return scored
+
+    def select(self, request: str) -> list[BaseTool]:
+        """
+        Select the tools for a request, in their original order.
+
+        Args:
+            request: The user's message.
+
+        Returns:
+            list[BaseTool]: The selected tools, or all tools when the choice is uncertain.
+        """
+        scored = self.scores(request)
+        best = scored[0][0] if scored else 0.0
+        if best >= self.min_score:
+            names = [tool.name for score, tool in scored[:self.top_k] if score >= best * self.relative_cutoff]
+        elif self.router_model is not None:
+            names = self._ask_model(request)
+        else:
+            names = []
+        if not names:
+            return self.tools
+        return self._with_companions(names)
+
+    def _with_companions(self, names: Iterable[str]) -> list[BaseTool]:
+        selected = set(names)
+        for name in list(selected):
+            selected.update(self.companions.get(name, []))
+        return [t for t in self.tools if t.name in selected]
+
+    def _ask_model(self, request: str) -> list[str]:
+        """Ask the router model to name the tools needed; unknown names are ignored."""
+        catalog = "\n".join(f"- {t.name}: {t.description.splitlines()[0]}" for t in self.tools)
+        prompt = (
+            "Which of these tools may be needed to handle the request? "
+            "Reply with their names separated by commas, and nothing else.\n"
+            f"{catalog}\n\nRequest: {request}"
+        )
+        try:
+            reply = self.router_model.invoke(prompt)
+        except Exception:
+            return []
+        return [name for name in re.findall(r"[A-Za-z_]+", str(reply.content)) if name in self.by_name]
@@ -0,0 +1,214 @@
+"""
+This module provides lightweight tracing spans for the agents and the DAV client.
+
+Code marks phases with `tracer.span(name, **attributes)`. Spans nest through a context
+variable, so a tool call's HTTP requests become children of the tool call, which is a child of
+the agent step. Finished spans are handed to the tracer's sinks:
+
+- `JsonLinesSink` writes one JSON object per span.
+- `OTLPJsonSink` writes spans in the OpenTelemetry OTLP/JSON encoding, one export request per
+  line, which OpenTelemetry collectors and most trace viewers can import.
+- `SpanCollector` keeps spans in memory, e.g. for tests and benchmarks.
+
+Every span also adds its duration and its counters (attributes recorded with `Span.count`, such
+as tokens and bytes) to the totals of the root span of its trace, so the caller of a whole agent turn gets a per-phase summary from
+`Span.summary()` without any sink configured. With no sinks configured, spans are not
+exported at all.
+
+The module-level `tracer` is shared by the whole process; `configure_from_config` adds the
+sinks named in `config.py`.
+"""
+from __future__ import annotations
+from typing import Any, Iterator, Optional, TextIO
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed phase, with attributes and a parent."""
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent", "root", "start_ns", "end_ns", "status", "counters", "totals", "_lock")
+
+    def __init__(self, name: str, attributes: dict[str, Any], parent: Optional[Span]):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.root: Span = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.counters: list[str] = []
+        # Only used on root spans: per span name, the count, total milliseconds and numeric attributes.
+        self.totals: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes, e.g. results only known at the end of the phase."""
+        self.attributes.update(attributes)
+
+    def count(self, **amounts: int | float) -> None:
+        """Add attributes that are summed up per span name in the summary of the trace."""
+        self.attributes.update(amounts)
+        self.counters.extend(amounts)
+
+    def _add_to_root(self) -> None:
+        root = self.root
+        with root._lock:
+            totals = root.totals.setdefault(self.name, {"count": 0, "ms": 0.0})
+            totals["count"] += 1
+            totals["ms"] += self.duration_ms
+            for key in self.counters:
+                totals[key] = totals.get(key, 0) + self.attributes[key]
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Per span name: how often it ran in this trace, its total milliseconds and summed counters."""
+        with self._lock:
+            return {name: dict(values) for name, values in self.totals.items()}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class JsonLinesSink:
+    """Writes each finished span as a JSON object on its own line.
+
+    Args:
+        target: File path to append to, or an open text stream.
+    """
+
+    def __init__(self, target: str | TextIO):
+        self.stream = open(target, "a", buffering=1) if isinstance(target, str) else target
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+
+class OTLPJsonSink(JsonLinesSink):
+    """Writes each finished span as an OTLP/JSON `ExportTraceServiceRequest` on its own line.
+
+    Args:
+        target: File path to append to, or an open text stream.
+        service_name: Value of the `service.name` resource attribute.
+    """
+
+    def __init__(self, target: str | TextIO, service_name: str = "taskdav-agent"):
+        super().__init__(target)
+        self.service_name = service_name
+
+    @staticmethod
+    def _value(value: Any) -> dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def export(self, span: Span) -> None:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 1 if span.status == "ok" else 2},
+        }
+        if span.parent is not None:
+            otlp_span["parentSpanId"] = span.parent.span_id
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [otlp_span]}],
+            }]
+        }
+        line = json.dumps(request)
+        with self.lock:
+            self.stream.write(line + "\n")
+
+class SpanCollector:
+    """Keeps finished spans in memory."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+class Tracer:
+    """Creates spans and hands finished ones to its sinks."""
+
+    def __init__(self):
+        self.sinks: list[Any] = []
+
+    def add_sink(self, sink: Any) -> None:
+        """Register a sink: any object with an `export(span)` method."""
+        self.sinks.append(sink)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time a block as a span; exceptions mark it as failed and propagate."""
+        span = Span(name, attributes, _current.get())
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            if span.parent is not None:
+                span._add_to_root()
+            for sink in self.sinks:
+                sink.export(span)
+
+tracer = Tracer()
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def format_summary(summary: dict[str, dict[str, float]]) -> str:
+    """Render a root span's summary as one line per span name, slowest first."""
+    lines = []
+    for name, values in sorted(summary.items(), key=lambda item: -item[1]["ms"]):
+        extra = " ".join(f"{k}={v:g}" for k, v in values.items() if k not in ("count", "ms"))
+        lines.append(f"{name:<18} {int(values['count']):>4}x {values['ms']:>9.1f} ms {extra}".rstrip())
+    return "\n".join(lines)
+
+def configure_from_config(config) -> None:
+    """
+    Add the sinks named by the `trace_*` settings of a config module to the shared tracer.
+
+    Args:
+        config: Module (or object) with optional `trace_jsonl` and `trace_otlp_json` file paths
+    """
+    if path := getattr(config, "trace_jsonl", ""):
+        tracer.add_sink(JsonLinesSink(path))
+    if path := getattr(config, "trace_otlp_json", ""):
+        tracer.add_sink(OTLPJsonSink(path))
@@ -0,0 +1,40 @@
+"""Shared fixtures: the modules of `src/`, the mock CalDAV server of `benchmarks/` and a stand-in config."""
+import pathlib
+import sys
+import types
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "src"), str(ROOT / "benchmarks")]
+
+from mock_caldav import MockCalDAVServer  # noqa: E402
+
+import dav  # noqa: E402
+
+USERNAME = PASSWORD = "bench"
+
+# Stands in for the user's config.py, which the entry points import.
+config = sys.modules.setdefault("config", types.ModuleType("config"))
+config.ai_model = "scripted"
+config.checkpoint_db = ""
+
+@pytest.fixture
+def server():
+    with MockCalDAVServer() as server:
+        yield server
+
+@pytest.fixture
+def client(server):
+    client = dav.TaskDAVClient(url=server.url, username=USERNAME, password=PASSWORD)
+    yield client
+    client.close()
+
+def vtodo(uid: str, summary: str = "Task", *lines: str) -> str:
+    """A VTODO resource with the given extra property lines."""
+    return "\r\n".join([
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//test//EN",
+        "BEGIN:VTODO", f"UID:{uid}", "DTSTAMP:20250101T120000Z", f"SUMMARY:{summary}",
+        *lines,
+        "END:VTODO", "END:VCALENDAR",
+    ]) + "\r\n"
@@ -0,0 +1,48 @@
+from concurrent.futures import Future
+
+from agent_memory import SUMMARY_PREFIX, SlidingWindowMemory, history_tokens
+from llama_agent import ReActAgent
+
+def record_exchange(agent: ReActAgent, n: int, output_chars: int = 400, answer: bool = True) -> None:
+    """Record a question, one tool call and its output the way `ReActAgent` does during a turn."""
+    agent.add_history("user", f"Question {n}")
+    call = ("task_list_by_calendar", "work")
+    agent._record_calls([call])
+    output: Future = Future()
+    output.set_result("x" * output_chars)
+    agent._record_tool_outputs([call], [output])
+    if answer:
+        agent.add_history("assistant", f"Final Answer: Answer {n}")
+
+def test_compacts_down_to_the_target_with_a_summary():
+    calls = []
+    memory = SlidingWindowMemory(max_tokens=500, target_tokens=250, keep_recent=2, summarizer=lambda summary, dropped: calls.append(dropped) or "earlier")
+    agent = ReActAgent(model=None, memory=memory)
+    for n in range(6):
+        record_exchange(agent, n)
+
+    compacted = memory.compact(agent.history)
+
+    assert history_tokens(compacted) <= 500
+    assert compacted[0] == ("system", SUMMARY_PREFIX + "earlier")
+    assert compacted[-1] == ("assistant", "Final Answer: Answer 5")
+    assert [msg for role, msg in compacted if role == "user"][0] != "Question 0"
+    assert len(calls) == 1
+
+def test_oversized_exchange_in_progress_is_digested_once():
+    calls = []
+    memory = SlidingWindowMemory(max_tokens=500, keep_recent=6, tool_output_tokens=50, summarizer=lambda summary, dropped: calls.append(dropped) or "earlier")
+    agent = ReActAgent(model=None, memory=memory)
+    record_exchange(agent, 0)
+    record_exchange(agent, 1, output_chars=8000, answer=False)
+
+    compacted = memory.compact(agent.history)
+    assert history_tokens(compacted) <= 500
+    assert ("user", "Question 1") in compacted
+    assert len(calls) == 1
+
+    # Growing past the mark again with nothing left to drop or shorten changes nothing.
+    grown = compacted + [("assistant", "z" * 2000)]
+    assert memory.compact(grown) is grown
+    assert memory.compact(grown) is grown
+    assert len(calls) == 1
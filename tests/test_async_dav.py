@@ -0,0 +1,36 @@
+import asyncio
+import io
+
+from async_dav import AsyncTaskDAVClient
+from conftest import PASSWORD, USERNAME, vtodo
+
+def run(server, action):
+    async def main():
+        async with AsyncTaskDAVClient(server.url, USERNAME, PASSWORD, max_concurrency=4) as client:
+            return await action(client)
+    return asyncio.run(main())
+
+def test_listings_across_calendars(server):
+    server.add_calendar("work", [vtodo("a", "Late", "DUE:20000101T000000"), vtodo("b")])
+    server.add_calendar("home", [vtodo("c")])
+
+    listings = run(server, lambda client: client.task_list_all())
+    overdue = run(server, lambda client: client.task_list_overdue("work"))
+
+    assert {calendar_id: sorted(t["UID"] for t in tasks) for calendar_id, tasks in listings.items()} == {"work": ["a", "b"], "home": ["c"]}
+    assert [t["UID"] for t in overdue] == ["a"]
+
+def test_export_then_import(server):
+    server.add_calendar("work", [vtodo(f"t{i}") for i in range(30)])
+    server.add_calendar("archive", [vtodo("t0", "Kept")])
+
+    async def export(client):
+        return "".join([chunk async for chunk in client.tasks_export("work")])
+
+    text = run(server, export)
+    summary = run(server, lambda client: client.tasks_import("archive", io.StringIO(text, newline="")))
+
+    assert summary["created"] == 29
+    assert summary["existing"] == 1
+    assert len(server.calendars["archive"].resources) == 30
+    assert "Kept" in server.calendars["archive"].resources["t0.ics"][1]
@@ -0,0 +1,46 @@
+import io
+import json
+
+import pytest
+
+from bulk import ExportWriter, ImportProgress, read_tasks
+from conftest import vtodo
+
+TIMEZONE = "\r\n".join([
+    "BEGIN:VTIMEZONE", "TZID:Europe/Berlin",
+    "BEGIN:STANDARD", "DTSTART:19701025T030000", "TZOFFSETFROM:+0200", "TZOFFSETTO:+0100", "END:STANDARD",
+    "END:VTIMEZONE",
+])
+
+def with_timezone(uid: str) -> str:
+    data = vtodo(uid, "Zoned", "DUE;TZID=Europe/Berlin:20250101T090000")
+    return data.replace("BEGIN:VTODO", TIMEZONE + "\r\nBEGIN:VTODO", 1)
+
+@pytest.mark.parametrize("format", ["ics", "jsonl"])
+def test_round_trip(format):
+    resources = [vtodo("a", "First", "BEGIN:VALARM", "ACTION:DISPLAY", "TRIGGER:-PT5M", "END:VALARM"), with_timezone("b"), with_timezone("c")]
+    writer = ExportWriter(format)
+    text = writer.header() + "".join(writer.task(data) for data in resources) + writer.footer()
+    if format == "ics":
+        # The shared time zone is written once.
+        assert text.count("BEGIN:VTIMEZONE") == 1
+
+    tasks = list(read_tasks(io.StringIO(text, newline="")))
+
+    assert [uid for uid, _ in tasks] == ["a", "b", "c"]
+    assert "END:VALARM" in tasks[0][1]
+    assert "TZID:Europe/Berlin" not in tasks[0][1]
+    assert "TZID:Europe/Berlin" in tasks[2][1]
+
+def test_progress_counts_contiguous_saves(tmp_path):
+    path = str(tmp_path / "import.progress")
+    progress = ImportProgress(path, "work", save_every=1)
+    for index in (0, 2, 3):
+        progress.saved(index)
+    assert progress.done == 1
+
+    resumed = ImportProgress(path, "work")
+    assert resumed.done == 1
+    with pytest.raises(ValueError):
+        ImportProgress(path, "other")
+    assert json.load(open(path)) == {"calendar_id": "work", "done": 1}
@@ -0,0 +1,23 @@
+import random
+
+from interval_tree import IntervalTree
+
+def test_overlapping_matches_a_scan():
+    rng = random.Random(7)
+    intervals = []
+    for i in range(500):
+        start = rng.randrange(0, 1000)
+        intervals.append((start, start + rng.randrange(0, 50), i))
+    tree = IntervalTree(intervals)
+    for _ in range(200):
+        start = rng.randrange(-10, 1010)
+        end = start + rng.randrange(1, 80)
+        expected = sorted((s, e, v) for s, e, v in intervals if s < end and e > start)
+        assert sorted(tree.overlapping(start, end)) == expected
+
+def test_intervals_are_half_open():
+    tree = IntervalTree([(0, 10, "a"), (10, 20, "b")])
+    assert [v for _, _, v in tree.overlapping(10, 11)] == ["b"]
+    assert [v for _, _, v in tree.overlapping(9, 10)] == ["a"]
+    assert tree.overlapping(20, 30) == []
+    assert IntervalTree().overlapping(0, 1) == []
@@ -0,0 +1,20 @@
+from langchain_core.messages import AIMessage, ToolMessage
+
+from llama_agent import native_messages
+
+def test_tool_messages_hold_only_the_results():
+    history = [
+        ("user", "What is due at home and at work?"),
+        ("assistant", 'Tool: task_list_overdue\nTool Input: {"calendar_id": "home"}\nTool: task_list_overdue\nTool Input: {"calendar_id": "work"}'),
+        ("assistant", "Tool Output: task_list_overdue: []"),
+        ("assistant", "Tool Output: task_list_overdue: [{'UID': 'a'}]"),
+        ("assistant", "Tool: calendar_list_ids\nTool Input: {}"),
+        ("assistant", "Tool Output: ['home', 'work']"),
+    ]
+
+    messages = native_messages("system", history)
+
+    calls = [m for m in messages if isinstance(m, AIMessage)]
+    results = [m for m in messages if isinstance(m, ToolMessage)]
+    assert [r.content for r in results] == ["[]", "[{'UID': 'a'}]", "['home', 'work']"]
+    assert [r.tool_call_id for r in results] == [c["id"] for m in calls for c in m.tool_calls]
@@ -0,0 +1,76 @@
+import threading
+
+from conftest import vtodo
+from memo import MemoCache, invalidates, memoized
+
+class Store:
+    def __init__(self):
+        self.memo = MemoCache(ttl=60)
+        self.value = "old"
+        self.reading = threading.Event()
+        self.release = threading.Event()
+        self.block = False
+
+    @memoized()
+    def read(self, calendar_id: str) -> str:
+        value = self.value
+        if self.block:
+            self.reading.set()
+            self.release.wait(5)
+        return value
+
+    @invalidates
+    def write(self, calendar_id: str, value: str) -> None:
+        self.value = value
+
+def test_results_are_cached_until_a_write():
+    store = Store()
+    assert store.read("work") == "old"
+    store.value = "changed behind the cache"
+    assert store.read("work") == "old"
+
+    store.write("work", "new")
+
+    assert store.read("work") == "new"
+    assert store.memo.stats()["hits"] == 1
+
+def test_write_during_a_read_is_not_masked():
+    store = Store()
+    store.block = True
+    results = []
+    reader = threading.Thread(target=lambda: results.append(store.read("work")))
+    reader.start()
+    assert store.reading.wait(5)
+
+    # The read has seen the old value; the write finishes before the read does.
+    store.write("work", "new")
+    store.release.set()
+    reader.join(5)
+    store.block = False
+
+    assert results == ["old"]
+    assert store.read("work") == "new"
+
+def test_writes_to_other_calendars_keep_entries():
+    store = Store()
+    store.read("work")
+    store.write("home", "new")
+    assert store.read("work") == "old"
+
+def test_priming_dropped_after_invalidation():
+    store = Store()
+    priming = Store.read.claim(store, "work")
+    store.write("work", "new")
+    priming.run()
+    assert store.read("work") == "new"
+
+def test_a_task_change_invalidates_its_calendar_once(server, client, monkeypatch):
+    server.add_calendar("work", [vtodo("a")])
+    invalidated = []
+    original = client.memo.invalidate
+    monkeypatch.setattr(client.memo, "invalidate", lambda calendar_id=None: invalidated.append(calendar_id) or original(calendar_id))
+
+    client.task_update_summary("work", "a", "Renamed")
+    client.task_mark_complete("work", "a")
+
+    assert invalidated == ["work", "work"]
@@ -0,0 +1,48 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import vtodo
+from fake_llm import ScriptedChatModel
+from llama_agent import ReActAgent
+
+def test_tool_calls_of_one_step_run_together_and_report_in_order():
+    # Each call waits for the other, so the step only completes if they run concurrently.
+    barrier = threading.Barrier(2, timeout=5)
+
+    def task_count(calendar_id: str) -> int:
+        """Count the tasks of a calendar.
+
+        Args:
+            calendar_id: Calendar ID.
+        """
+        barrier.wait()
+        if calendar_id == "home":
+            # Finish last, to show outputs follow the call order, not completion order.
+            time.sleep(0.1)
+        return len(calendar_id)
+
+    model = ScriptedChatModel(script=[
+        'Tool: task_count\nTool Input: {"calendar_id": "home"}\nTool: task_count\nTool Input: {"calendar_id": "work"}',
+        "Final Answer: Eight.",
+    ])
+    agent = ReActAgent(model=model)
+    agent.add_tool(task_count)
+
+    assert agent.invoke_agent("How many tasks?") == "Eight."
+    assert agent.history[2:4] == [
+        ("assistant", "Tool Output: task_count: 4"),
+        ("assistant", "Tool Output: task_count: 4"),
+    ]
+    assert [s["count"] for name, s in agent.last_summary.items() if name == "tool.call"] == [2]
+
+def test_concurrent_writes_to_one_task_are_serialized(server, client):
+    server.add_calendar("work", [vtodo("a", "Old")])
+    client.task_list_by_calendar("work")
+
+    with ThreadPoolExecutor(4) as pool:
+        updates = list(pool.map(lambda priority: client.task_update("work", "a", priority=priority), range(1, 5)))
+
+    # No write saw a stale ETag, and every one was applied in turn.
+    assert sorted(u["PRIORITY"] for u in updates) == [1, 2, 3, 4]
+    assert server.counters()["requests_put"] == 4
@@ -0,0 +1,42 @@
+from conftest import vtodo
+from prefetch import Prefetcher
+
+def test_prefetched_tools_are_answered_from_memory(server, client):
+    server.add_calendar("work", [vtodo("late", "Late", "DUE:20200101T090000")])
+    server.add_calendar("home", [vtodo("chore", "Chore")])
+    prefetcher = Prefetcher(client, max_age=60)
+
+    assert prefetcher.start()
+    assert prefetcher.wait(10) and prefetcher.last_error is None
+    server.reset_counters()
+
+    assert sorted(client.calendar_list_ids()) == ["home", "work"]
+    assert [t["UID"] for t in client.task_list_overdue("work")] == ["late"]
+    assert [t["UID"] for t in client.task_list_by_calendar("home")] == ["chore"]
+    assert client.task_list_page("home")["rows"][0][0] == "chore"
+    assert server.counters()["requests"] == 0
+    # Still fresh, so no new prefetch is started.
+    assert not prefetcher.start()
+
+def test_tool_call_waits_for_the_running_prefetch(server, client):
+    server.add_calendar("work", [vtodo("a")])
+    prefetcher = Prefetcher(client, max_age=60)
+    server.latency = 0.2
+
+    assert prefetcher.start()
+    assert not prefetcher.start()
+    # The listing is claimed before `start` returns, so this call waits for the prefetch.
+    assert client.calendar_list_ids() == ["work"]
+    prefetcher.wait(10)
+    # Calendar discovery (three PROPFINDs) ran once, for both.
+    assert server.counters()["requests_propfind"] == 3
+    server.reset_counters()
+    client.task_list_by_calendar("work")
+
+    assert server.counters()["requests"] == 0
+
+def test_prefetch_failure_is_recorded_not_raised(server, client):
+    prefetcher = Prefetcher(client, calendar_ids=["missing"])
+
+    assert prefetcher.start() and prefetcher.wait(10)
+    assert prefetcher.last_error.startswith("CalendarNotFound")
@@ -0,0 +1,64 @@
+from fake_llm import ScriptedChatModel
+from llama_agent import ReActAgent, ReActStreamParser
+
+def parse(text: str, chunk: int = 3) -> ReActStreamParser:
+    parser = ReActStreamParser()
+    for start in range(0, len(text), chunk):
+        parser.feed(text[start:start + chunk])
+    parser.finish()
+    return parser
+
+def test_tool_calls_are_parsed_as_soon_as_their_input_line_ends():
+    parser = ReActStreamParser()
+    parser.feed('Thought: look it up\nTool: task_list_overdue\nTool Input: {"calendar_id": "work"}')
+    assert parser.tool_calls == []
+
+    parser.feed('\nTool: calendar_list_ids\nTool Input: {}\n')
+    assert parser.tool_calls == [("task_list_overdue", '{"calendar_id": "work"}'), ("calendar_list_ids", "{}")]
+    assert not parser.tool_calls_done
+
+    parser.feed("Tool Output: []\nFinal Answer: Nothing is due.")
+    assert parser.tool_calls_done
+    # The guessed output and answer after the calls are dropped.
+    assert parser.text.endswith("Tool Input: {}")
+    assert not parser.answer_started
+
+def test_answer_is_streamed_in_pieces_that_join_to_the_answer():
+    parser = ReActStreamParser()
+    pieces = []
+    for chunk in ["Thought: done\nFinal ", "Answer:  Two ", "tasks are ", "due. \n"]:
+        parser.feed(chunk)
+        pieces.append(parser.answer_delta())
+    parser.finish()
+    pieces.append(parser.answer_delta())
+
+    assert parser.answer_started and parser.tool_calls == []
+    assert pieces[0] == ""
+    assert "".join(pieces) == "Two tasks are due."
+
+def test_parsing_does_not_depend_on_chunking():
+    text = 'Tool: a\nTool Input: {"x": 1}\nTool: b\nTool Input: {}'
+    expected = [("a", '{"x": 1}'), ("b", "{}")]
+
+    for chunk in (1, 2, 5, len(text)):
+        parser = parse(text, chunk)
+        assert parser.tool_calls == expected and parser.tool_calls_done
+
+def test_agent_stops_generation_after_the_tool_calls():
+    def calendar_list_ids() -> list[str]:
+        """List the IDs of all calendars."""
+        return ["home", "work"]
+
+    model = ScriptedChatModel(script=[
+        "Tool: calendar_list_ids\nTool Input: {}\nTool Output: ['made up']\nFinal Answer: Made up.",
+        "Final Answer: You have home and work.",
+    ], chunk_chars=5)
+    agent = ReActAgent(model=model)
+    agent.add_tool(calendar_list_ids)
+
+    assert "".join(agent.stream_agent("Which calendars do I have?")) == "You have home and work."
+    assert agent.history[1:] == [
+        ("assistant", "Tool: calendar_list_ids\nTool Input: {}"),
+        ("assistant", "Tool Output: ['home', 'work']"),
+        ("assistant", "Final Answer: You have home and work."),
+    ]
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from async_dav import AsyncTaskDAVClient
+from conftest import PASSWORD, USERNAME, vtodo
+
+TOMORROW = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+def daily_chore() -> str:
+    return vtodo(
+        "chore", "Water the plants",
+        f"DTSTART:{TOMORROW:%Y%m%dT%H%M%S}",
+        f"DUE:{TOMORROW + timedelta(hours=1):%Y%m%dT%H%M%S}",
+        "RRULE:FREQ=DAILY",
+    )
+
+def due(day: int) -> str:
+    return str(TOMORROW + timedelta(days=day, hours=1))
+
+def test_completing_a_daily_chore_moves_on_to_the_next_day(server, client):
+    server.add_calendar("home", [daily_chore()])
+
+    client.task_mark_complete("home", "chore")
+
+    assert [t["DUE"] for t in client.task_list_by_calendar("home")] == [due(1)]
+    assert client.task_list_upcoming("home", days=3)[0]["DUE"] == due(1)
+    # The server copy still recurs, with the completed occurrence as an override.
+    data = server.calendars["home"].resources["chore.ics"][1]
+    assert "RRULE:FREQ=DAILY" in data and "RECURRENCE-ID" in data
+
+    client.task_mark_complete("home", "chore")
+    assert [t["DUE"] for t in client.task_list_by_calendar("home")] == [due(2)]
+
+    client.task_mark_incomplete("home", "chore")
+    assert [t["DUE"] for t in client.task_list_by_calendar("home")] == [due(1)]
+
+def test_async_client_completes_one_occurrence(server, client):
+    server.add_calendar("home", [daily_chore()])
+
+    async def complete():
+        async with AsyncTaskDAVClient(server.url, USERNAME, PASSWORD) as async_client:
+            await async_client.task_mark_complete("home", "chore")
+
+    asyncio.run(complete())
+
+    assert [t["DUE"] for t in client.task_list_by_calendar("home")] == [due(1)]
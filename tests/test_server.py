@@ -0,0 +1,71 @@
+import asyncio
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from conftest import config, vtodo
+from fake_llm import ScriptedChatModel
+from mock_caldav import MockCalDAVServer
+
+server_module = importlib.import_module("run-server")
+
+@pytest.fixture
+def caldav_server(monkeypatch):
+    with MockCalDAVServer(accounts={"alice": "secret"}) as server:
+        server.add_calendar("work", [vtodo("a")])
+        monkeypatch.setattr(config, "caldav_url", server.url, raising=False)
+        monkeypatch.setattr(config, "tool_routing", False, raising=False)
+        yield server
+
+def make_server(*script) -> server_module.AgentServer:
+    return server_module.AgentServer(workers=2, checkpointer=MemorySaver(), model=ScriptedChatModel(script=list(script)))
+
+def chat(agent_server, password: str, session_id: str = "s1") -> dict:
+    return asyncio.run(agent_server.chat("alice", password, {"message": "Hello", "session_id": session_id}))
+
+def test_wrong_password_is_rejected_after_a_login(caldav_server):
+    agent_server = make_server("Hi.")
+    assert chat(agent_server, "secret")["reply"] == "Hi."
+    thread = {"configurable": {"thread_id": "alice:s1"}}
+    checkpoints = len(list(agent_server.checkpointer.list(thread)))
+
+    with pytest.raises(server_module.HTTPError) as rejected:
+        chat(agent_server, "wrong")
+
+    assert rejected.value.status == 401
+    assert list(agent_server.pool.entries) == [agent_server.pool.key("alice", "secret")]
+    assert len(list(agent_server.checkpointer.list(thread))) == checkpoints
+
+def test_rejected_tool_call_answers_401(caldav_server):
+    rename = AIMessage("", tool_calls=[{"name": "task_update_summary", "args": {"calendar_id": "work", "task_id": "a", "summary": "Renamed"}, "id": "call-1"}])
+    agent_server = make_server("Hi.", rename, "Renamed it.")
+    chat(agent_server, "secret")
+    # The password is changed on the CalDAV server while the client is pooled.
+    caldav_server.accounts["alice"] = "changed"
+
+    with pytest.raises(server_module.HTTPError) as rejected:
+        chat(agent_server, "secret")
+
+    assert rejected.value.status == 401
+    assert agent_server.pool.entries == {}
+
+def test_discarded_client_is_closed_once_returned():
+    closed = []
+
+    class Client:
+        def close(self):
+            closed.append(self)
+
+    pool = server_module.ClientPool(lambda username, password: server_module.PooledClient(Client(), None), ThreadPoolExecutor(1))
+
+    async def borrow():
+        async with pool.client("alice", "secret") as entry:
+            # Another request for the same user is rejected meanwhile.
+            pool.discard(pool.key("alice", "secret"))
+            assert pool.entries == {} and closed == []
+        assert closed == [entry.client]
+
+    asyncio.run(borrow())
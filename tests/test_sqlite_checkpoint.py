@@ -0,0 +1,60 @@
+import operator
+from typing import Annotated, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from sqlite_checkpoint import CompressedSerializer, SqliteCheckpointSaver
+
+class State(TypedDict):
+    items: Annotated[list[str], operator.add]
+
+def build(checkpointer):
+    graph = StateGraph(State)
+    graph.add_node("echo", lambda state: {"items": ["reply"]})
+    graph.add_edge(START, "echo")
+    graph.add_edge("echo", END)
+    return graph.compile(checkpointer=checkpointer)
+
+def test_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "t1"}}
+    with SqliteCheckpointSaver(path, prune_interval=None) as saver:
+        build(saver).invoke({"items": ["hello"]}, config)
+    with SqliteCheckpointSaver(path, prune_interval=None) as saver:
+        result = build(saver).invoke({"items": ["again"]}, config)
+        other = build(saver).invoke({"items": ["x"]}, {"configurable": {"thread_id": "t2"}})
+    assert result["items"] == ["hello", "reply", "again", "reply"]
+    assert other["items"] == ["x", "reply"]
+
+def test_prune_keeps_the_latest_checkpoints(tmp_path):
+    config = {"configurable": {"thread_id": "t1"}}
+    with SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), keep_last=3, prune_interval=None) as saver:
+        app = build(saver)
+        for i in range(5):
+            app.invoke({"items": [str(i)]}, config)
+        saver.prune()
+        assert len(list(saver.list(config))) == 3
+        assert app.get_state(config).values["items"][-2:] == ["4", "reply"]
+
+def test_large_values_are_compressed():
+    serde = CompressedSerializer()
+    value = {"text": "x" * 10_000}
+    kind, data = serde.dumps_typed(value)
+    assert len(data) < 1000
+    assert serde.loads_typed((kind, data)) == value
+
+def test_abandoned_listing_does_not_hold_the_lock(tmp_path):
+    config = {"configurable": {"thread_id": "t1"}}
+    with SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), prune_interval=None) as saver:
+        app = build(saver)
+        app.invoke({"items": ["a"]}, config)
+        app.invoke({"items": ["b"]}, config)
+
+        listing = saver.list(config)
+        next(listing)
+        try:
+            assert saver.lock.acquire(timeout=1)
+            saver.lock.release()
+            assert app.invoke({"items": ["c"]}, config)["items"][-1] == "reply"
+        finally:
+            listing.close()
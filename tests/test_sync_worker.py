@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+import dav
+from conftest import PASSWORD, USERNAME, vtodo
+from sync_worker import SyncWorker
+from task_replica import TaskReplica
+
+@pytest.fixture
+def offline_client(server, tmp_path):
+    server.add_calendar("work", [vtodo("a", "Original")])
+    client = dav.TaskDAVClient(url=server.url, username=USERNAME, password=PASSWORD, replica=TaskReplica(str(tmp_path / "replica.db")))
+    yield client
+    client.close()
+
+def test_changes_are_queued_then_pushed(server, offline_client):
+    worker = SyncWorker(offline_client)
+    offline_client.task_update_summary("work", "a", "Offline")
+    assert "Original" in server.calendars["work"].resources["a.ics"][1]
+    assert offline_client.replica.status()["pending"] == 1
+
+    assert worker.push() == 1
+
+    assert "Offline" in server.calendars["work"].resources["a.ics"][1]
+    assert offline_client.replica.status()["pending"] == 0
+
+def test_conflicting_change_is_rejected(server, offline_client):
+    worker = SyncWorker(offline_client)
+    offline_client.task_update_summary("work", "a", "Local")
+    server.calendars["work"].put("a.ics", vtodo("a", "Remote"))
+
+    assert worker.push() == 0
+
+    status = offline_client.replica.status()
+    assert status["pending"] == 0
+    assert status["rejected"][0]["reason"] == "conflict"
+    assert offline_client.task_store("work", refresh=False).get("a").master.summary == "Remote"
+
+def test_replica_serves_a_restarted_client(server, offline_client, tmp_path):
+    offline_client.task_list_by_calendar("work")
+    server.reset_counters()
+    restarted = dav.TaskDAVClient(url=server.url, username=USERNAME, password=PASSWORD, replica=TaskReplica(str(tmp_path / "replica.db")))
+
+    assert [t["UID"] for t in restarted.task_list_by_calendar("work")] == ["a"]
+    assert server.counters()["requests"] == 0
+
+def test_pull_does_not_block_local_reads_and_writes(server, offline_client):
+    offline_client.task_list_by_calendar("work")
+    server.calendars["work"].put("b.ics", vtodo("b"))
+    server.latency = 0.5
+    pulling = threading.Thread(target=offline_client.pull, args=("work",))
+    pulling.start()
+    time.sleep(0.1)
+
+    start = time.monotonic()
+    offline_client.task_update_summary("work", "a", "Local")
+    assert [t["UID"] for t in offline_client.task_list_by_calendar("work")] == ["a"]
+    assert time.monotonic() - start < 0.3
+    pulling.join()
+
+    assert sorted(t["UID"] for t in offline_client.task_list_by_calendar("work")) == ["a", "b"]
+    assert offline_client.task_store("work", refresh=False).get("a").master.summary == "Local"
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from conftest import vtodo
+from task_listing import InvalidCursor, paginate
+from todo_record import TodoRecord
+from tokens import estimate_tokens
+
+def records(count: int) -> list[TodoRecord]:
+    return [TodoRecord.from_ical(vtodo(f"t{i:02}", f"Task {i}", f"DUE:202506{i + 1:02}T090000", f"PRIORITY:{i % 9 + 1}")) for i in range(count)]
+
+def test_cursors_walk_every_task_once():
+    tasks = records(7)
+    uids, cursor = [], None
+    while True:
+        page = paginate(tasks, limit=3, cursor=cursor, fields=["uid"])
+        assert page["fields"] == ["UID"] and page["total"] == 7
+        uids += [row[0] for row in page["rows"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert uids == [f"t{i:02}" for i in range(7)]
+
+def test_cursor_is_not_shifted_by_completed_tasks():
+    tasks = records(6)
+    first = paginate(tasks, limit=2, fields=["UID"])
+    # The first two tasks are done before the next page is asked for.
+    second = paginate(tasks[2:], limit=2, cursor=first["next_cursor"], fields=["UID"])
+
+    assert [row[0] for row in second["rows"]] == ["t02", "t03"]
+
+def test_projection_and_sort_order():
+    page = paginate(records(3), fields=["summary", "priority"], sort_by="priority")
+
+    assert page == {"fields": ["SUMMARY", "PRIORITY"], "rows": [["Task 0", 1], ["Task 1", 2], ["Task 2", 3]], "total": 3, "next_cursor": None}
+
+def test_page_is_cut_at_the_token_budget():
+    tasks = records(30)
+
+    page = paginate(tasks, limit=30, max_tokens=120)
+
+    assert 1 <= len(page["rows"]) < 30
+    assert page["next_cursor"] is not None
+    assert estimate_tokens(json.dumps(page)) <= 120
+    # A budget too small for any row still returns one.
+    assert len(paginate(tasks, max_tokens=1)["rows"]) == 1
+
+def test_invalid_arguments_are_rejected():
+    tasks = records(3)
+    cursor = paginate(tasks, limit=1)["next_cursor"]
+
+    with pytest.raises(InvalidCursor):
+        paginate(tasks, cursor=cursor, sort_by="summary")
+    with pytest.raises(InvalidCursor):
+        paginate(tasks, cursor="not a cursor")
+    with pytest.raises(ValueError):
+        paginate(tasks, fields=["ATTENDEE"])
+    with pytest.raises(ValueError):
+        paginate(tasks, sort_by="size")
+
+def test_client_lists_pages_of_pending_tasks(server, client):
+    server.add_calendar("work", [vtodo("a", "A", "DUE:20250101T090000"), vtodo("b", "B", "DUE:20250102T090000"), vtodo("c", "C", "STATUS:COMPLETED")])
+
+    page = client.task_list_page("work", limit=1, fields=["UID"])
+    rest = client.task_list_page("work", cursor=page["next_cursor"], fields=["UID"])
+
+    assert (page["rows"], page["total"]) == ([["a"]], 2)
+    assert (rest["rows"], rest["next_cursor"]) == ([["b"]], None)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from conftest import vtodo
+from task_query import TaskQuery
+from todo_record import TodoRecord
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+def record(*lines: str) -> TodoRecord:
+    return TodoRecord.from_ical(vtodo("t", "Task", *lines))
+
+def test_overdue_matches_pending_tasks_due_before_now():
+    query = TaskQuery.overdue(NOW)
+
+    assert query.matches(record("DUE:20250601T110000"))
+    assert query.matches(record("DUE;VALUE=DATE:20250531"))
+    assert not query.matches(record("DUE:20250601T120000"))
+    assert not query.matches(record())
+    assert not query.matches(record("DUE:20250501T090000", "STATUS:COMPLETED", "COMPLETED:20250502T090000Z"))
+    assert not query.matches(record("DUE:20250501T090000", "STATUS:CANCELLED"))
+
+def test_overdue_asks_the_server_for_matching_tasks_only(server, client):
+    server.add_calendar("work", [
+        vtodo("late", "Late", "DUE:20200101T090000"),
+        vtodo("later", "Later", "DUE:20200102T090000"),
+        vtodo("future", "Future", "DUE:20990101T090000"),
+        vtodo("done", "Done", "DUE:20200101T090000", "STATUS:COMPLETED", "COMPLETED:20200102T090000Z"),
+    ])
+
+    overdue = client.task_list_overdue("work")
+
+    assert [t["UID"] for t in overdue] == ["late", "later"]
+    # One calendar-query REPORT, answered with the two matching tasks only.
+    assert server.counters()["requests_report"] == 1
+    assert sorted(client.task_store("work", refresh=False).tasks) == ["late", "later"]
+
+def test_overdue_is_answered_locally_once_the_calendar_is_loaded(server, client):
+    calendar = server.add_calendar("work", [vtodo("late", "Late", "DUE:20200101T090000")])
+    client.task_list_by_calendar("work")
+    calendar.put("new.ics", vtodo("new", "New", "DUE:20200103T090000"))
+    client.memo.invalidate()
+
+    assert [t["UID"] for t in client.task_list_overdue("work")] == ["late", "new"]
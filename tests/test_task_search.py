@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from conftest import vtodo
+
+def uids(result: dict) -> list[str]:
+    return [row[1] for row in result["rows"]]
+
+def test_search_ranks_summary_matches_first(server, client):
+    server.add_calendar("work", [
+        vtodo("notes", "Write notes", "DESCRIPTION:About the quarterly report", "DUE:20250101T090000"),
+        vtodo("report", "Quarterly report", "DUE:20250301T090000"),
+        vtodo("slides", "Slides", "CATEGORIES:REPORTING"),
+    ])
+    server.add_calendar("home", [vtodo("taxes", "Tax report", "DUE:20250201T090000")])
+
+    result = client.task_search("report")
+
+    assert result["fields"] == ["CALENDAR", "UID", "SUMMARY", "DUE", "PRIORITY"]
+    # Summary matches come first, earliest due first; then the other matches.
+    assert uids(result) == ["taxes", "report", "notes", "slides"]
+    assert result["rows"][0][0] == "home"
+    assert uids(client.task_search("quart rep", calendar_ids=["work"])) == ["report", "notes"]
+    assert client.task_search("invoice")["total"] == 0
+
+def test_search_filters_by_due_date_priority_and_status(server, client):
+    server.add_calendar("work", [
+        vtodo("early", "Call Bob", "DUE:20250101T090000", "PRIORITY:1"),
+        vtodo("late", "Call Ann", "DUE:20250601T090000", "PRIORITY:1"),
+        vtodo("low", "Call Eve", "DUE:20250101T090000", "PRIORITY:9"),
+        vtodo("done", "Call Joe", "DUE:20250101T090000", "PRIORITY:1", "STATUS:COMPLETED"),
+    ])
+
+    assert uids(client.task_search("call", due_before=datetime(2025, 3, 1))) == ["early", "low"]
+    assert uids(client.task_search("", priority_max=3)) == ["early", "late"]
+    assert uids(client.task_search("call", priority_max=1, due_before=datetime(2025, 3, 1), include_completed=True)) == ["done", "early"]
+    result = client.task_search("call", limit=1)
+    assert (len(result["rows"]), result["total"]) == (1, 3)
+
+def test_search_sees_task_changes(server, client):
+    server.add_calendar("work", [vtodo("a", "Buy milk")])
+    assert uids(client.task_search("milk")) == ["a"]
+
+    client.task_update_summary("work", "a", "Buy bread")
+
+    assert uids(client.task_search("milk")) == []
+    assert uids(client.task_search("bread")) == ["a"]
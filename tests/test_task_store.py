@@ -0,0 +1,105 @@
+import pytest
+
+import dav
+from conftest import PASSWORD, USERNAME, vtodo
+from mock_caldav import MockCalDAVServer
+from task_store import CalendarTaskStore
+
+def multigets(server) -> int:
+    return server.counters().get("requests_report", 0)
+
+def test_sync_token_refresh_downloads_only_changes(server, client):
+    calendar = server.add_calendar("work", [vtodo("a"), vtodo("b"), vtodo("c")])
+    store = CalendarTaskStore(client.get_calendar_by_id("work"))
+
+    store.refresh()
+    assert sorted(store.tasks) == ["a", "b", "c"]
+    first_token = store.sync_token
+    assert first_token is not None
+
+    calendar.put("b.ics", vtodo("b", "Changed"))
+    calendar.delete("c.ics")
+    calendar.put("d.ics", vtodo("d"))
+    server.reset_counters()
+    store.refresh()
+
+    assert sorted(store.tasks) == ["a", "b", "d"]
+    assert store.tasks["b"].master.summary == "Changed"
+    assert store.tasks["b"].etag == calendar.resources["b.ics"][0]
+    assert store.sync_token != first_token
+    # One sync-collection REPORT and one multiget of the two changed resources.
+    assert server.counters()["requests"] == 2
+
+    server.reset_counters()
+    store.refresh()
+    assert server.counters()["requests"] == 1
+
+@pytest.fixture
+def etag_server():
+    with MockCalDAVServer(sync_tokens=False) as server:
+        yield server
+
+def test_etag_refresh_without_sync_tokens(etag_server):
+    calendar = etag_server.add_calendar("work", [vtodo("a"), vtodo("b")])
+    client = dav.TaskDAVClient(url=etag_server.url, username=USERNAME, password=PASSWORD)
+    store = CalendarTaskStore(client.get_calendar_by_id("work"))
+
+    store.refresh()
+    assert store.supports_sync is False
+    assert sorted(store.tasks) == ["a", "b"]
+
+    # Unchanged CTag: only the CTag is asked for.
+    etag_server.reset_counters()
+    store.refresh()
+    assert etag_server.counters()["requests"] == 1
+
+    calendar.put("a.ics", vtodo("a", "Changed"))
+    calendar.delete("b.ics")
+    etag_server.reset_counters()
+    store.refresh()
+
+    assert list(store.tasks) == ["a"]
+    assert store.tasks["a"].master.summary == "Changed"
+    assert store.tasks["a"].etag == calendar.resources["a.ics"][0]
+    # CTag, ETag listing, and a multiget of the changed resource.
+    assert etag_server.counters()["requests"] == 3
+
+def test_write_through_keeps_etag(server, client):
+    server.add_calendar("work", [vtodo("a")])
+    client.task_update_summary("work", "a", "Renamed")
+
+    store = client.task_store("work", refresh=False)
+    assert store.tasks["a"].master.summary == "Renamed"
+    assert store.tasks["a"].etag == server.calendars["work"].resources["a.ics"][0]
+
+    server.reset_counters()
+    store.refresh()
+    # The server only reports our own write, whose ETag is already known.
+    assert multigets(server) == 1
+
+def test_unknown_sync_token_starts_over(server, client):
+    server.add_calendar("work", [vtodo("a")])
+    store = CalendarTaskStore(client.get_calendar_by_id("work"))
+    store.refresh()
+    store.sync_token = "http://mock/sync/work/999"
+
+    store.refresh()
+
+    assert list(store.tasks) == ["a"]
+    assert store.sync_token == "http://mock/sync/work/1"
+
+def test_saved_task_keeps_the_unquoted_href(server, client):
+    server.add_calendar("work", [vtodo("needs escaping")])
+    store = client.task_store("work")
+    href = store.get("needs escaping").href
+    assert " " in href
+
+    client.task_update_summary("work", "needs escaping", "Renamed")
+    assert store.get("needs escaping").href == href
+    assert list(store.etags) == [href]
+
+    server.reset_counters()
+    store.refresh()
+    # Our own write is already known, so it is not downloaded again.
+    assert server.counters()["requests"] == 1
+    assert store.etags[href] == server.calendars["work"].resources["needs escaping.ics"][0]
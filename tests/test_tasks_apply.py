@@ -0,0 +1,36 @@
+import pytest
+
+from conftest import vtodo
+from dav import TaskNotFound
+
+def test_changes_to_one_task_are_saved_together(server, client):
+    server.add_calendar("work", [vtodo("a", "Old"), vtodo("b", "Other")])
+    client.task_list_by_calendar("work")
+    server.reset_counters()
+
+    results = client.tasks_apply([
+        {"calendar_id": "work", "task_id": "a", "fields": {"summary": "New"}},
+        {"calendar_id": "work", "task_id": "a", "fields": {"priority": 1}},
+        {"calendar_id": "work", "task_id": "b", "fields": {"bogus": 1}},
+        {"calendar_id": "work", "task_id": "gone", "fields": {"summary": "x"}},
+    ])
+
+    assert [(r["task_id"], r["status"]) for r in results] == [("a", "updated"), ("a", "updated"), ("b", "invalid"), ("gone", "not_found")]
+    assert results[0]["task"]["SUMMARY"] == "New" and results[0]["task"]["PRIORITY"] == 1
+    counters = server.counters()
+    # The known tasks are fetched with one multiget REPORT; the unknown one is looked up by UID.
+    # Only the changed task is written, once.
+    assert counters["requests_report"] == 2
+    assert counters["requests_put"] == 1
+    data = server.calendars["work"].resources["a.ics"][1]
+    assert "SUMMARY:New" in data and "PRIORITY:1" in data
+    assert "SUMMARY:Other" in server.calendars["work"].resources["b.ics"][1]
+
+def test_task_update_raises_for_a_missing_task(server, client):
+    server.add_calendar("work", [vtodo("a")])
+
+    assert client.task_update("work", "a", summary="Renamed", due=None)["SUMMARY"] == "Renamed"
+    with pytest.raises(TaskNotFound):
+        client.task_update("work", "missing", summary="x")
+    with pytest.raises(ValueError):
+        client.task_update("work", "a", bogus=1)
@@ -0,0 +1,94 @@
+from datetime import date, datetime
+from typing import Any, Optional
+
+import pytest
+
+from tool_registry import ToolInputError, ToolRegistry, coerce
+
+def task_update_due_date(calendar_id: str, task_id: str, due_date: Optional[datetime], priority: int = 5) -> None:
+    """Set the due date of the task.
+
+    Args:
+        calendar_id: Calendar ID.
+        task_id: Task ID (uid).
+        due_date: The due-date.
+        priority: The numeric priority.
+    """
+
+def task_update(calendar_id: str, task_id: str, **fields: Any) -> None:
+    """Change several fields of a task.
+
+    Args:
+        calendar_id: Calendar ID.
+        task_id: Task ID (uid).
+        **fields: New values by field name.
+    """
+
+@pytest.fixture
+def registry():
+    registry = ToolRegistry()
+    registry.add(task_update_due_date)
+    registry.add(task_update)
+    return registry
+
+@pytest.mark.parametrize("value, hint, expected", [
+    ("2024-05-01T17:00:00", datetime, datetime(2024, 5, 1, 17)),
+    ("2024-05-01", date, date(2024, 5, 1)),
+    ("3", int, 3),
+    (3.0, int, 3),
+    ("true", bool, True),
+    (2, str, "2"),
+    (None, Optional[int], None),
+    (["1", 2], list[int], [1, 2]),
+    ("x", Any, "x"),
+])
+def test_values_are_coerced_to_the_type_hint(value, hint, expected):
+    assert coerce(value, hint) == expected
+
+@pytest.mark.parametrize("value, hint", [
+    ("tomorrow", datetime),
+    ("3.5", int),
+    (True, int),
+    ("yes", bool),
+    (None, str),
+    ("a", list[int]),
+])
+def test_values_of_the_wrong_type_are_rejected(value, hint):
+    with pytest.raises(ValueError):
+        coerce(value, hint)
+
+def test_prepare_parses_and_coerces_tool_input(registry):
+    tool, arguments = registry.prepare("task_update_due_date", '{"calendar_id": "work", "task_id": "a", "due_date": "2024-05-01T17:00:00", "priority": "1"}')
+
+    assert tool.name == "task_update_due_date"
+    assert arguments == {"calendar_id": "work", "task_id": "a", "due_date": datetime(2024, 5, 1, 17), "priority": 1}
+    # Python dict literals and native tool call arguments are accepted too.
+    assert registry.prepare("task_update_due_date", "{'calendar_id': 'work', 'task_id': 'a', 'due_date': None}")[1]["due_date"] is None
+    assert registry.prepare("task_update", {"calendar_id": "work", "task_id": "a", "summary": "New"})[1]["summary"] == "New"
+
+def test_invalid_input_is_reported_in_one_error(registry):
+    with pytest.raises(ToolInputError) as error:
+        registry.prepare("task_update_due_date", '{"calendar_id": "work", "due_date": "soon", "colour": "red"}')
+
+    message = str(error.value)
+    assert "`due_date` must be an ISO 8601 date and time" in message
+    assert "unknown argument `colour`" in message
+    assert "missing `task_id`" in message
+
+@pytest.mark.parametrize("name, raw", [
+    ("task_delete", "{}"),
+    ("task_update", "calendar_id=work"),
+    ("task_update", '["work", "a"]'),
+])
+def test_unknown_tools_and_malformed_input_are_rejected(registry, name, raw):
+    with pytest.raises(ToolInputError):
+        registry.prepare(name, raw)
+
+def test_schemas_describe_the_parameters(registry):
+    due, update = registry.schemas
+
+    parameters = due["function"]["parameters"]
+    assert parameters["required"] == ["calendar_id", "task_id", "due_date"]
+    assert parameters["properties"]["priority"] == {"type": "integer", "description": "The numeric priority.", "default": 5}
+    assert update["function"]["parameters"]["additionalProperties"] is True
+    assert registry.schemas is registry.schemas
@@ -0,0 +1,71 @@
+import importlib
+
+import pytest
+from langchain_core.tools import tool
+
+import dav
+from conftest import PASSWORD, USERNAME
+from tool_router import ToolRouter
+
+prebuilt = importlib.import_module("run-prebuilt")
+
+@tool
+def task_list_overdue(calendar_id: str) -> list:
+    """List the overdue tasks of a calendar."""
+    return []
+
+@tool
+def task_mark_complete(calendar_id: str, task_id: str) -> None:
+    """Mark a task as complete."""
+
+@tool
+def task_search(text: str) -> list:
+    """Search tasks by words of their summary or description."""
+    return []
+
+@tool
+def event_list_range(calendar_id: str, start: str, end: str) -> list:
+    """List the calendar events between two times."""
+    return []
+
+TOOLS = [task_list_overdue, task_mark_complete, task_search, event_list_range]
+
+def test_selects_matching_tools_with_companions():
+    router = ToolRouter(TOOLS, min_score=0.5, companions={"task_mark_complete": ["task_search"]})
+
+    assert [t.name for t in router.select("what is overdue?")] == ["task_list_overdue"]
+    assert [t.name for t in router.select("mark the dentist task complete")] == ["task_mark_complete", "task_search"]
+
+def test_uncertain_requests_get_all_tools():
+    router = ToolRouter(TOOLS, min_score=0.5)
+    assert router.select("hello there") == TOOLS
+
+@pytest.fixture(scope="module")
+def taskdav_router():
+    client = dav.TaskDAVClient(url="http://127.0.0.1:1/", username=USERNAME, password=PASSWORD)
+    tools = prebuilt.get_taskdav_tools(client)
+    assert len(tools) >= 24
+    yield prebuilt.build_router(tools)
+    client.close()
+
+@pytest.mark.parametrize("request_text, needed", [
+    ("what is overdue?", "task_list_overdue"),
+    ("check my tasks for today", "task_list_upcoming"),
+    ("which tasks are due this week?", "task_list_upcoming"),
+    ("show all my tasks", "task_list_by_calendar"),
+    ("mark the dentist task as done", "task_mark_complete"),
+    ("rename the dentist task", "task_update_summary"),
+    ("set the priority of the report task to high", "task_update_priority"),
+    ("add a task to buy milk", "task_add_to_calendar"),
+    ("move my meeting with Bob to Friday", "event_move"),
+    ("find a free hour for a meeting on Monday", "calendar_find_free_slot"),
+])
+def test_routes_requests_over_the_taskdav_tools(taskdav_router, request_text, needed):
+    selected = [t.name for t in taskdav_router.select(request_text)]
+    assert needed in selected
+    assert len(selected) <= taskdav_router.top_k + 2
+
+def test_questions_do_not_pull_in_unrelated_tools(taskdav_router):
+    assert "task_mark_complete" not in [t.name for t in taskdav_router.select("check my tasks for today")]
+    assert "tasks_apply" not in [t.name for t in taskdav_router.select("show all my tasks")]
+    assert [t.name for t in taskdav_router.select("what is overdue?")] == ["task_list_overdue"]
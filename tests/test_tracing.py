@@ -0,0 +1,63 @@
+import io
+import json
+
+import pytest
+
+from tracing import OTLPJsonSink, SpanCollector, Tracer, tracer
+
+def test_spans_nest_and_add_up_in_the_root_summary():
+    spans = Tracer()
+    collector = SpanCollector()
+    spans.add_sink(collector)
+
+    with spans.span("agent.turn") as turn:
+        for step in range(2):
+            with spans.span("agent.step", step=step):
+                with spans.span("model.call") as call:
+                    call.count(prompt_tokens=10, completion_tokens=step)
+
+    assert [s.name for s in collector.spans] == ["model.call", "agent.step", "model.call", "agent.step", "agent.turn"]
+    call, step = collector.spans[:2]
+    assert call.parent is step and step.parent is turn
+    assert {s.trace_id for s in collector.spans} == {turn.trace_id}
+    summary = turn.summary()
+    assert set(summary) == {"agent.step", "model.call"}
+    assert summary["model.call"]["count"] == 2
+    assert (summary["model.call"]["prompt_tokens"], summary["model.call"]["completion_tokens"]) == (20, 1)
+
+def test_failed_span_is_marked_and_exported():
+    spans = Tracer()
+    collector = SpanCollector()
+    spans.add_sink(collector)
+
+    with pytest.raises(KeyError):
+        with spans.span("tool.call", tool="x"):
+            raise KeyError("x")
+
+    assert collector.spans[0].status == "error"
+    assert collector.spans[0].attributes == {"tool": "x", "error": "KeyError"}
+
+def test_otlp_sink_writes_one_export_request_per_span():
+    spans = Tracer()
+    stream = io.StringIO()
+    spans.add_sink(OTLPJsonSink(stream, service_name="test"))
+
+    with spans.span("agent.turn") as turn:
+        with spans.span("http.request", method="GET", bytes=3):
+            pass
+
+    child, root = (json.loads(line)["resourceSpans"][0] for line in stream.getvalue().splitlines())
+    assert root["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "test"}}]
+    otlp = child["scopeSpans"][0]["spans"][0]
+    assert otlp["name"] == "http.request" and otlp["parentSpanId"] == turn.span_id
+    assert otlp["attributes"] == [{"key": "method", "value": {"stringValue": "GET"}}, {"key": "bytes", "value": {"intValue": "3"}}]
+    assert "parentSpanId" not in root["scopeSpans"][0]["spans"][0]
+
+def test_client_requests_are_children_of_the_calling_span(server, client):
+    server.add_calendar("work", [])
+
+    with tracer.span("tool.call") as call:
+        client.task_list_by_calendar("work")
+
+    requests = call.summary()["http.request"]
+    assert requests["count"] >= 1 and requests["bytes_received"] > 0